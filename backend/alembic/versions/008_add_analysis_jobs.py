@@ -0,0 +1,44 @@
+"""Add analysis_jobs table for background patent analysis.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "008"
+down_revision: Union[str, None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("session_id", sa.UUID(), nullable=True),
+        sa.Column("status", sa.String(20), server_default="queued", nullable=False),
+        sa.Column("progress", sa.String(50), nullable=True),
+        sa.Column("request_json", sa.Text(), nullable=False),
+        sa.Column("result_json", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("credits_reserved", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("credit_state", sa.String(20), server_default="none", nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["session_id"], ["sessions.id"], ondelete="SET NULL"),
+    )
+    op.create_index("ix_analysis_jobs_user_id", "analysis_jobs", ["user_id"])
+    op.create_index("ix_analysis_jobs_status", "analysis_jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_table("analysis_jobs")
@@ -0,0 +1,35 @@
+"""Add analysis_checkpoints table for step-level resume.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:01.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "009"
+down_revision: Union[str, None] = "008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "analysis_checkpoints",
+        sa.Column("fingerprint", sa.String(64), nullable=False),
+        sa.Column("step", sa.String(30), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("fingerprint", "step"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    )
+    op.create_index("ix_analysis_checkpoints_user_id", "analysis_checkpoints", ["user_id"])
+    op.create_index("ix_analysis_checkpoints_created_at", "analysis_checkpoints", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("analysis_checkpoints")
@@ -0,0 +1,36 @@
+"""Add patent_documents table (shared patent metadata + digests).
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19 00:00:02.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "010"
+down_revision: Union[str, None] = "009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "patent_documents",
+        sa.Column("patent_id", sa.String(32), nullable=False),
+        sa.Column("title", sa.Text(), server_default="", nullable=False),
+        sa.Column("abstract", sa.Text(), server_default="", nullable=False),
+        sa.Column("assignee", sa.Text(), nullable=True),
+        sa.Column("date", sa.String(10), nullable=True),
+        sa.Column("cpc_codes", sa.Text(), nullable=True),
+        sa.Column("digest", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("patent_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("patent_documents")
@@ -0,0 +1,40 @@
+"""Add patent_draft_sections table (versioned per-session draft sections).
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19 00:00:03.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "patent_draft_sections",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("session_id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("section", sa.String(30), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("is_fallback", sa.Boolean(), server_default=sa.text("false"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.ForeignKeyConstraint(["session_id"], ["sessions.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.UniqueConstraint("session_id", "section", "version", name="uq_patent_draft_sections_version"),
+    )
+    op.create_index("ix_patent_draft_sections_session_id", "patent_draft_sections", ["session_id"])
+    op.create_index("ix_patent_draft_sections_user_id", "patent_draft_sections", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("patent_draft_sections")
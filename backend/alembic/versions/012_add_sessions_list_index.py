@@ -0,0 +1,23 @@
+"""Add composite (user_id, updated_at, id) index for keyset-paginated session lists.
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19 00:00:04.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_sessions_user_id_updated_at_id", "sessions", ["user_id", "updated_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_sessions_user_id_updated_at_id", table_name="sessions")
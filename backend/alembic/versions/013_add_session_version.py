@@ -0,0 +1,24 @@
+"""Add sessions.version (optimistic-concurrency counter, served as the ETag).
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19 00:00:05.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "013"
+down_revision: Union[str, None] = "012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("sessions", sa.Column("version", sa.Integer(), server_default="1", nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column("sessions", "version")
@@ -0,0 +1,35 @@
+"""Add session_artifacts table (content-addressed large session payloads).
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19 00:00:06.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "014"
+down_revision: Union[str, None] = "013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "session_artifacts",
+        sa.Column("digest", sa.String(64), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column("stored_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("digest"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    )
+    op.create_index("ix_session_artifacts_user_id", "session_artifacts", ["user_id"])
+
+
+def downgrade() -> None:
+    # Rows still referencing artifacts must be inlined first (see app.services.artifacts)
+    op.drop_table("session_artifacts")
@@ -0,0 +1,40 @@
+"""Add key_rotation_runs table (checkpoints for background key rotation).
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-19 00:00:07.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "015"
+down_revision: Union[str, None] = "014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "key_rotation_runs",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("table_name", sa.String(50), nullable=False),
+        sa.Column("key_id", sa.String(16), nullable=False),
+        sa.Column("status", sa.String(20), server_default="running", nullable=False),
+        sa.Column("last_key", sa.String(64), nullable=True),
+        sa.Column("rows_scanned", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("rows_rotated", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("key_counts", sa.Text(), server_default="{}", nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("started_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("table_name", "key_id", name="uq_key_rotation_runs_table_key"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("key_rotation_runs")
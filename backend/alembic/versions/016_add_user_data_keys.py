@@ -0,0 +1,34 @@
+"""Add user_data_keys table (per-user envelope encryption) and users.deleted_at.
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-19 00:00:08.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "016"
+down_revision: Union[str, None] = "015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_data_keys",
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("wrapped_key", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    )
+    op.add_column("users", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    # Data written under per-user keys is unreadable once this table is gone
+    op.drop_column("users", "deleted_at")
+    op.drop_table("user_data_keys")
@@ -0,0 +1,40 @@
+"""Add trigram GIN index on patent_documents.title for the local substring search.
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-19 00:00:09.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "017"
+down_revision: Union[str, None] = "016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Built concurrently: the table is shared by every analysis and keeps taking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_patent_documents_title_trgm",
+            "patent_documents",
+            ["title"],
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_patent_documents_title_trgm",
+            table_name="patent_documents",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
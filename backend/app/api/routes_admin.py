@@ -0,0 +1,44 @@
+"""Admin-only operational endpoints."""
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.dependencies import require_admin
+from app.core import metrics
+from app.models.database import get_session
+from app.services import key_rotation, search_yield
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """In-process counters for this worker (abandoned requests, cancelled LLM calls, ...)."""
+    return {"counters": metrics.snapshot(), "summaries": metrics.summaries()}
+
+
+@router.get("/search-yield")
+async def get_search_yield():
+    """Per-source query yield (decayed) and whether low-yield sources are being pruned."""
+    return search_yield.snapshot()
+
+
+@router.get("/key-rotation")
+async def get_key_rotation(db: AsyncSession = Depends(get_session)):
+    """Re-encryption progress per table and the estimated share of rows on each key."""
+    return await key_rotation.rotation_status(db)
+
+
+@router.post("/key-rotation")
+async def start_key_rotation(db: AsyncSession = Depends(get_session)):
+    """Start or resume re-encrypting stored data under the primary key (failed runs restart from their cursor)."""
+    if not key_rotation.start_rotation():
+        raise HTTPException(status_code=400, detail="Encryption is not enabled (ENCRYPTION_KEYS is empty)")
+    return await key_rotation.rotation_status(db)
+
+
+@router.delete("/key-rotation")
+async def stop_key_rotation(db: AsyncSession = Depends(get_session)):
+    """Stop rotation in this worker; progress is kept."""
+    await key_rotation.stop_rotation()
+    return await key_rotation.rotation_status(db)
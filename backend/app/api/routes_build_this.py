@@ -1,21 +1,33 @@
+import json
 import logging
+import uuid
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.dependencies import get_current_user
+from app.core import metrics
 from app.core.config import settings
+from app.core.disconnect import cancel_on_disconnect
+from app.models.database import async_session, get_session
+from app.models.session import Session
+from app.models.user import User
 from app.schemas.build_this import (
-    Background,
-    CoverSheet,
     ProvisionalPatentRequest,
     ProvisionalPatentResponse,
-    Specification,
+    SectionRegenerateRequest,
+    SessionDraftResponse,
 )
-from app.services.llm import LLMError, call_llm_async
-from app.services.prompts import (
-    PROVISIONAL_PATENT_SCHEMA,
-    PROVISIONAL_PATENT_SYSTEM,
-    build_provisional_patent_prompt,
+from app.services import draft_sections
+from app.services.llm import LLMError
+from app.services.patent_draft import (
+    SECTIONS,
+    draft_patent,
+    iter_draft,
+    iter_mock_draft,
+    mock_patent_draft,
 )
 
 log = logging.getLogger("mousetrap.routes_build_this")
@@ -29,287 +41,173 @@ def _has_llm_key() -> bool:
     return bool(settings.openai_api_key)
 
 
-def _format_patent_markdown(data: dict) -> str:
-    cover = data.get("cover_sheet", {})
-    spec = data.get("specification", {})
-    bg = spec.get("background", {})
-    claims = data.get("claims", {})
-
-    lines = [
-        f"# {cover.get('invention_title', 'Untitled Invention')}",
-        "",
-        f"*{cover.get('filing_date_note', '')}*",
-        "",
-        "---",
-        "",
-        "## SPECIFICATION",
-        "",
-        f"### Title of Invention",
-        "",
-        spec.get("title_of_invention", ""),
-        "",
-    ]
+async def _owned_session_id(db: AsyncSession, session_id: uuid.UUID | str, user: User) -> uuid.UUID:
+    result = await db.execute(
+        select(Session.id).where(Session.id == session_id, Session.user_id == user.id)
+    )
+    owned = result.scalar_one_or_none()
+    if owned is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return owned
 
-    cross_ref = spec.get("cross_reference")
-    if cross_ref:
-        lines += [
-            "### Cross-Reference to Related Applications",
-            "",
-            cross_ref,
-            "",
-        ]
 
-    lines += [
-        "### Background of the Invention",
-        "",
-        "#### Field of the Invention",
-        "",
-        bg.get("field_of_invention", ""),
-        "",
-        "#### Description of the Prior Art",
-        "",
-        bg.get("description_of_prior_art", ""),
-        "",
-        "### Summary of the Invention",
-        "",
-        spec.get("summary", ""),
-        "",
-    ]
+# ── Endpoint ─────────────────────────────────────────────────────────
 
-    drawings_desc = spec.get("brief_description_of_drawings")
-    if drawings_desc:
-        lines += [
-            "### Brief Description of the Drawings",
-            "",
-            drawings_desc,
-            "",
-        ]
+@router.post("/patent-draft", response_model=ProvisionalPatentResponse)
+async def generate_patent_draft(
+    req: ProvisionalPatentRequest,
+    request: Request,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+):
+    """Generate a USPTO-format provisional patent application draft.
+
+    An outline is generated first; the sections are then written concurrently
+    from it (see app.services.patent_draft).  With ``session_id`` the draft is
+    also stored on the session as versioned sections.
+    """
+    session_id = await _owned_session_id(db, req.session_id, user) if req.session_id else None
+    recorder = draft_sections.DraftRecorder(req)
 
-    lines += [
-        "### Detailed Description of Preferred Embodiments",
-        "",
-        spec.get("detailed_description", ""),
-        "",
-        "---",
-        "",
-        "## ABSTRACT",
-        "",
-        data.get("abstract", ""),
-        "",
-        "---",
-        "",
-        "## CLAIMS",
-        "",
-    ]
+    if not _has_llm_key():
+        log.warning("No LLM API key — returning mock patent draft")
+        for event, payload in iter_mock_draft(req):
+            recorder(event, payload)
+        draft = mock_patent_draft(req)
+    else:
+        try:
+            draft = await cancel_on_disconnect(request, draft_patent(req, on_event=recorder), "patent_draft")
+        except LLMError as exc:
+            log.error("LLM call failed: %s", exc)
+            raise HTTPException(status_code=502, detail=str(exc)) from exc
 
-    for i, c in enumerate(claims.get("independent", []), 1):
-        lines.append(f"**{i}.** {c}")
-        lines.append("")
-    dep_start = len(claims.get("independent", [])) + 1
-    for i, c in enumerate(claims.get("dependent", []), dep_start):
-        lines.append(f"**{i}.** {c}")
-        lines.append("")
+    if session_id is not None:
+        await draft_sections.save_draft(db, session_id, user.id, recorder)
+        await db.commit()
+    return draft
 
-    lines += [
-        "---",
-        "",
-        "## DRAWINGS RECOMMENDATION",
-        "",
-        data.get("drawings_note", ""),
-        "",
-        "---",
-        "",
-        "*Disclaimer: This is an AI-generated draft for informational purposes only. "
-        "It does not constitute legal advice. Have a registered patent attorney or agent "
-        "review this document before filing with the USPTO.*",
-    ]
-    return "\n".join(lines)
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-# ── Mock fallback ────────────────────────────────────────────────────
 
-def _mock_patent_draft(req: ProvisionalPatentRequest) -> ProvisionalPatentResponse:
-    data = {
-        "cover_sheet": {
-            "invention_title": f"Improved {req.variant.title}",
-            "filing_date_note": "Filing establishes a priority date. You have 12 months to file a non-provisional application.",
-        },
-        "specification": {
-            "title_of_invention": f"Improved {req.variant.title}",
-            "cross_reference": None,
-            "background": {
-                "field_of_invention": (
-                    f"This invention relates generally to improvements in {req.product_text}, "
-                    f"and more particularly to {req.variant.title.lower()}."
-                ),
-                "description_of_prior_art": (
-                    f"Existing solutions in the {req.product_text} space suffer from several limitations. "
-                    f"{req.spec.baseline} "
-                    f"There remains a need for an approach that addresses these shortcomings."
-                ),
-            },
-            "summary": (
-                f"{req.variant.summary} "
-                f"The present invention provides {req.spec.novelty}"
-            ),
-            "brief_description_of_drawings": None,
-            "detailed_description": (
-                f"In accordance with the present invention, {req.spec.mechanism}\n\n"
-                f"The invention differentiates from prior art in the following ways: "
-                f"{', '.join(req.spec.differentiators) if req.spec.differentiators else 'novel mechanism and approach'}.\n\n"
-                f"In one preferred embodiment, the system implements the core mechanism described above "
-                f"to achieve measurable improvements over existing solutions."
-            ),
-        },
-        "abstract": (
-            f"An improved {req.product_text} comprising {req.spec.mechanism} "
-            f"The invention addresses limitations in existing products by providing "
-            f"{req.spec.novelty}"
-        ),
-        "claims": {
-            "independent": [
-                f"A method for improving {req.product_text} comprising: {req.spec.mechanism}",
-                f"An apparatus for {req.variant.title.lower()} comprising the elements described herein.",
-            ],
-            "dependent": [
-                "The method of claim 1, wherein the improvement further comprises enhanced durability.",
-                "The method of claim 1, wherein the cost is reduced by at least 20%.",
-                "The apparatus of claim 2, further comprising a modular design.",
-            ],
-        },
-        "drawings_note": (
-            "It is recommended to include the following drawings:\n"
-            "- Figure 1: System overview diagram showing key components\n"
-            "- Figure 2: Flowchart of the core method steps\n"
-            "- Figure 3: Detailed view of the primary mechanism"
-        ),
-    }
-    data["markdown"] = _format_patent_markdown(data)
+async def _store_streamed_draft(
+    session_id: uuid.UUID,
+    user_id: uuid.UUID,
+    recorder: draft_sections.DraftRecorder,
+) -> dict[str, int] | None:
+    """Best-effort save once a streamed draft completes — the response is already under way."""
+    try:
+        async with async_session() as db:
+            versions = await draft_sections.save_draft(db, session_id, user_id, recorder)
+            await db.commit()
+        return versions
+    except Exception:
+        log.exception("Could not store streamed draft for session %s", session_id)
+        return None
+
+
+@router.post("/patent-draft/stream")
+async def stream_patent_draft(
+    req: ProvisionalPatentRequest,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+):
+    """Server-sent draft events: the outline, then each section as it completes.
+
+    Every ``section`` event carries the markdown rendered so far, with
+    unfinished sections shown as placeholders; the final ``complete`` event
+    carries the full ProvisionalPatentResponse.  An LLM failure before any
+    section is written ends the stream with an ``error`` event.  With
+    ``session_id`` the finished draft is stored and a ``stored`` event with
+    the section versions follows ``complete``.
+    """
+    session_id = await _owned_session_id(db, req.session_id, user) if req.session_id else None
+    recorder = draft_sections.DraftRecorder(req)
+
+    async def events():
+        if not _has_llm_key():
+            log.warning("No LLM API key — streaming mock patent draft")
+            for event, payload in iter_mock_draft(req):
+                recorder(event, payload)
+                yield _sse(event, payload)
+        else:
+            finished = False
+            try:
+                async for event, payload in iter_draft(req):
+                    recorder(event, payload)
+                    yield _sse(event, payload)
+                finished = True
+            except LLMError as exc:
+                log.error("LLM call failed: %s", exc)
+                finished = True
+                yield _sse("error", {"detail": str(exc)})
+                return
+            finally:
+                if not finished:
+                    metrics.inc("abandoned.patent_draft")
+
+        if session_id is not None and recorder.complete:
+            versions = await _store_streamed_draft(session_id, user.id, recorder)
+            if versions is not None:
+                yield _sse("stored", {"session_id": str(session_id), "versions": versions})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    bg = data["specification"]["background"]
-    spec_data = data["specification"]
 
-    return ProvisionalPatentResponse(
-        cover_sheet=CoverSheet(**data["cover_sheet"]),
-        specification=Specification(
-            title_of_invention=spec_data["title_of_invention"],
-            cross_reference=spec_data["cross_reference"],
-            background=Background(**bg),
-            summary=spec_data["summary"],
-            brief_description_of_drawings=spec_data["brief_description_of_drawings"],
-            detailed_description=spec_data["detailed_description"],
-        ),
-        abstract=data["abstract"],
-        claims=data["claims"],
-        drawings_note=data["drawings_note"],
-        markdown=data["markdown"],
+# ── Stored drafts ────────────────────────────────────────────────────
+
+@router.get("/patent-draft/{session_id}", response_model=SessionDraftResponse)
+async def get_session_draft(
+    session_id: uuid.UUID,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+):
+    """The session's draft assembled from the latest section versions."""
+    await _owned_session_id(db, session_id, user)
+    latest = await draft_sections.load_latest(db, session_id)
+    if "outline" not in latest:
+        raise HTTPException(status_code=404, detail="No stored draft for this session")
+    return SessionDraftResponse(
+        draft=draft_sections.assemble_stored(latest),
+        versions=draft_sections.section_versions(latest),
     )
 
 
-# ── Endpoint ─────────────────────────────────────────────────────────
-
-@router.post("/patent-draft", response_model=ProvisionalPatentResponse)
-async def generate_patent_draft(req: ProvisionalPatentRequest):
-    """Generate a USPTO-format provisional patent application draft."""
-    if not _has_llm_key():
-        log.warning("No LLM API key — returning mock patent draft")
-        return _mock_patent_draft(req)
+@router.post("/patent-draft/{session_id}/sections/{section}", response_model=SessionDraftResponse)
+async def regenerate_draft_section(
+    session_id: uuid.UUID,
+    section: str,
+    req: SectionRegenerateRequest,
+    request: Request,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+):
+    """Regenerate one section of a stored draft; every other section is reused as-is."""
+    if section not in SECTIONS:
+        raise HTTPException(status_code=422, detail=f"Unknown section. Choose one of: {', '.join(SECTIONS)}")
+    await _owned_session_id(db, session_id, user)
 
-    hits_data = [h.model_dump() for h in req.hits] if req.hits else []
-    prompt = build_provisional_patent_prompt(
-        product_text=req.product_text,
-        variant_title=req.variant.title,
-        variant_summary=req.variant.summary,
-        spec_novelty=req.spec.novelty,
-        spec_mechanism=req.spec.mechanism,
-        spec_baseline=req.spec.baseline,
-        spec_differentiators=req.spec.differentiators,
-        patent_hits=hits_data,
-    )
     try:
-        data = await call_llm_async(
-            prompt,
-            json_schema_hint=PROVISIONAL_PATENT_SCHEMA,
-            system=PROVISIONAL_PATENT_SYSTEM,
-            max_tokens=32000,
+        draft, versions = await cancel_on_disconnect(
+            request,
+            draft_sections.regenerate_section(
+                db, session_id, user.id, section,
+                instructions=req.instructions, use_llm=_has_llm_key(),
+            ),
+            "patent_draft",
         )
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except draft_sections.SectionConflictError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
     except LLMError as exc:
         log.error("LLM call failed: %s", exc)
         raise HTTPException(status_code=502, detail=str(exc)) from exc
 
-    claims = data.get("claims", {})
-    if isinstance(claims, list):
-        claims = {"independent": claims, "dependent": []}
-
-    # If abstract, claims, or drawings_note are missing, make a focused follow-up call
-    missing_abstract = not data.get("abstract")
-    missing_claims = not claims or not claims.get("independent")
-    missing_drawings = not data.get("drawings_note")
-
-    if missing_abstract or missing_claims or missing_drawings:
-        log.warning(
-            "Patent draft missing sections (abstract=%s, claims=%s, drawings=%s) — making follow-up call",
-            missing_abstract, missing_claims, missing_drawings,
-        )
-        spec_data_for_followup = data.get("specification", {})
-        title = data.get("cover_sheet", {}).get("invention_title", req.variant.title)
-        summary = spec_data_for_followup.get("summary", req.variant.summary)
-
-        followup_prompt = f"""Given this patent invention, generate ONLY the missing sections.
-
-Invention: {title}
-Summary: {summary}
-Product: {req.product_text}
-Novelty: {req.spec.novelty}
-Mechanism: {req.spec.mechanism}
-
-Generate a JSON object with these fields:
-- "abstract": Exactly 150 words. Technical summary stating the field, problem, and solution.
-- "claims": Object with "independent" (2-3 claims) and "dependent" (4-6 claims) arrays in patent language.
-- "drawings_note": Recommend specific figures (perspective view, block diagram, flowchart) the inventor should prepare.
-
-Respond with ONLY valid JSON, no markdown fences."""
-
-        try:
-            followup = await call_llm_async(followup_prompt, system=PROVISIONAL_PATENT_SYSTEM, max_tokens=4096)
-            if missing_abstract and followup.get("abstract"):
-                data["abstract"] = followup["abstract"]
-            if missing_claims:
-                fc = followup.get("claims", {})
-                if isinstance(fc, list):
-                    fc = {"independent": fc, "dependent": []}
-                if fc.get("independent"):
-                    claims = fc
-            if missing_drawings and followup.get("drawings_note"):
-                data["drawings_note"] = followup["drawings_note"]
-        except Exception as exc:
-            log.error("Follow-up LLM call failed: %s", exc)
-
-    cover_data = data.get("cover_sheet", {})
-    spec_data = data.get("specification", {})
-    bg_data = spec_data.get("background", {})
-
-    full_data = {**data, "claims": claims}
-    markdown = _format_patent_markdown(full_data)
-
-    return ProvisionalPatentResponse(
-        cover_sheet=CoverSheet(
-            invention_title=cover_data.get("invention_title", "Untitled"),
-            filing_date_note=cover_data.get("filing_date_note", ""),
-        ),
-        specification=Specification(
-            title_of_invention=spec_data.get("title_of_invention", ""),
-            cross_reference=spec_data.get("cross_reference"),
-            background=Background(
-                field_of_invention=bg_data.get("field_of_invention", ""),
-                description_of_prior_art=bg_data.get("description_of_prior_art", ""),
-            ),
-            summary=spec_data.get("summary", ""),
-            brief_description_of_drawings=spec_data.get("brief_description_of_drawings"),
-            detailed_description=spec_data.get("detailed_description", ""),
-        ),
-        abstract=data.get("abstract", ""),
-        claims=claims,
-        drawings_note=data.get("drawings_note", ""),
-        markdown=markdown,
-    )
+    await db.commit()
+    return SessionDraftResponse(draft=draft, versions=versions)
@@ -1,7 +1,7 @@
 import logging
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.credit_guard import require_credits
@@ -10,6 +10,7 @@ from app.models.database import get_session
 from app.models.user import User
 
 from app.core.config import settings
+from app.core.disconnect import cancel_on_disconnect
 from app.schemas.idea import (
     CustomerTruth,
     GenerateIdeasRequest,
@@ -250,6 +251,7 @@ def _parse_brief_idea(raw: dict, tier: str) -> IdeaVariant:
 @router.post("/generate", response_model=GenerateIdeasResponse)
 async def generate_ideas(
     req: GenerateIdeasRequest,
+    request: Request,
     user: User = Depends(require_credits),
     session: AsyncSession = Depends(get_session),
 ):
@@ -284,10 +286,10 @@ async def generate_ideas(
     else:
         prompt = build_generate_variants_prompt(product, req.category, random=req.random)
     try:
-        data = await call_llm_async(
-            prompt,
-            json_schema_hint=GENERATE_VARIANTS_SCHEMA,
-            system=GENERATE_VARIANTS_SYSTEM,
+        data = await cancel_on_disconnect(
+            request,
+            call_llm_async(prompt, json_schema_hint=GENERATE_VARIANTS_SCHEMA, system=GENERATE_VARIANTS_SYSTEM),
+            "idea_generation",
         )
     except LLMError as exc:
         log.error("LLM call failed: %s", exc)
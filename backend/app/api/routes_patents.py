@@ -1,23 +1,38 @@
+import json
 import logging
+import uuid
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth.credit_guard import require_credits
+from app.auth.credit_guard import check_credits, require_credits
 from app.auth.dependencies import get_current_user
 from app.models.database import get_session
+from app.models.job import AnalysisJob
+from app.models.session import Session
 from app.models.user import User
 
 from app.core.config import settings
+from app.core.disconnect import ClientDisconnected, cancel_on_disconnect
+from app.core.limiter import limiter
 from app.schemas.patent import (
+    AnalysisJobRequest,
+    AnalysisJobStatus,
+    BatchAnalysisRequest,
+    BatchAnalysisResponse,
     EnhancedPatentHit,
     PatentAnalysisRequest,
     PatentAnalysisResponse,
     PatentHit,
     PatentSearchRequest,
     PatentSearchResponse,
+    QuickScanResponse,
 )
-from app.services.patent_analysis import run_patent_analysis
+from app.services import analysis_jobs
+from app.services.analysis_checkpoints import analysis_fingerprint, clear_checkpoints
+from app.services.patent_analysis import run_batch_analysis, run_patent_analysis, run_quick_scan
 from app.services.patentsview import (
     build_query_payload,
     normalize_hits,
@@ -203,6 +218,7 @@ def _mock_analysis_response(req: PatentAnalysisRequest) -> PatentAnalysisRespons
 @router.post("/analyze", response_model=PatentAnalysisResponse)
 async def analyze_patents(
     req: PatentAnalysisRequest,
+    request: Request,
     user: User = Depends(require_credits),
     session: AsyncSession = Depends(get_session),
 ):
@@ -219,8 +235,15 @@ async def analyze_patents(
         log.warning("No API keys configured — returning mock analysis")
         return _mock_analysis_response(req)
 
+    checkpoint_key = analysis_fingerprint(req, user.id)
     try:
-        result = await run_patent_analysis(req)
+        result = await cancel_on_disconnect(
+            request,
+            run_patent_analysis(req, checkpoint_key=checkpoint_key, user_id=user.id),
+            "patent_analysis",
+        )
+    except ClientDisconnected:
+        raise
     except Exception:
         log.exception("Patent analysis failed — returning mock fallback")
         return _mock_analysis_response(req)
@@ -235,4 +258,167 @@ async def analyze_patents(
         )
         await session.commit()
 
+    await clear_checkpoints(checkpoint_key)
     return result
+
+
+@router.post("/analyze/quick", response_model=QuickScanResponse)
+@limiter.limit("20/minute")
+async def quick_scan_patents(req: PatentAnalysisRequest, request: Request):
+    """Sub-second crowdedness check with no LLM calls. Free — no credit is charged."""
+    return await run_quick_scan(req)
+
+
+@router.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_patents_batch(
+    req: BatchAnalysisRequest,
+    request: Request,
+    user: User = Depends(require_credits),
+    session: AsyncSession = Depends(get_session),
+):
+    """Analyze several variants of one product, sharing one search pass. One credit per variant."""
+    credit_cost = len(req.variants)
+    if credit_cost > 1:
+        await check_credits(
+            session, user, credit_cost,
+            f"Analyzing {credit_cost} variants requires {credit_cost} credits. Purchase more in the app.",
+        )
+
+    single_reqs = [
+        PatentAnalysisRequest(product_text=req.product_text, variant=v.variant, spec=v.spec, limit=req.limit)
+        for v in req.variants
+    ]
+    has_pv_key = bool(settings.patentsview_api_key)
+    has_llm_key = (
+        (settings.llm_provider == "anthropic" and settings.anthropic_api_key)
+        or (settings.llm_provider == "openai" and settings.openai_api_key)
+    )
+    if not has_pv_key and not has_llm_key:
+        log.warning("No API keys configured — returning mock batch analysis")
+        return BatchAnalysisResponse(results=[_mock_analysis_response(r) for r in single_reqs])
+
+    try:
+        results, stats = await cancel_on_disconnect(
+            request,
+            run_batch_analysis(
+                req.product_text, [(v.variant, v.spec) for v in req.variants], req.limit, user_id=user.id,
+            ),
+            "patent_analysis_batch",
+        )
+    except ClientDisconnected:
+        raise
+    except Exception:
+        log.exception("Batch patent analysis failed — returning mock fallback")
+        return BatchAnalysisResponse(results=[_mock_analysis_response(r) for r in single_reqs])
+
+    # Deduct credits after successful analysis (admin bypass)
+    if not user.is_admin:
+        from app.services.credits import deduct_credit
+        await deduct_credit(
+            session, user.id,
+            transaction_type="patent_analysis",
+            description=f"Batch patent analysis ({credit_cost} variants) for: {req.product_text[:80]}",
+            amount=credit_cost,
+        )
+        await session.commit()
+
+    return BatchAnalysisResponse(results=results, **stats)
+
+
+# ── Background analysis jobs ─────────────────────────────────────────
+
+async def _job_status(job: AnalysisJob) -> AnalysisJobStatus:
+    return AnalysisJobStatus(
+        job_id=str(job.id),
+        status=job.status,
+        progress=job.progress,
+        error="Analysis failed." if job.status == "failed" else None,
+        created_at=job.created_at.isoformat(),
+        finished_at=job.finished_at.isoformat() if job.finished_at else None,
+        result=await analysis_jobs.job_result(job) if job.status == "succeeded" else None,
+    )
+
+
+@router.post("/analyze/jobs", response_model=AnalysisJobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_analysis_job(
+    req: AnalysisJobRequest,
+    user: User = Depends(require_credits),
+    session: AsyncSession = Depends(get_session),
+):
+    """Submit a patent analysis to run in the background. Poll or stream for the result."""
+    session_id = None
+    if req.session_id:
+        result = await session.execute(
+            select(Session.id).where(Session.id == req.session_id, Session.user_id == user.id)
+        )
+        session_id = result.scalar_one_or_none()
+        if session_id is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+    analysis_req = PatentAnalysisRequest(**req.model_dump(exclude={"session_id"}))
+
+    has_pv_key = bool(settings.patentsview_api_key)
+    has_llm_key = (
+        (settings.llm_provider == "anthropic" and settings.anthropic_api_key)
+        or (settings.llm_provider == "openai" and settings.openai_api_key)
+    )
+    precomputed = None
+    if not has_pv_key and not has_llm_key:
+        log.warning("No API keys configured — completing job with mock analysis")
+        precomputed = _mock_analysis_response(analysis_req)
+
+    job = await analysis_jobs.submit_job(
+        session, user, analysis_req, session_id=session_id, precomputed=precomputed,
+    )
+    return await _job_status(job)
+
+
+@router.get("/analyze/jobs/{job_id}", response_model=AnalysisJobStatus)
+async def get_analysis_job(
+    job_id: uuid.UUID,
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    job = await analysis_jobs.get_job(session, job_id, user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await _job_status(job)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/analyze/jobs/{job_id}/events")
+async def stream_analysis_job(
+    job_id: uuid.UUID,
+    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    """Server-sent progress events for a job. Ends with a succeeded/failed event."""
+    queue = analysis_jobs.open_subscription(job_id)
+    job = await analysis_jobs.get_job(session, job_id, user.id)
+    if job is None:
+        analysis_jobs.close_subscription(job_id, queue)
+        raise HTTPException(status_code=404, detail="Job not found")
+    snapshot = {"status": job.status, "progress": job.progress}
+
+    async def events():
+        try:
+            yield _sse("status", snapshot)
+            if snapshot["status"] in analysis_jobs.TERMINAL_STATUSES:
+                return
+            async for item in analysis_jobs.iter_events(queue):
+                event = item.pop("event")
+                if event == "keepalive":
+                    yield ": keepalive\n\n"
+                else:
+                    yield _sse(event, item)
+        finally:
+            analysis_jobs.close_subscription(job_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,24 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
 import logging
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import delete, func, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 
 from app.auth.dependencies import get_current_user
-from app.models.database import get_session
+from app.core import metrics
+from app.core.config import settings
+from app.models.database import async_session, get_session
 from app.models.session import Session
 from app.models.user import User
 from app.schemas.session import (
@@ -14,44 +27,158 @@ from app.schemas.session import (
     SessionListResponse,
     SessionSummary,
     SessionUpdate,
+    SessionUpdateAck,
 )
-from app.services.encryption import decrypt_json, decrypt_text, encrypt_json, encrypt_text
+from app.services import artifacts
+from app.services.data_keys import cipher_for
+from app.services.encryption import UserCipher
 
 log = logging.getLogger("mousetrap.routes_sessions")
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
+# Columns _to_summary reads; the large encrypted blobs are never loaded for lists
+_SUMMARY_COLUMNS = (
+    Session.id, Session.title, Session.product_text, Session.status,
+    Session.created_at, Session.updated_at, Session.version,
+)
+
+JSON_FIELDS = {
+    "variants_json", "selected_variant_json", "spec_json",
+    "patent_hits_json", "patent_draft_json", "prototype_json",
+}
+TEXT_FIELDS = {"product_text", "title", "export_markdown", "export_plain_text"}
+DETAIL_FIELDS = tuple(f for f in SessionDetail.model_fields if f != "id")
+
+# Large text artifacts served as documents from the per-field sub-resource
+_DOCUMENT_MEDIA_TYPES = {
+    "export_markdown": "text/markdown; charset=utf-8",
+    "export_plain_text": "text/plain; charset=utf-8",
+}
+_STREAM_CHUNK_CHARS = 64 * 1024
 
-def _to_summary(s: Session) -> SessionSummary:
-    pt = decrypt_text(s.product_text) or ""
+
+def _to_summary(s: Session, cipher: UserCipher) -> SessionSummary:
+    pt = cipher.decrypt_text(s.product_text) or ""
     return SessionSummary(
         id=str(s.id),
-        title=decrypt_text(s.title),
+        title=cipher.decrypt_text(s.title),
         product_text=pt[:100],
         status=s.status,
         created_at=s.created_at.isoformat(),
         updated_at=s.updated_at.isoformat(),
+        version=s.version,
     )
 
 
-def _to_detail(s: Session) -> SessionDetail:
+# ── Conditional requests ─────────────────────────────────────────────
+
+def _etag(version: int) -> str:
+    return f'"v{version}"'
+
+
+def _list_etag(sessions: list[Session], next_cursor: str | None) -> str:
+    """Weak validator for one page of the list, from ids and versions only."""
+    raw = ",".join(f"{s.id}:{s.version}" for s in sessions) + f"|{next_cursor}"
+    return f'W/"{hashlib.sha256(raw.encode()).hexdigest()[:32]}"'
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    """Weak comparison against an If-None-Match header value."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def _etag_versions(header: str | None) -> list[int] | None:
+    """Versions named by an If-Match header; None when it doesn't constrain (absent or ``*``)."""
+    if not header or header.strip() == "*":
+        return None
+    versions = []
+    for tag in header.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        if tag.startswith("v") and tag[1:].isdigit():
+            versions.append(int(tag[1:]))
+    return versions
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+async def _current_version(db: AsyncSession, session_id: str, user: User) -> int:
+    result = await db.execute(
+        select(Session.version).where(Session.id == session_id, Session.user_id == user.id)
+    )
+    version = result.scalar_one_or_none()
+    if version is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return version
+
+
+def _field_value(s: Session, field: str, cipher: UserCipher):
+    raw = getattr(s, field)
+    if field in JSON_FIELDS:
+        return cipher.decrypt_json(raw)
+    if field in TEXT_FIELDS:
+        return cipher.decrypt_text(raw)
+    if isinstance(raw, datetime):
+        return raw.isoformat()
+    return raw
+
+
+def _parse_fields(fields: str) -> list[str]:
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in DETAIL_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}. Choose from: {', '.join(DETAIL_FIELDS)}",
+        )
+    return requested
+
+
+async def _load_session(db: AsyncSession, session_id: str, user: User, columns: list[str] | None = None) -> Session:
+    """The user's session, loading only ``columns`` (plus id and version) when given."""
+    stmt = select(Session).where(Session.id == session_id, Session.user_id == user.id)
+    if columns is not None:
+        stmt = stmt.options(
+            load_only(Session.id, Session.version, *(getattr(Session, c) for c in columns), raiseload=True)
+        )
+    result = await db.execute(stmt)
+    session = result.scalar_one_or_none()
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+def _chunks(text: str):
+    for i in range(0, len(text), _STREAM_CHUNK_CHARS):
+        yield text[i:i + _STREAM_CHUNK_CHARS]
+
+
+def _to_detail(s: Session, cipher: UserCipher) -> SessionDetail:
     return SessionDetail(
         id=str(s.id),
-        product_text=decrypt_text(s.product_text) or "",
+        product_text=cipher.decrypt_text(s.product_text) or "",
         product_url=s.product_url,
-        variants_json=decrypt_json(s.variants_json),
-        selected_variant_json=decrypt_json(s.selected_variant_json),
-        spec_json=decrypt_json(s.spec_json),
-        patent_hits_json=decrypt_json(s.patent_hits_json),
+        variants_json=cipher.decrypt_json(s.variants_json),
+        selected_variant_json=cipher.decrypt_json(s.selected_variant_json),
+        spec_json=cipher.decrypt_json(s.spec_json),
+        patent_hits_json=cipher.decrypt_json(s.patent_hits_json),
         patent_confidence=s.patent_confidence,
-        export_markdown=decrypt_text(s.export_markdown),
-        export_plain_text=decrypt_text(s.export_plain_text),
-        patent_draft_json=decrypt_json(s.patent_draft_json),
-        prototype_json=decrypt_json(s.prototype_json),
+        export_markdown=cipher.decrypt_text(s.export_markdown),
+        export_plain_text=cipher.decrypt_text(s.export_plain_text),
+        patent_draft_json=cipher.decrypt_json(s.patent_draft_json),
+        prototype_json=cipher.decrypt_json(s.prototype_json),
         status=s.status,
-        title=decrypt_text(s.title),
+        title=cipher.decrypt_text(s.title),
         created_at=s.created_at.isoformat(),
         updated_at=s.updated_at.isoformat(),
+        version=s.version,
     )
 
 
@@ -61,78 +188,296 @@ async def create_session(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_session),
 ):
+    cipher = await cipher_for(user.id)
     session = Session(
         user_id=user.id,
-        product_text=encrypt_text(req.product_text),
+        product_text=cipher.encrypt_text(req.product_text),
         product_url=req.product_url,
     )
     db.add(session)
     await db.commit()
     await db.refresh(session)
-    return _to_detail(session)
+    return _to_detail(session, cipher)
+
+
+def _encode_cursor(s: Session) -> str:
+    raw = f"{s.updated_at.isoformat()}|{s.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, session_id = raw.split("|", 1)
+        return datetime.fromisoformat(updated_at), uuid.UUID(session_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
 
 
 @router.get("/", response_model=SessionListResponse)
 async def list_sessions(
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: str | None = None,
+    if_none_match: str | None = Header(None),
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_session),
 ):
-    result = await db.execute(
+    """Most recently updated first. Pass ``next_cursor`` back as ``cursor`` for the next page.
+
+    The page's ETag is derived from session ids and versions, so a matching
+    ``If-None-Match`` gets a 304 before anything is decrypted.
+    """
+    stmt = (
         select(Session)
+        .options(load_only(*_SUMMARY_COLUMNS, raiseload=True))
         .where(Session.user_id == user.id)
-        .order_by(Session.updated_at.desc())
-        .limit(50)
+        .order_by(Session.updated_at.desc(), Session.id.desc())
+        .limit(limit + 1)
     )
+    if cursor:
+        stmt = stmt.where(tuple_(Session.updated_at, Session.id) < tuple_(*_decode_cursor(cursor)))
+    result = await db.execute(stmt)
     sessions = result.scalars().all()
-    return SessionListResponse(sessions=[_to_summary(s) for s in sessions])
+
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_cursor = _encode_cursor(sessions[-1])
+
+    etag = _list_etag(sessions, next_cursor)
+    if _etag_matches(if_none_match, etag):
+        return _not_modified(etag)
+    response.headers["ETag"] = etag
+    cipher = await cipher_for(user.id)
+    return SessionListResponse(sessions=[_to_summary(s, cipher) for s in sessions], next_cursor=next_cursor)
+
+
+# ── Bulk export ──────────────────────────────────────────────────────
+
+def _detail_lines(batch: list[Session], cipher: UserCipher) -> str:
+    return "".join(_to_detail(s, cipher).model_dump_json() + "\n" for s in batch)
+
+
+async def _export_batches(user_id: uuid.UUID):
+    """NDJSON for all the user's sessions, oldest first, one string per batch.
+
+    Rows come from a server-side cursor a batch at a time; each batch's
+    artifacts are fetched with one query and its rows are decrypted across
+    a bounded number of threads, so memory stays flat however many sessions
+    the user has.  Uses its own DB session as it outlives the request.
+    """
+    workers = max(1, settings.session_export_decrypt_workers)
+    cipher = await cipher_for(user_id)
+    async with async_session() as db:
+        result = await db.stream(
+            select(Session)
+            .where(Session.user_id == user_id)
+            .order_by(Session.created_at, Session.id)
+            .execution_options(yield_per=settings.session_export_batch_size)
+        )
+        async for batch in result.scalars().partitions():
+            await artifacts.resolve_many(db, user_id, batch)
+            step = -(-len(batch) // workers)
+            parts = await asyncio.gather(*(
+                asyncio.to_thread(_detail_lines, batch[i:i + step], cipher) for i in range(0, len(batch), step)
+            ))
+            metrics.inc("sessions.exported", len(batch))
+            yield "".join(parts)
+
+
+class _ZipSink(io.RawIOBase):
+    """Unseekable write target that hands zipfile's output back in pieces."""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+        self.pending = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        self.pending += len(b)
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        self.pending = 0
+        return data
+
+
+async def _export_ndjson(user_id: uuid.UUID):
+    async for text in _export_batches(user_id):
+        yield text.encode("utf-8")
+
+
+async def _export_zip(user_id: uuid.UUID):
+    """The NDJSON export as a single deflated ``sessions.ndjson`` entry, streamed.
+
+    Each batch is deflated in a worker thread, off the event loop.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        with zf.open("sessions.ndjson", "w", force_zip64=True) as entry:
+            async for text in _export_batches(user_id):
+                await asyncio.to_thread(lambda: entry.write(text.encode("utf-8")))
+                if sink.pending >= _STREAM_CHUNK_CHARS:
+                    yield sink.drain()
+    yield sink.drain()
+
+
+@router.get("/export")
+async def export_sessions(
+    format: Literal["ndjson", "zip"] = Query("ndjson"),
+    user: User = Depends(get_current_user),
+):
+    """Every session of the user as full details, streamed.
+
+    ``ndjson`` has one SessionDetail object per line; ``zip`` holds the same
+    lines in a compressed ``sessions.ndjson``.
+    """
+    filename = f"sessions-{datetime.now(timezone.utc):%Y%m%d}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "X-Accel-Buffering": "no"}
+    if format == "zip":
+        return StreamingResponse(_export_zip(user.id), media_type="application/zip", headers=headers)
+    return StreamingResponse(_export_ndjson(user.id), media_type="application/x-ndjson", headers=headers)
 
 
 @router.get("/{session_id}", response_model=SessionDetail)
 async def get_session_detail(
     session_id: str,
+    response: Response,
+    fields: str | None = Query(None, description="Comma-separated subset of fields to return"),
+    if_none_match: str | None = Header(None),
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_session),
 ):
-    result = await db.execute(
-        select(Session).where(Session.id == session_id, Session.user_id == user.id)
+    """Full session detail, or with ``fields=`` only ``id`` and the named fields.
+
+    Only the selected columns, and the artifacts they reference, are read
+    from the database and decrypted.  The ETag is the session version; a
+    matching ``If-None-Match`` is answered 304 after reading just that column.
+    """
+    requested = _parse_fields(fields) if fields is not None else None
+    if if_none_match:
+        etag = _etag(await _current_version(db, session_id, user))
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+
+    session = await _load_session(db, session_id, user, requested)
+    await artifacts.resolve(db, user.id, session, requested)
+    cipher = await cipher_for(user.id)
+    etag = _etag(session.version)
+    if requested is None:
+        response.headers["ETag"] = etag
+        return _to_detail(session, cipher)
+    return JSONResponse(
+        {"id": str(session.id), **{f: _field_value(session, f, cipher) for f in requested}},
+        headers={"ETag": etag},
     )
-    session = result.scalar_one_or_none()
-    if session is None:
-        raise HTTPException(status_code=404, detail="Session not found")
-    return _to_detail(session)
 
 
-@router.patch("/{session_id}", response_model=SessionDetail)
-async def update_session(
+@router.get("/{session_id}/fields/{field}")
+async def get_session_field(
     session_id: str,
-    req: SessionUpdate,
+    field: str,
+    if_none_match: str | None = Header(None),
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_session),
 ):
-    result = await db.execute(
-        select(Session).where(Session.id == session_id, Session.user_id == user.id)
+    """One field of a session, loaded and decrypted on its own.
+
+    Exports are streamed as markdown / plain-text documents; other fields are
+    returned as their JSON value (streamed in chunks, as drafts and hit lists
+    run to hundreds of kilobytes).  Conditional GET works as for the detail.
+    """
+    _parse_fields(field)
+    if if_none_match:
+        etag = _etag(await _current_version(db, session_id, user))
+        if _etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+
+    session = await _load_session(db, session_id, user, [field])
+    await artifacts.resolve(db, user.id, session, [field])
+    value = _field_value(session, field, await cipher_for(user.id))
+    headers = {"ETag": _etag(session.version)}
+
+    if field in _DOCUMENT_MEDIA_TYPES:
+        if value is None:
+            raise HTTPException(status_code=404, detail=f"Session has no {field}")
+        return StreamingResponse(_chunks(value), media_type=_DOCUMENT_MEDIA_TYPES[field], headers=headers)
+    return StreamingResponse(
+        _chunks(json.dumps(value, ensure_ascii=False)), media_type="application/json", headers=headers,
     )
-    session = result.scalar_one_or_none()
-    if session is None:
-        raise HTTPException(status_code=404, detail="Session not found")
 
-    json_fields = {
-        "variants_json", "selected_variant_json", "spec_json",
-        "patent_hits_json", "patent_draft_json", "prototype_json",
-    }
-    text_fields = {"title", "export_markdown", "export_plain_text"}
 
+@router.patch("/{session_id}", response_model=SessionUpdateAck | SessionDetail)
+async def update_session(
+    session_id: str,
+    req: SessionUpdate,
+    response: Response,
+    returning: Literal["ack", "fields", "full"] = Query(
+        "ack", description="ack: id + new version; fields: also echo the updated fields; full: SessionDetail",
+    ),
+    if_match: str | None = Header(None),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+):
+    """Update fields with a single UPDATE … RETURNING.
+
+    With ``If-Match`` the update only applies to that version (else 412).
+    An empty update writes nothing and returns the current version.
+    Nothing is read back or decrypted unless ``returning=full``.  Large
+    hit lists, drafts and exports are written to the artifact store and the
+    row gets a reference (see app.services.artifacts).
+    """
     update_data = req.model_dump(exclude_none=True)
+    values = {}
+    cipher = await cipher_for(user.id)
     for key, value in update_data.items():
-        if key in json_fields:
-            value = encrypt_json(value)
-        elif key in text_fields:
-            value = encrypt_text(value)
-        setattr(session, key, value)
+        if key in artifacts.ARTIFACT_FIELDS:
+            value = await artifacts.encode_field(db, user.id, key, value)
+        elif key in JSON_FIELDS:
+            value = cipher.encrypt_json(value)
+        elif key in TEXT_FIELDS:
+            value = cipher.encrypt_text(value)
+        values[key] = value
 
-    await db.commit()
-    await db.refresh(session)
-    return _to_detail(session)
+    expected = _etag_versions(if_match)
+    if values:
+        stmt = (
+            update(Session)
+            .where(Session.id == session_id, Session.user_id == user.id)
+            .values(**values, version=Session.version + 1, updated_at=func.now())
+            .returning(Session.id, Session.version, Session.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        stmt = select(Session.id, Session.version, Session.updated_at).where(
+            Session.id == session_id, Session.user_id == user.id,
+        )
+    if expected is not None:
+        stmt = stmt.where(Session.version.in_(expected))
+    row = (await db.execute(stmt)).one_or_none()
+    if row is None:
+        await _current_version(db, session_id, user)  # 404 if it doesn't exist
+        raise HTTPException(status_code=412, detail="Session was modified elsewhere; reload and retry")
+    if values:
+        await db.commit()
+
+    response.headers["ETag"] = _etag(row.version)
+    if returning == "full":
+        session = await _load_session(db, session_id, user)
+        await artifacts.resolve(db, user.id, session)
+        return _to_detail(session, cipher)
+    return SessionUpdateAck(
+        id=str(row.id),
+        version=row.version,
+        updated_at=row.updated_at.isoformat(),
+        fields=update_data if returning == "fields" else None,
+    )
 
 
 @router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -141,12 +486,10 @@ async def delete_session(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_session),
 ):
+    # Core DELETE: no version check, so a concurrent update can't make it fail
     result = await db.execute(
-        select(Session).where(Session.id == session_id, Session.user_id == user.id)
+        delete(Session).where(Session.id == session_id, Session.user_id == user.id)
     )
-    session = result.scalar_one_or_none()
-    if session is None:
+    if not result.rowcount:
         raise HTTPException(status_code=404, detail="Session not found")
-
-    await db.delete(session)
     await db.commit()
@@ -30,23 +30,31 @@ async def require_credits(
     return user
 
 
+async def check_credits(session: AsyncSession, user: User, amount: int, message: str | None = None) -> None:
+    """Raise 402 unless the user has >= ``amount`` credits. Admins bypass.
+
+    For costs that depend on the request body, where a dependency can't know the amount.
+    """
+    if user.is_admin:
+        return
+    balance = await get_balance(session, user.id)
+    if balance < amount:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail={
+                "error": "insufficient_credits",
+                "message": message or f"You need {amount} credits for this feature. Purchase more in the app.",
+                "balance": balance,
+            },
+        )
+
+
 def require_credits_amount(amount: int):
     """Factory: verify the user has >= N credits. Admins bypass."""
     async def _guard(
         user: User = Depends(get_current_user),
         session: AsyncSession = Depends(get_session),
     ) -> User:
-        if user.is_admin:
-            return user
-        balance = await get_balance(session, user.id)
-        if balance < amount:
-            raise HTTPException(
-                status_code=status.HTTP_402_PAYMENT_REQUIRED,
-                detail={
-                    "error": "insufficient_credits",
-                    "message": f"You need {amount} credits for this feature. Purchase more in the app.",
-                    "balance": balance,
-                },
-            )
+        await check_credits(session, user, amount)
         return user
     return _guard
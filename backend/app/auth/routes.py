@@ -16,10 +16,11 @@ from app.auth.apple import verify_apple_identity_token
 from app.auth.dependencies import get_current_user
 from app.auth.security import create_access_token, decode_access_token, hash_password, verify_password
 from app.core.limiter import limiter
-from app.models.credit import CreditTransaction
 from app.models.database import get_session
-from app.models.session import Session
 from app.models.user import InviteCode, PasswordResetCode, User
+from app.services import data_keys
+from app.services.account_purge import purge_account
+from app.services.account_purge import start_purge as start_account_purge
 from app.services.credits import get_balance, grant_signup_bonus
 from app.services.email import send_reset_code
 
@@ -254,29 +255,42 @@ async def delete_account(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    """Permanently delete the current user's account and all associated data."""
+    """Permanently delete the current user's account and all associated data.
+
+    The user's data key is deleted, which makes their encrypted session data
+    unreadable at once, and the account is anonymized and deactivated.  The
+    rows themselves are removed by a background purge — or right away while
+    some of the user's data is still under the master keys, which shredding
+    the data key wouldn't make unreadable.
+    """
     user_id = current_user.id
     log.info("Account deletion requested for user %s (%s)", user_id, current_user.email)
 
-    # Delete all user data in order (child tables first)
+    legacy = await data_keys.has_legacy_tokens(session, user_id)
+    await data_keys.shred(session, user_id)
     await session.execute(
-        select(PasswordResetCode).where(PasswordResetCode.user_id == user_id).execution_options(synchronize_session="fetch")
-    )
-    from sqlalchemy import delete as sql_delete
-    await session.execute(sql_delete(PasswordResetCode).where(PasswordResetCode.user_id == user_id))
-    await session.execute(sql_delete(CreditTransaction).where(CreditTransaction.user_id == user_id))
-    await session.execute(sql_delete(Session).where(Session.user_id == user_id))
-
-    # Clear invite code references
-    await session.execute(
-        update(InviteCode).where(InviteCode.used_by == user_id).values(used_by=None, used_at=None)
+        update(User)
+        .where(User.id == user_id)
+        .values(
+            email=f"deleted-{user_id}@deleted.invalid",
+            password_hash=None,
+            apple_user_id=None,
+            is_active=False,
+            deleted_at=datetime.now(timezone.utc),
+        )
     )
-
-    # Delete the user
-    await session.execute(sql_delete(User).where(User.id == user_id))
     await session.commit()
-
-    log.info("Account deleted for user %s", user_id)
+    purged = False
+    if legacy:
+        try:
+            await purge_account(user_id)
+            purged = True
+        except Exception:
+            log.exception("Synchronous purge of account %s failed; queued for retry", user_id)
+    if not purged:
+        start_account_purge()
+
+    log.info("Account deleted for user %s (%s)", user_id, "data purged" if purged else "data purge queued")
     return MessageResponse(message="Account deleted successfully")
 
 
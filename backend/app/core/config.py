@@ -11,9 +11,52 @@ class Settings(BaseSettings):
     llm_provider: str = "anthropic"  # "anthropic" or "openai"
     llm_model: str = "claude-sonnet-4-20250514"
     llm_max_tokens: int = 4096
+    prompt_patent_token_budget: int = 0  # patent block budget for Step 4/rerank; 0 = per-model default
 
     # PatentsView
     patentsview_base_url: str = "https://search.patentsview.org/api/v1"
+    patentsview_cache_ttl_seconds: int = 3600  # in-process query result cache; 0 disables
+    patentsview_cache_max_entries: int = 2000
+    cpc_scheme_path: str = ""  # full CPC scheme TSV (code<TAB>title); empty = bundled subset
+
+    # Background analysis jobs
+    analysis_job_workers: int = 2  # max concurrent analyses per process
+    analysis_job_keepalive_seconds: float = 15.0  # SSE keepalive interval
+    analysis_job_stale_seconds: float = 1800.0  # a job running longer than this is presumed orphaned
+    analysis_checkpoint_ttl_hours: int = 24  # how long step checkpoints can be resumed
+
+    # Analysis deadlines (seconds) — searches and Step 1 give way to Step 4
+    analysis_deadline_seconds: float = 120.0  # end-to-end budget for /patents/analyze
+    analysis_job_deadline_seconds: float = 600.0  # budget for background jobs
+    analysis_step1_timeout_seconds: float = 45.0  # invention analysis before fallback
+    analysis_step4_reserve_seconds: float = 40.0  # kept back for professional analysis
+    analysis_step4_min_seconds: float = 10.0  # below this, skip to the heuristic fallback
+
+    # Step 1 similarity cache (reuse invention analyses for near-identical specs)
+    invention_cache_threshold: float = 0.7  # min estimated Jaccard to reuse; 0 disables
+    invention_cache_max_entries: int = 2000
+    invention_cache_audit_rate: float = 0.05  # fraction of hits re-run fresh to measure drift
+
+    # Search pruning by per-source yield
+    search_pruning_load_threshold: int = 3  # concurrent analyses searching before pruning; 0 disables
+    search_pruning_min_yield: float = 0.05  # top-N hits per query below which a source is trimmed
+    search_pruning_min_samples: int = 20  # analyses recorded before a source's yield is trusted
+
+    # Quick scan (no-LLM crowdedness check)
+    quick_scan_budget_seconds: float = 0.8
+
+    # Provisional patent drafts (outline, then sections generated concurrently)
+    patent_draft_section_attempts: int = 2  # tries per section before its fallback is used
+
+    # Session artifact store (large payloads kept out of the sessions row)
+    artifact_min_bytes: int = 4096  # smaller values stay inline in the sessions row
+    artifact_hmac_key: str = ""  # keys artifact digests; empty = derived from JWT_SECRET_KEY
+    artifact_migration_batch_size: int = 200  # sessions per batch when moving inline payloads out
+    artifact_migration_pause_seconds: float = 0.5  # sleep between batches
+
+    # Bulk session export (GET /sessions/export)
+    session_export_batch_size: int = 100  # rows fetched per server-side cursor batch
+    session_export_decrypt_workers: int = 4  # threads decrypting a batch concurrently
 
     # Database
     database_url: str = "postgresql+asyncpg://localhost:5432/bettermousetrap"
@@ -36,6 +79,14 @@ class Settings(BaseSettings):
 
     # Encryption (comma-separated Fernet keys for rotation; empty = disabled)
     encryption_keys: str = ""
+    key_rotation_batch_size: int = 200  # rows re-encrypted per transaction
+    key_rotation_duty_cycle: float = 0.2  # max fraction of wall time spent rotating; sleeps scale with batch time
+    user_key_cache_size: int = 4096  # unwrapped per-user data keys kept in memory
+    user_key_cache_ttl_seconds: float = 300.0  # bounds how long another worker can use a shredded key
+    user_key_migration_batch_size: int = 200  # rows per batch when moving master-key tokens onto data keys
+    user_key_migration_pause_seconds: float = 0.5  # sleep between batches
+    account_purge_batch_size: int = 500  # rows deleted per transaction when purging deleted accounts
+    account_purge_interval_seconds: float = 3600.0  # how often deleted accounts whose purge failed are retried
 
     # App
     app_name: str = "MouseTrap"
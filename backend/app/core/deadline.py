@@ -0,0 +1,24 @@
+"""Per-request time budget carried through multi-step workflows."""
+
+import time
+
+
+class Deadline:
+    """An absolute point in time (monotonic) that work must finish by."""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def sub(self, seconds: float | None = None, reserve: float = 0.0) -> "Deadline":
+        """A child deadline: at most ``seconds`` from now, and ``reserve`` seconds before this one."""
+        child = Deadline(0)
+        limit = self.expires_at - reserve
+        child.expires_at = min(limit, time.monotonic() + seconds) if seconds is not None else limit
+        return child
@@ -0,0 +1,52 @@
+"""Cancel in-flight work when the HTTP client goes away."""
+
+import asyncio
+import logging
+from collections.abc import Awaitable
+from typing import TypeVar
+
+from fastapi import Request, Response
+
+from app.core import metrics
+
+log = logging.getLogger("mousetrap.disconnect")
+
+T = TypeVar("T")
+
+# How often to check whether the client is still connected
+POLL_INTERVAL_SECONDS = 1.0
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client disconnected and the work was cancelled."""
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T], operation: str) -> T:
+    """Await ``work``, cancelling it if the client disconnects first.
+
+    Cancellation propagates into search tasks and LLM calls (see
+    call_llm_async).  Abandoned work is counted as
+    ``abandoned.<operation>`` and ClientDisconnected is raised, so callers
+    never reach their credit deduction.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=POLL_INTERVAL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                break
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    metrics.inc(f"abandoned.{operation}")
+    log.info("Client disconnected — cancelled %s", operation)
+    raise ClientDisconnected(operation)
+
+
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected) -> Response:
+    # Nobody is listening; 499 (nginx "client closed request") keeps access logs honest
+    return Response(status_code=499)
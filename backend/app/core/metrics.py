@@ -0,0 +1,35 @@
+"""In-process counters for operational metrics (per worker process, reset on restart)."""
+
+import threading
+from collections import Counter
+
+_lock = threading.Lock()
+_counters: Counter[str] = Counter()
+_summaries: dict[str, dict[str, float]] = {}
+
+
+def inc(name: str, amount: int = 1) -> None:
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name: str, value: float) -> None:
+    """Record a sample; snapshots report count, sum, mean and max."""
+    with _lock:
+        s = _summaries.setdefault(name, {"count": 0, "sum": 0.0, "max": value})
+        s["count"] += 1
+        s["sum"] += value
+        s["max"] = max(s["max"], value)
+
+
+def snapshot() -> dict[str, int]:
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def summaries() -> dict[str, dict[str, float]]:
+    with _lock:
+        return {
+            name: {**s, "mean": s["sum"] / s["count"]}
+            for name, s in sorted(_summaries.items())
+        }
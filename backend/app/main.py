@@ -12,6 +12,7 @@ from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from sqlalchemy import text
 
+from app.api.routes_admin import router as admin_router
 from app.api.routes_build_this import router as build_router
 from app.api.routes_credits import router as credits_router
 from app.api.routes_export import router as export_router
@@ -22,9 +23,21 @@ from app.api.routes_sessions import router as sessions_router
 from app.auth.bootstrap import ensure_admin_user
 from app.auth.routes import router as auth_router
 from app.core.config import settings
+from app.core.disconnect import ClientDisconnected, client_disconnected_handler
 from app.core.limiter import limiter
 from app.models.database import async_session
+from app.services.account_purge import start_purge as start_account_purge
+from app.services.account_purge import stop_purge as stop_account_purge
+from app.services.analysis_checkpoints import purge_expired_checkpoints
+from app.services.analysis_jobs import start_workers as start_analysis_workers
+from app.services.analysis_jobs import stop_workers as stop_analysis_workers
+from app.services.artifacts import start_migration as start_artifact_migration
+from app.services.artifacts import stop_migration as stop_artifact_migration
+from app.services.data_keys import start_migration as start_data_key_migration
+from app.services.data_keys import stop_migration as stop_data_key_migration
 from app.services.encryption import validate_keys as validate_encryption_keys
+from app.services.key_rotation import resume_rotation as resume_key_rotation
+from app.services.key_rotation import stop_rotation as stop_key_rotation
 
 # ── Logging ──────────────────────────────────────────────────────
 if not settings.debug:
@@ -43,6 +56,7 @@ app = FastAPI(title=settings.app_name, debug=settings.debug)
 # ── Rate limiting ───────────────────────────────────────────────────
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+app.add_exception_handler(ClientDisconnected, client_disconnected_handler)
 
 # ── CORS ────────────────────────────────────────────────────────────
 app.add_middleware(
@@ -62,6 +76,7 @@ app.include_router(export_router)
 app.include_router(sessions_router)
 app.include_router(build_router)
 app.include_router(insights_router)
+app.include_router(admin_router)
 
 
 # ── Global exception handler — surface real errors ────────────────
@@ -131,10 +146,39 @@ async def on_startup():
     except Exception:
         log.warning("Could not ensure admin user (database may be unreachable). Will retry on first request.")
 
+    try:
+        await start_analysis_workers()
+    except Exception:
+        log.warning("Could not recover analysis jobs (database may be unreachable).")
+
+    try:
+        purged = await purge_expired_checkpoints()
+        if purged:
+            log.info("Purged %d expired analysis checkpoints", purged)
+    except Exception:
+        log.warning("Could not purge analysis checkpoints (database may be unreachable).")
+
+    # Move large inline session payloads into the artifact store (throttled, in the background)
+    start_artifact_migration()
+
+    # Re-encrypt rows still on old keys when ENCRYPTION_KEYS lists more than one
+    resume_key_rotation()
+
+    # Move session data still under the master keys onto per-user data keys
+    start_data_key_migration()
+
+    # Finish removing the rows of accounts deleted before the last shutdown
+    start_account_purge()
+
 
 @app.on_event("shutdown")
 async def on_shutdown():
     from app.services.patentsview import close_async_client
+    await stop_analysis_workers()
+    await stop_artifact_migration()
+    await stop_key_rotation()
+    await stop_data_key_migration()
+    await stop_account_purge()
     await close_async_client()
 
 
@@ -1,5 +1,16 @@
 from app.models.user import Base, InviteCode, PasswordResetCode, User
 from app.models.session import Session
 from app.models.credit import CreditTransaction
+from app.models.job import AnalysisJob
+from app.models.checkpoint import AnalysisCheckpoint
+from app.models.patent_document import PatentDocument
+from app.models.draft_section import PatentDraftSection
+from app.models.artifact import SessionArtifact
+from app.models.key_rotation import KeyRotationRun
+from app.models.data_key import UserDataKey
 
-__all__ = ["Base", "User", "InviteCode", "PasswordResetCode", "Session", "CreditTransaction"]
+__all__ = [
+    "Base", "User", "InviteCode", "PasswordResetCode", "Session", "CreditTransaction",
+    "AnalysisJob", "AnalysisCheckpoint", "PatentDocument", "PatentDraftSection",
+    "SessionArtifact", "KeyRotationRun", "UserDataKey",
+]
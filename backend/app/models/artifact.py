@@ -0,0 +1,20 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.user import Base
+
+
+class SessionArtifact(Base):
+    """Large session payload stored once per user under a keyed content hash."""
+
+    __tablename__ = "session_artifacts"
+
+    digest: Mapped[str] = mapped_column(String(64), primary_key=True)  # HMAC-SHA256 over user id + content
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    content: Mapped[str] = mapped_column(Text, nullable=False)  # encrypted, same format as the inline column
+    size: Mapped[int] = mapped_column(Integer, nullable=False)  # plaintext bytes
+    stored_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())  # last written or re-used
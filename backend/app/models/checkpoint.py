@@ -0,0 +1,18 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, String, Text, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.user import Base
+
+
+class AnalysisCheckpoint(Base):
+    __tablename__ = "analysis_checkpoints"
+
+    fingerprint: Mapped[str] = mapped_column(String(64), primary_key=True)
+    step: Mapped[str] = mapped_column(String(30), primary_key=True)  # invention, raw_hits, scored, analysis
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)  # encrypted
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -15,7 +15,7 @@ class CreditTransaction(Base):
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
     amount: Mapped[int] = mapped_column(Integer, nullable=False)  # positive = granted, negative = spent
     balance_after: Mapped[int] = mapped_column(Integer, nullable=False)
-    transaction_type: Mapped[str] = mapped_column(String(50), nullable=False)  # signup_bonus, purchase, idea_generation, patent_analysis
+    transaction_type: Mapped[str] = mapped_column(String(50), nullable=False)  # signup_bonus, purchase, idea_generation, patent_analysis, refund
     apple_transaction_id: Mapped[str | None] = mapped_column(String(255), unique=True, nullable=True, index=True)
     reference_id: Mapped[str | None] = mapped_column(String(255), nullable=True)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -0,0 +1,18 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Text, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.user import Base
+
+
+class UserDataKey(Base):
+    """A user's data key, wrapped by the master encryption keys. Deleting it crypto-shreds their data."""
+
+    __tablename__ = "user_data_keys"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    wrapped_key: Mapped[str] = mapped_column(Text, nullable=False)  # Fernet key encrypted with the master keys
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
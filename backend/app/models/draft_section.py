@@ -0,0 +1,22 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.user import Base
+
+
+class PatentDraftSection(Base):
+    __tablename__ = "patent_draft_sections"
+    __table_args__ = (UniqueConstraint("session_id", "section", "version", name="uq_patent_draft_sections_version"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    session_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    section: Mapped[str] = mapped_column(String(30), nullable=False)  # request, outline, background, summary, ...
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    content: Mapped[str] = mapped_column(Text, nullable=False)  # encrypted
+    is_fallback: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="false")  # template text, not generated
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
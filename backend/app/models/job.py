@@ -0,0 +1,26 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.user import Base
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    session_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("sessions.id", ondelete="SET NULL"), nullable=True)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default="queued", index=True)  # queued, running, succeeded, failed
+    progress: Mapped[str | None] = mapped_column(String(50), nullable=True)  # last completed workflow step
+    request_json: Mapped[str] = mapped_column(Text, nullable=False)  # encrypted
+    result_json: Mapped[str | None] = mapped_column(Text, nullable=True)  # encrypted
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    credits_reserved: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    credit_state: Mapped[str] = mapped_column(String(20), nullable=False, server_default="none")  # none, reserved, charged, refunded
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,28 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.user import Base
+
+
+class KeyRotationRun(Base):
+    """Progress of re-encrypting one table under one primary encryption key."""
+
+    __tablename__ = "key_rotation_runs"
+    __table_args__ = (UniqueConstraint("table_name", "key_id", name="uq_key_rotation_runs_table_key"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    table_name: Mapped[str] = mapped_column(String(50), nullable=False)
+    key_id: Mapped[str] = mapped_column(String(16), nullable=False)  # fingerprint of the primary key
+    status: Mapped[str] = mapped_column(String(20), nullable=False, server_default="running")  # running, completed, failed
+    last_key: Mapped[str | None] = mapped_column(String(64), nullable=True)  # keyset cursor (primary key of last row)
+    rows_scanned: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    rows_rotated: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+    key_counts: Mapped[str] = mapped_column(Text, nullable=False, server_default="{}")  # JSON: key id -> rows found on it
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
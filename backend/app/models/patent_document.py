@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Index, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.user import Base
+
+
+class PatentDocument(Base):
+    """Normalized public patent metadata shared across all users' analyses (not encrypted)."""
+
+    __tablename__ = "patent_documents"
+    # Trigram index so the substring title search (ILIKE '%term%') doesn't scan the table
+    __table_args__ = (
+        Index(
+            "ix_patent_documents_title_trgm", "title",
+            postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
+
+    patent_id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    title: Mapped[str] = mapped_column(Text, nullable=False, server_default="")
+    abstract: Mapped[str] = mapped_column(Text, nullable=False, server_default="")
+    assignee: Mapped[str | None] = mapped_column(Text, nullable=True)
+    date: Mapped[str | None] = mapped_column(String(10), nullable=True)
+    cpc_codes: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON list
+    digest: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from app.schemas.idea import IdeaSpec, IdeaVariant
 from app.schemas.patent import PatentHit
@@ -9,6 +9,7 @@ class ProvisionalPatentRequest(BaseModel):
     variant: IdeaVariant
     spec: IdeaSpec
     hits: list[PatentHit]
+    session_id: str | None = None  # if set, the draft is stored as versioned sections on this session
 
 
 # ── USPTO Provisional Patent Response Models ──────────────────────────
@@ -39,3 +40,15 @@ class ProvisionalPatentResponse(BaseModel):
     claims: dict  # {independent: [...], dependent: [...]}
     drawings_note: str
     markdown: str
+    incomplete_sections: list[str] = []  # sections that fell back to template text
+
+
+# ── Stored drafts ─────────────────────────────────────────────────────
+
+class SectionRegenerateRequest(BaseModel):
+    instructions: str | None = Field(default=None, max_length=2000)  # what to change, in the inventor's words
+
+
+class SessionDraftResponse(BaseModel):
+    draft: ProvisionalPatentResponse
+    versions: dict[str, int]  # latest version of the outline and each section
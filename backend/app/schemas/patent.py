@@ -87,6 +87,8 @@ class EnhancedPatentHit(BaseModel):
     score: float
     why_similar: str
     source_phase: str  # keyword, cpc, citation
+    related_count: int = 0  # near-duplicate family members collapsed into this hit
+    related_ids: list[str] = []
 
 
 class SearchMetadata(BaseModel):
@@ -96,6 +98,11 @@ class SearchMetadata(BaseModel):
     citation_hits: int
     duplicates_removed: int
     phases_completed: list[str]
+    near_duplicates_collapsed: int = 0
+    phase_timings_ms: dict[str, int] = {}  # per search phase + invention_analysis
+    prompt_tokens_saved: int = 0  # estimated tokens trimmed from the Step 4 prompt
+    deadline_misses: list[str] = []  # steps/search phases cut short by the request deadline
+    queries_pruned: int = 0  # low-yield queries skipped under load
 
 
 # -- Step 3: Professional analysis (LLM post-search) --
@@ -144,3 +151,50 @@ class PatentAnalysisResponse(BaseModel):
     claim_strategy: ClaimStrategy
     confidence: str  # low, med, high
     disclaimer: str
+
+
+# -- Batch analysis (several variants of one product) --
+
+class BatchVariant(BaseModel):
+    variant: VariantRef
+    spec: SpecRef
+
+
+class BatchAnalysisRequest(BaseModel):
+    product_text: str = Field(max_length=5000)
+    variants: list[BatchVariant] = Field(min_length=1, max_length=5)
+    limit: int = Field(default=15, ge=1, le=30)
+
+
+class BatchAnalysisResponse(BaseModel):
+    results: list[PatentAnalysisResponse]  # one per variant, in request order
+    queries_run: int = 0
+    queries_shared: int = 0  # query executions avoided by sharing across variants
+    pooled_hits: int = 0  # distinct patents found across all variants' searches
+
+
+# -- Quick scan (no LLM) --
+
+class QuickScanResponse(BaseModel):
+    hits: list[EnhancedPatentHit]
+    confidence: str  # low, med, high
+    full_analysis_recommended: bool
+    recommendation_reason: str
+    partial: bool = False  # some searches missed the latency budget
+    elapsed_ms: int = 0
+
+
+# -- Background analysis jobs --
+
+class AnalysisJobRequest(PatentAnalysisRequest):
+    session_id: str | None = None  # if set, hits are saved to this session on success
+
+
+class AnalysisJobStatus(BaseModel):
+    job_id: str
+    status: str  # queued, running, succeeded, failed
+    progress: str | None = None
+    error: str | None = None
+    created_at: str
+    finished_at: str | None = None
+    result: PatentAnalysisResponse | None = None
@@ -20,6 +20,13 @@ class SessionUpdate(BaseModel):
     title: str | None = None
 
 
+class SessionUpdateAck(BaseModel):
+    id: str
+    version: int  # new version; send as If-Match ("v<version>") on the next update
+    updated_at: str
+    fields: dict | None = None  # the updated fields, when requested with returning=fields
+
+
 class SessionSummary(BaseModel):
     id: str
     title: str | None
@@ -27,6 +34,7 @@ class SessionSummary(BaseModel):
     status: str
     created_at: str
     updated_at: str
+    version: int
 
     class Config:
         from_attributes = True
@@ -49,6 +57,7 @@ class SessionDetail(BaseModel):
     title: str | None
     created_at: str
     updated_at: str
+    version: int
 
     class Config:
         from_attributes = True
@@ -56,3 +65,4 @@ class SessionDetail(BaseModel):
 
 class SessionListResponse(BaseModel):
     sessions: list[SessionSummary]
+    next_cursor: str | None = None  # None on the last page
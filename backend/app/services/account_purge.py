@@ -0,0 +1,112 @@
+"""Physical removal of deleted accounts.
+
+Deleting an account shreds the user's data key and anonymizes the user in one
+short transaction (see app.auth.routes.delete_account).  The rows are removed
+here afterwards, a batch per transaction, so a large account never holds
+locks for long.  Accounts whose purge failed are retried every
+``account_purge_interval_seconds``.
+"""
+
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import delete, select, tuple_, update
+
+from app.core.config import settings
+from app.models.artifact import SessionArtifact
+from app.models.checkpoint import AnalysisCheckpoint
+from app.models.credit import CreditTransaction
+from app.models.data_key import UserDataKey
+from app.models.database import async_session
+from app.models.draft_section import PatentDraftSection
+from app.models.job import AnalysisJob
+from app.models.session import Session
+from app.models.user import InviteCode, PasswordResetCode, User
+
+log = logging.getLogger("mousetrap.account_purge")
+
+# Child tables first
+_USER_TABLES = (
+    PasswordResetCode, CreditTransaction, AnalysisJob, AnalysisCheckpoint,
+    PatentDraftSection, Session, SessionArtifact, UserDataKey,
+)
+
+_task: asyncio.Task | None = None
+_wake = asyncio.Event()
+
+
+async def _delete_in_batches(model, user_id: uuid.UUID) -> int:
+    pk = tuple(model.__table__.primary_key.columns)
+    batch = settings.account_purge_batch_size
+    total = 0
+    while True:
+        async with async_session() as db:
+            chosen = select(*pk).where(model.user_id == user_id).limit(batch)
+            result = await db.execute(delete(model).where(tuple_(*pk).in_(chosen)))
+            await db.commit()
+        removed = result.rowcount or 0
+        total += removed
+        if removed < batch:
+            return total
+        await asyncio.sleep(0)
+
+
+async def purge_account(user_id: uuid.UUID) -> None:
+    """Delete every row of a deleted account, then the user."""
+    removed = {}
+    for model in _USER_TABLES:
+        removed[model.__tablename__] = await _delete_in_batches(model, user_id)
+    async with async_session() as db:
+        await db.execute(
+            update(InviteCode).where(InviteCode.used_by == user_id).values(used_by=None, used_at=None)
+        )
+        await db.execute(delete(User).where(User.id == user_id, User.deleted_at.isnot(None)))
+        await db.commit()
+    log.info("Purged deleted account %s: %s", user_id, {k: n for k, n in removed.items() if n})
+
+
+async def purge_deleted_accounts() -> int:
+    """Purge every account marked deleted. Returns accounts purged."""
+    async with async_session() as db:
+        result = await db.execute(select(User.id).where(User.deleted_at.isnot(None)))
+        user_ids = result.scalars().all()
+    purged = 0
+    for user_id in user_ids:
+        try:
+            await purge_account(user_id)
+            purged += 1
+        except Exception:
+            log.exception("Could not purge deleted account %s; will retry", user_id)
+    return purged
+
+
+async def _purge_loop() -> None:
+    while True:
+        _wake.clear()
+        try:
+            await purge_deleted_accounts()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Account purge pass failed; will retry")
+        try:
+            await asyncio.wait_for(_wake.wait(), settings.account_purge_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_purge() -> None:
+    """Run a purge pass now, starting the periodic purge loop if needed."""
+    global _task
+    _wake.set()
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_purge_loop())
+
+
+async def stop_purge() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
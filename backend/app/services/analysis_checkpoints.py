@@ -0,0 +1,112 @@
+"""Step-level checkpoints for the patent analysis workflow.
+
+Each completed step (invention analysis, raw hits, scored hits, professional
+analysis) is stored under a fingerprint of the user + request, encrypted with
+the user's data key, so a
+retried or resumed analysis skips the LLM and PatentsView work it already
+paid for.  Checkpointing is best-effort: storage errors are logged and the
+analysis carries on.
+"""
+
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.models.checkpoint import AnalysisCheckpoint
+from app.models.database import async_session
+from app.schemas.patent import PatentAnalysisRequest
+from app.services.data_keys import cipher_for
+from app.services.encryption import UserCipher
+
+log = logging.getLogger("mousetrap.analysis_checkpoints")
+
+# Bump when the shape of a checkpoint payload changes so stale rows are ignored
+_FORMAT_VERSION = 1
+
+
+def analysis_fingerprint(req: PatentAnalysisRequest, user_id: uuid.UUID | str) -> str:
+    """Stable hash of the user and the normalized request."""
+    canonical = json.dumps(req.model_dump(), sort_keys=True, separators=(",", ":"))
+    raw = f"v{_FORMAT_VERSION}:{user_id}:{canonical}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class Checkpointer:
+    """Loads and saves checkpoints for one analysis. A None key disables it."""
+
+    def __init__(self, key: str | None = None, user_id: uuid.UUID | None = None):
+        self.key = key
+        self.user_id = user_id
+        self.saved: dict[str, Any] = {}
+
+    async def _cipher(self) -> UserCipher:
+        return await cipher_for(self.user_id) if self.user_id is not None else UserCipher()
+
+    async def load(self) -> None:
+        if self.key is None:
+            return
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.analysis_checkpoint_ttl_hours)
+        try:
+            cipher = await self._cipher()
+            async with async_session() as db:
+                result = await db.execute(
+                    select(AnalysisCheckpoint.step, AnalysisCheckpoint.payload).where(
+                        AnalysisCheckpoint.fingerprint == self.key,
+                        AnalysisCheckpoint.created_at > cutoff,
+                    )
+                )
+                self.saved = {step: cipher.decrypt_json(payload) for step, payload in result.all()}
+        except Exception:
+            log.exception("Could not load analysis checkpoints")
+            self.saved = {}
+        if self.saved:
+            log.info("Resuming analysis %s from checkpoints: %s", self.key[:12], sorted(self.saved))
+
+    def get(self, step: str) -> Any:
+        return self.saved.get(step)
+
+    async def save(self, step: str, data: Any) -> None:
+        if self.key is None:
+            return
+        self.saved[step] = data
+        try:
+            stmt = insert(AnalysisCheckpoint).values(
+                fingerprint=self.key, step=step, user_id=self.user_id,
+                payload=(await self._cipher()).encrypt_json(data),
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["fingerprint", "step"],
+                set_={"payload": stmt.excluded.payload, "created_at": datetime.now(timezone.utc)},
+            )
+            async with async_session() as db:
+                await db.execute(stmt)
+                await db.commit()
+        except Exception:
+            log.exception("Could not save analysis checkpoint %s", step)
+
+
+async def clear_checkpoints(key: str) -> None:
+    """Drop an analysis's checkpoints once its result is delivered, so an
+    identical re-run is a fresh (and freshly charged) analysis."""
+    try:
+        async with async_session() as db:
+            await db.execute(delete(AnalysisCheckpoint).where(AnalysisCheckpoint.fingerprint == key))
+            await db.commit()
+    except Exception:
+        log.exception("Could not clear analysis checkpoints %s", key[:12])
+
+
+async def purge_expired_checkpoints() -> int:
+    """Delete checkpoints older than the TTL. Returns rows removed."""
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.analysis_checkpoint_ttl_hours)
+    async with async_session() as db:
+        result = await db.execute(delete(AnalysisCheckpoint).where(AnalysisCheckpoint.created_at <= cutoff))
+        await db.commit()
+    return result.rowcount or 0
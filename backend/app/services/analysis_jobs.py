@@ -0,0 +1,309 @@
+"""Background patent-analysis jobs — durable job table + in-process worker pool.
+
+Submitting a job reserves the credit and persists the request, encrypted
+under the user's data key, in ``analysis_jobs``; a bounded pool of asyncio workers runs the 4-step workflow
+and stores the encrypted result on the job and, if given, the user's session.
+The reserved credit is kept on success and refunded on failure.
+
+Progress events are fanned out to in-process subscribers (the SSE endpoint)
+and the last step is persisted on the job row so polling clients see it too.
+Jobs left queued/running by a previous process are re-queued on startup.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.models.database import async_session
+from app.models.job import AnalysisJob
+from app.models.session import Session
+from app.models.user import User
+from app.schemas.patent import PatentAnalysisRequest, PatentAnalysisResponse
+from app.services.analysis_checkpoints import analysis_fingerprint, clear_checkpoints
+from app.services.artifacts import encode_field
+from app.services.credits import deduct_credit, refund_credit
+from app.services.data_keys import cipher_for
+from app.services.patent_analysis import run_patent_analysis
+
+log = logging.getLogger("mousetrap.analysis_jobs")
+
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+_queue: asyncio.Queue[uuid.UUID] | None = None
+_workers: list[asyncio.Task] = []
+_subscribers: dict[uuid.UUID, set[asyncio.Queue]] = {}
+
+
+def _get_queue() -> asyncio.Queue[uuid.UUID]:
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue()
+    return _queue
+
+
+# ── Submission ───────────────────────────────────────────────────────
+
+async def submit_job(
+    db: AsyncSession,
+    user: User,
+    req: PatentAnalysisRequest,
+    session_id: uuid.UUID | None = None,
+    precomputed: PatentAnalysisResponse | None = None,
+) -> AnalysisJob:
+    """Persist a job, reserve its credit and enqueue it.
+
+    ``precomputed`` short-circuits the worker (used for the mock response
+    when no API keys are configured) — no credit is reserved in that case.
+    """
+    cipher = await cipher_for(user.id)
+    job = AnalysisJob(
+        user_id=user.id,
+        session_id=session_id,
+        request_json=cipher.encrypt_json(req.model_dump()),
+    )
+    db.add(job)
+    await db.flush()
+
+    if precomputed is not None:
+        job.status = "succeeded"
+        job.progress = "complete"
+        job.result_json = cipher.encrypt_json(precomputed.model_dump())
+        job.finished_at = datetime.now(timezone.utc)
+        await db.commit()
+        return job
+
+    if not user.is_admin:
+        await deduct_credit(
+            db, user.id,
+            transaction_type="patent_analysis",
+            reference_id=str(job.id),
+            description=f"Patent analysis for: {req.variant.title[:100]}",
+        )
+        job.credits_reserved = 1
+        job.credit_state = "reserved"
+
+    await db.commit()
+    _get_queue().put_nowait(job.id)
+    log.info("Queued analysis job %s for user %s", job.id, user.id)
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: uuid.UUID, user_id: uuid.UUID) -> AnalysisJob | None:
+    result = await db.execute(
+        select(AnalysisJob).where(AnalysisJob.id == job_id, AnalysisJob.user_id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def job_result(job: AnalysisJob) -> PatentAnalysisResponse | None:
+    data = (await cipher_for(job.user_id)).decrypt_json(job.result_json)
+    return PatentAnalysisResponse(**data) if data else None
+
+
+# ── Progress fan-out ─────────────────────────────────────────────────
+
+def _publish(job_id: uuid.UUID, event: str, detail: dict) -> None:
+    for q in _subscribers.get(job_id, ()):
+        q.put_nowait({"event": event, **detail})
+
+
+def open_subscription(job_id: uuid.UUID) -> asyncio.Queue:
+    """Register for live progress events. Open before reading job state so none are missed."""
+    q: asyncio.Queue = asyncio.Queue()
+    _subscribers.setdefault(job_id, set()).add(q)
+    return q
+
+
+def close_subscription(job_id: uuid.UUID, q: asyncio.Queue) -> None:
+    subs = _subscribers.get(job_id)
+    if subs is not None:
+        subs.discard(q)
+        if not subs:
+            _subscribers.pop(job_id, None)
+
+
+async def iter_events(q: asyncio.Queue) -> AsyncIterator[dict]:
+    """Yield events from a subscription until the job reaches a terminal state.
+
+    Emits a keepalive event when idle so proxies don't drop the stream.
+    """
+    while True:
+        try:
+            item = await asyncio.wait_for(q.get(), timeout=settings.analysis_job_keepalive_seconds)
+        except asyncio.TimeoutError:
+            yield {"event": "keepalive"}
+            continue
+        yield item
+        if item["event"] in TERMINAL_STATUSES:
+            return
+
+
+async def _set_progress(job_id: uuid.UUID, step: str) -> None:
+    async with async_session() as db:
+        await db.execute(update(AnalysisJob).where(AnalysisJob.id == job_id).values(progress=step))
+        await db.commit()
+
+
+# ── Worker ───────────────────────────────────────────────────────────
+
+async def _claim(job_id: uuid.UUID) -> tuple[str, uuid.UUID] | None:
+    """Atomically move a queued job to running. None if another worker has it or it's done."""
+    async with async_session() as db:
+        row = (await db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.status == "queued")
+            .values(status="running", started_at=datetime.now(timezone.utc))
+            .returning(AnalysisJob.request_json, AnalysisJob.user_id)
+        )).one_or_none()
+        await db.commit()
+    return tuple(row) if row is not None else None
+
+
+async def _run_job(job_id: uuid.UUID) -> None:
+    claimed = await _claim(job_id)
+    if claimed is None:
+        return
+    request_json, user_id = claimed
+    _publish(job_id, "running", {})
+
+    pending: set[asyncio.Task] = set()
+
+    def on_progress(event: str, detail: dict) -> None:
+        _publish(job_id, event, detail)
+        if event != "search_phase":
+            t = asyncio.create_task(_set_progress(job_id, event))
+            pending.add(t)
+            t.add_done_callback(pending.discard)
+
+    # Anything failing from here on fails the job and refunds its credit
+    try:
+        req = PatentAnalysisRequest(**(await cipher_for(user_id)).decrypt_json(request_json))
+        result = await run_patent_analysis(
+            req,
+            progress=on_progress,
+            checkpoint_key=analysis_fingerprint(req, user_id),
+            user_id=user_id,
+            deadline=Deadline(settings.analysis_job_deadline_seconds),
+        )
+        await asyncio.gather(*pending, return_exceptions=True)
+        await _finish_succeeded(job_id, result)
+    except Exception as exc:
+        log.exception("Analysis job %s failed", job_id)
+        await asyncio.gather(*pending, return_exceptions=True)
+        refunded = await _finish_failed(job_id, f"{type(exc).__name__}: {exc}")
+        _publish(job_id, "failed", {"error": "Analysis failed.", "refunded": refunded})
+        return
+
+    await clear_checkpoints(analysis_fingerprint(req, user_id))
+    _publish(job_id, "succeeded", {"job_id": str(job_id)})
+
+
+async def _finish_succeeded(job_id: uuid.UUID, result: PatentAnalysisResponse) -> None:
+    async with async_session() as db:
+        job = await db.get(AnalysisJob, job_id)
+        job.status = "succeeded"
+        job.progress = "complete"
+        job.result_json = (await cipher_for(job.user_id)).encrypt_json(result.model_dump())
+        job.finished_at = datetime.now(timezone.utc)
+        if job.credit_state == "reserved":
+            job.credit_state = "charged"
+
+        if job.session_id is not None:
+            await db.execute(
+                update(Session)
+                .where(Session.id == job.session_id, Session.user_id == job.user_id)
+                .values(
+                    patent_hits_json=await encode_field(
+                        db, job.user_id, "patent_hits_json", [h.model_dump() for h in result.hits],
+                    ),
+                    patent_confidence=result.confidence,
+                    status="patents_searched",
+                    version=Session.version + 1,
+                )
+            )
+        await db.commit()
+    log.info("Analysis job %s succeeded", job_id)
+
+
+async def _finish_failed(job_id: uuid.UUID, error: str) -> bool:
+    """Mark the job failed and refund any reserved credit. Returns True if refunded."""
+    refunded = False
+    async with async_session() as db:
+        job = await db.get(AnalysisJob, job_id)
+        if job.status in TERMINAL_STATUSES:
+            return False
+        job.status = "failed"
+        job.error = error[:2000]
+        job.finished_at = datetime.now(timezone.utc)
+        if job.credit_state == "reserved" and job.credits_reserved:
+            await refund_credit(
+                db, job.user_id,
+                reference_id=str(job.id),
+                description="Refund: patent analysis did not complete",
+                amount=job.credits_reserved,
+            )
+            job.credit_state = "refunded"
+            refunded = True
+        await db.commit()
+    return refunded
+
+
+async def _worker(n: int) -> None:
+    queue = _get_queue()
+    while True:
+        job_id = await queue.get()
+        try:
+            await _run_job(job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Worker %d crashed on job %s", n, job_id)
+        finally:
+            queue.task_done()
+
+
+# ── Lifecycle ────────────────────────────────────────────────────────
+
+async def start_workers() -> None:
+    """Start the worker pool and re-queue jobs interrupted by a restart.
+
+    Queued jobs are enqueued again (workers claim them atomically, so a job
+    queued by several processes still runs once); running jobs are only
+    recovered once they've been running longer than a live one could.
+    """
+    if _workers:
+        return
+    for n in range(settings.analysis_job_workers):
+        _workers.append(asyncio.create_task(_worker(n)))
+
+    stale = datetime.now(timezone.utc) - timedelta(seconds=settings.analysis_job_stale_seconds)
+    async with async_session() as db:
+        await db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.status == "running", AnalysisJob.started_at < stale)
+            .values(status="queued")
+        )
+        await db.commit()
+        result = await db.execute(
+            select(AnalysisJob.id)
+            .where(AnalysisJob.status == "queued")
+            .order_by(AnalysisJob.created_at)
+        )
+        orphaned = result.scalars().all()
+    for job_id in orphaned:
+        _get_queue().put_nowait(job_id)
+    log.info("Started %d analysis workers (%d jobs recovered)", len(_workers), len(orphaned))
+
+
+async def stop_workers() -> None:
+    for t in _workers:
+        t.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
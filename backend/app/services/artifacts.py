@@ -0,0 +1,264 @@
+"""Content-addressed storage for large session payloads.
+
+Patent hit lists, drafts and exports run to hundreds of kilobytes and are
+often repeated across a user's sessions (re-run analyses, copied sessions).
+Values of at least ``artifact_min_bytes`` are stored once in
+``session_artifacts`` under an HMAC of the user id and the canonical content,
+and the session column holds a short reference (``art:v1:<digest>``) instead.
+Artifact content is encrypted exactly like the inline column, so readers swap
+the reference for it with ``resolve`` and decrypt as usual.
+
+Keying the hash with a server secret and the user id means a digest reveals
+nothing about the content, and identical payloads are never shared between
+users.  Existing inline payloads are moved out by a throttled background
+pass, which also removes artifacts no session references any more.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy import and_, delete, exists, func, inspect, literal, not_, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import attributes
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.artifact import SessionArtifact
+from app.models.database import async_session
+from app.models.session import Session
+from app.services.data_keys import cipher_for
+from app.services.encryption import FERNET_PREFIX, USER_TOKEN_PREFIX, UserCipher
+
+log = logging.getLogger("mousetrap.artifacts")
+
+# Session columns that may hold a reference, and how their values are encoded
+ARTIFACT_FIELDS = {
+    "patent_hits_json": "json",
+    "patent_draft_json": "json",
+    "export_markdown": "text",
+    "export_plain_text": "text",
+}
+REF_PREFIX = "art:v1:"
+
+# Unreferenced artifacts younger than this are kept: a write that re-uses one
+# may not have committed its session row yet
+_GC_GRACE = timedelta(hours=1)
+
+_task: asyncio.Task | None = None
+
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+
+@lru_cache(maxsize=1)
+def _hmac_key() -> bytes:
+    secret = settings.artifact_hmac_key or f"session-artifacts:{settings.jwt_secret_key}"
+    return hashlib.sha256(secret.encode("utf-8")).digest()
+
+
+def _canonical(field: str, value: Any) -> bytes:
+    if ARTIFACT_FIELDS[field] == "json":
+        return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return value.encode("utf-8")
+
+
+def artifact_digest(user_id: uuid.UUID | str, canonical: bytes) -> str:
+    return hmac.new(_hmac_key(), f"{user_id}:".encode() + canonical, hashlib.sha256).hexdigest()
+
+
+def _encrypt(cipher: UserCipher, field: str, value: Any) -> str:
+    return cipher.encrypt_json(value) if ARTIFACT_FIELDS[field] == "json" else cipher.encrypt_text(value)
+
+
+async def _put(db: AsyncSession, user_id: uuid.UUID, digest: str, size: int, ciphertext) -> None:
+    """Store an artifact unless the user already has it; ``ciphertext`` is called only when needed."""
+    touched = await db.execute(
+        update(SessionArtifact)
+        .where(SessionArtifact.digest == digest)
+        .values(stored_at=func.now())
+        .returning(SessionArtifact.digest)
+    )
+    if touched.scalar_one_or_none() is not None:
+        metrics.inc("artifacts.deduplicated")
+        return
+    await db.execute(
+        insert(SessionArtifact)
+        .values(digest=digest, user_id=user_id, content=ciphertext(), size=size)
+        .on_conflict_do_nothing(index_elements=["digest"])
+    )
+    metrics.inc("artifacts.stored")
+
+
+async def encode_field(db: AsyncSession, user_id: uuid.UUID, field: str, value: Any) -> str | None:
+    """Stored form of an artifact field: a reference for large values, inline ciphertext otherwise.
+
+    The artifact row is written in ``db``'s transaction, so it commits with
+    the session update that references it.
+    """
+    if value is None:
+        return None
+    cipher = await cipher_for(user_id)
+    canonical = _canonical(field, value)
+    if len(canonical) < settings.artifact_min_bytes:
+        return _encrypt(cipher, field, value)
+    digest = artifact_digest(user_id, canonical)
+    await _put(db, user_id, digest, len(canonical), lambda: _encrypt(cipher, field, value))
+    return REF_PREFIX + digest
+
+
+async def resolve(db: AsyncSession, user_id: uuid.UUID, session: Session, fields=None) -> None:
+    """Replace artifact references on a loaded session with the stored ciphertext.
+
+    Only loaded columns are looked at, and the swap doesn't mark the session
+    dirty.  A missing artifact reads as None.
+    """
+    await resolve_many(db, user_id, [session], fields)
+
+
+async def resolve_many(db: AsyncSession, user_id: uuid.UUID, sessions, fields=None) -> None:
+    """``resolve`` for several of one user's sessions with a single query."""
+    refs: list[tuple[Session, str, str]] = []
+    for session in sessions:
+        unloaded = inspect(session).unloaded
+        for field in fields if fields is not None else ARTIFACT_FIELDS:
+            if field in ARTIFACT_FIELDS and field not in unloaded:
+                value = getattr(session, field)
+                if is_ref(value):
+                    refs.append((session, field, value[len(REF_PREFIX):]))
+    if not refs:
+        return
+
+    result = await db.execute(
+        select(SessionArtifact.digest, SessionArtifact.content).where(
+            SessionArtifact.digest.in_({digest for _, _, digest in refs}),
+            SessionArtifact.user_id == user_id,
+        )
+    )
+    found = dict(result.all())
+    for session, field, digest in refs:
+        content = found.get(digest)
+        if content is None:
+            log.error("Session %s references missing artifact %s (%s)", session.id, digest[:12], field)
+        attributes.set_committed_value(session, field, content)
+
+
+# ── Background migration and cleanup ────────────────────────────────
+
+def _plaintext(cipher: UserCipher, field: str, raw: str) -> Any:
+    """Decrypted value of an inline column, or None if it can't be decrypted."""
+    value = cipher.decrypt_json(raw) if ARTIFACT_FIELDS[field] == "json" else cipher.decrypt_text(raw)
+    if value == raw and raw.startswith((FERNET_PREFIX, USER_TOKEN_PREFIX)):
+        return None  # wrong key — leave it inline
+    return value
+
+
+async def _migrate_batch(after: uuid.UUID | None) -> tuple[list[uuid.UUID], int]:
+    """Move large inline payloads of one batch of sessions. Returns (ids scanned, columns moved)."""
+    columns = [getattr(Session, f) for f in ARTIFACT_FIELDS]
+    # Ciphertext of a compressed payload can be a few times smaller than its
+    # plaintext, so prefilter loosely and decide on the decrypted size
+    min_stored = settings.artifact_min_bytes // 8
+    candidate = or_(*(
+        and_(col.isnot(None), not_(col.startswith(REF_PREFIX)), func.length(col) >= min_stored)
+        for col in columns
+    ))
+    stmt = select(Session.id, Session.user_id, *columns).where(candidate).order_by(Session.id)
+    if after is not None:
+        stmt = stmt.where(Session.id > after)
+
+    moved = 0
+    async with async_session() as db:
+        rows = (await db.execute(stmt.limit(settings.artifact_migration_batch_size))).all()
+        for row in rows:
+            try:
+                cipher = await cipher_for(row.user_id)
+            except LookupError:
+                continue  # deleted account, awaiting purge
+            for field, col in zip(ARTIFACT_FIELDS, columns):
+                raw = getattr(row, field)
+                if raw is None or is_ref(raw):
+                    continue
+                value = _plaintext(cipher, field, raw)
+                if value is None:
+                    continue
+                canonical = _canonical(field, value)
+                if len(canonical) < settings.artifact_min_bytes:
+                    continue
+                digest = artifact_digest(row.user_id, canonical)
+                # The inline value is already in artifact format — store it as-is
+                await _put(db, row.user_id, digest, len(canonical), lambda raw=raw: raw)
+                # Same content, new representation: no version bump, and
+                # updated_at is kept so list order doesn't change.  Only
+                # applies if the column wasn't rewritten in the meantime.
+                await db.execute(
+                    update(Session)
+                    .where(Session.id == row.id, col == raw)
+                    .values({field: REF_PREFIX + digest, "updated_at": Session.updated_at})
+                    .execution_options(synchronize_session=False)
+                )
+                moved += 1
+        await db.commit()
+    return [row.id for row in rows], moved
+
+
+async def migrate_inline_payloads() -> int:
+    """Move existing large inline payloads into the artifact store, in throttled keyset batches."""
+    after, total = None, 0
+    while True:
+        ids, moved = await _migrate_batch(after)
+        total += moved
+        if len(ids) < settings.artifact_migration_batch_size:
+            return total
+        after = ids[-1]
+        await asyncio.sleep(settings.artifact_migration_pause_seconds)
+
+
+async def purge_unreferenced_artifacts() -> int:
+    """Delete artifacts no session of their owner references. Returns rows removed."""
+    ref = literal(REF_PREFIX) + SessionArtifact.digest
+    referenced = exists().where(
+        Session.user_id == SessionArtifact.user_id,
+        or_(*(getattr(Session, f) == ref for f in ARTIFACT_FIELDS)),
+    )
+    cutoff = datetime.now(timezone.utc) - _GC_GRACE
+    async with async_session() as db:
+        result = await db.execute(
+            delete(SessionArtifact).where(SessionArtifact.stored_at < cutoff, not_(referenced))
+        )
+        await db.commit()
+    return result.rowcount or 0
+
+
+async def _maintain() -> None:
+    try:
+        moved = await migrate_inline_payloads()
+        purged = await purge_unreferenced_artifacts()
+        if moved or purged:
+            log.info("Artifact store: moved %d inline payloads, purged %d unreferenced", moved, purged)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        log.exception("Artifact migration failed; will retry on next start")
+
+
+def start_migration() -> None:
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.create_task(_maintain())
+
+
+async def stop_migration() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
@@ -0,0 +1,241 @@
+"""Local CPC classification table — validate, normalize and suggest CPC codes.
+
+The LLM's Step 1 CPC suggestions are sometimes malformed ("A47J 36/02",
+"a47j0036/2") or simply don't exist, and each one costs a PatentsView
+query.  Codes are normalized and checked against a locally indexed scheme
+before searching; when the LLM is unavailable, keywords are matched
+against CPC titles to suggest codes directly.
+
+The bundled table (app/data/cpc_scheme.tsv) lists every section and class,
+plus the subclasses and main groups consumer inventions usually fall in,
+so it can prove a class wrong but not a subclass or group.  Set
+CPC_SCHEME_PATH to a full scheme export (code<TAB>title per line) and
+unknown subclasses and groups are rejected or replaced by their parent too.
+"""
+
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+from app.core import metrics
+from app.core.config import settings
+
+log = logging.getLogger("mousetrap.cpc_scheme")
+
+_BUNDLED_PATH = Path(__file__).resolve().parent.parent / "data" / "cpc_scheme.tsv"
+
+# Section, class, optional subclass, optional group (leading zeros allowed), optional subgroup
+_CODE_RE = re.compile(
+    r"^([A-HY])\s*(\d{2})(?:\s*([A-Z])(?:\s*0*(\d{1,4})(?:\s*/\s*(\d{1,6}))?)?)?$"
+)
+_WORD_RE = re.compile(r"[a-z]+")
+_STOPWORDS = {
+    "a", "an", "and", "or", "of", "for", "the", "in", "on", "to", "by", "with", "not",
+    "other", "thereof", "therefor", "e", "g", "i", "general", "specially", "adapted",
+    "provided", "otherwise", "use", "their", "such", "being", "like", "etc", "than",
+}
+
+# Levels worth searching on their own (sections and classes are too broad)
+SEARCHABLE_LEVELS = {"subclass", "main_group", "subgroup"}
+
+
+@dataclass(frozen=True)
+class CpcCheck:
+    """Result of validating one code. ``code`` is what to search (None = skip)."""
+    original: str
+    code: str | None
+    title: str = ""
+    status: str = "valid"  # valid, unverified, replaced_by_parent, malformed, unknown
+
+
+@dataclass
+class CpcScheme:
+    titles: dict[str, str]
+    complete: bool = False
+    _children: dict[str, list[str]] = field(default_factory=dict)
+    _token_index: dict[str, set[str]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for code in self.titles:
+            parent = parent_code(code)
+            if parent is not None:
+                self._children.setdefault(parent, []).append(code)
+            for token in _tokens(self.titles[code]):
+                self._token_index.setdefault(token, set()).add(code)
+
+    def title(self, code: str) -> str:
+        return self.titles.get(_lookup_key(code), "")
+
+    def siblings(self, code: str) -> list[str]:
+        parent = parent_code(code)
+        return [c for c in self._children.get(parent or "", []) if c != _lookup_key(code)]
+
+    def check(self, raw: str) -> CpcCheck:
+        code = normalize(raw)
+        if code is None:
+            return CpcCheck(raw, None, status="malformed")
+        key = _lookup_key(code)
+        if key in self.titles:
+            return CpcCheck(raw, code, self.titles[key])
+        if self.titles.get(code[:3]) is None:
+            return CpcCheck(raw, None, status="unknown")
+        if len(code) == 3:
+            return CpcCheck(raw, code, self.titles[code[:3]])
+        if not self.complete:
+            # Bundled subset: a missing subclass or group may still exist
+            return CpcCheck(raw, code, self.title(code[:4]), status="unverified")
+        # Full scheme: fall back to the nearest ancestor that exists and is searchable
+        parent = parent_code(key)
+        while parent is not None and len(parent) >= 4:
+            if parent in self.titles:
+                search = parent[:-3] if parent.endswith("/00") else parent
+                return CpcCheck(raw, search, self.titles[parent], status="replaced_by_parent")
+            parent = parent_code(parent)
+        return CpcCheck(raw, None, status="unknown")
+
+    def suggest(self, keywords: list[str], limit: int = 5) -> list[dict]:
+        """Match keywords against CPC titles; returns Step 1 style cpc_codes entries."""
+        wanted = {t for kw in keywords for t in _tokens(kw)}
+        if not wanted:
+            return []
+        n = len(self.titles)
+        scores: dict[str, float] = {}
+        matched: dict[str, set[str]] = {}
+        for token in wanted:
+            codes = self._token_index.get(token, set())
+            if not codes:
+                continue
+            idf = math.log(n / len(codes))
+            for code in codes:
+                if _level(code) not in SEARCHABLE_LEVELS:
+                    continue
+                scores[code] = scores.get(code, 0.0) + idf
+                matched.setdefault(code, set()).add(token)
+        # Prefer more specific codes on ties
+        ranked = sorted(scores, key=lambda c: (-scores[c], -len(c), c))[:limit]
+        return [
+            {
+                "code": c[:-3] if c.endswith("/00") else c,
+                "description": self.titles[c],
+                "rationale": "Title matches: " + ", ".join(sorted(matched[c])),
+            }
+            for c in ranked
+        ]
+
+
+def normalize(raw: str) -> str | None:
+    """Canonical form: "A47J", "A47J36" (whole main group) or "A47J36/02"; None if malformed."""
+    m = _CODE_RE.match((raw or "").strip().upper().rstrip("/ "))
+    if not m:
+        return None
+    section, cls, subclass, group, subgroup = m.groups()
+    code = section + cls
+    if subclass:
+        code += subclass
+    if group:
+        code += group
+        if subgroup and subgroup.strip("0"):
+            code += "/" + subgroup.zfill(2)
+    return code
+
+
+def parent_code(code: str) -> str | None:
+    """Parent in the (code-derived) hierarchy: subgroup → main group → subclass → class → section."""
+    if "/" in code:
+        return code[:4] if code.endswith("/00") else code.split("/")[0] + "/00"
+    if len(code) > 4:
+        return code[:4]
+    if len(code) == 4:
+        return code[:3]
+    if len(code) == 3:
+        return code[:1]
+    return None
+
+
+def _lookup_key(code: str) -> str:
+    # Main groups are keyed "A47J36/00" in the table
+    return code + "/00" if len(code) > 4 and "/" not in code else code
+
+
+def _level(code: str) -> str:
+    if "/" in code:
+        return "main_group" if code.endswith("/00") else "subgroup"
+    return {1: "section", 3: "class", 4: "subclass"}.get(len(code), "main_group")
+
+
+def _tokens(text: str) -> set[str]:
+    out = set()
+    for w in _WORD_RE.findall(text.lower()):
+        if w in _STOPWORDS or len(w) < 3:
+            continue
+        # Crude plural folding so "collars" matches "collar"
+        if w.endswith("ies") and len(w) > 4:
+            w = w[:-3] + "y"
+        elif w.endswith("es") and w[-3:-2] in ("s", "x", "h") and len(w) > 4:
+            w = w[:-2]
+        elif w.endswith("s") and not w.endswith("ss") and len(w) > 3:
+            w = w[:-1]
+        out.add(w)
+    return out
+
+
+def _load(path: Path) -> dict[str, str]:
+    titles = {}
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            code, _, title = line.rstrip("\n").partition("\t")
+            norm = normalize(code)
+            if norm is None:
+                continue
+            titles[_lookup_key(norm)] = title.strip()
+    return titles
+
+
+@lru_cache(maxsize=1)
+def get_scheme() -> CpcScheme:
+    if settings.cpc_scheme_path:
+        try:
+            scheme = CpcScheme(_load(Path(settings.cpc_scheme_path)), complete=True)
+            log.info("Loaded full CPC scheme: %d entries", len(scheme.titles))
+            return scheme
+        except OSError:
+            log.exception("Could not read CPC_SCHEME_PATH — using bundled table")
+    return CpcScheme(_load(_BUNDLED_PATH))
+
+
+def prepare_search_codes(cpc_codes: list, limit: int = 5) -> list[str]:
+    """Validated, normalized, de-duplicated codes to search, topped up with parents.
+
+    Malformed and nonexistent codes are dropped before they cost a query.
+    If fewer than ``limit`` survive, the main groups above accepted
+    subgroups are added as broader searches.
+    """
+    scheme = get_scheme()
+    codes: list[str] = []
+    for c in cpc_codes:
+        raw = c.get("code", "") if isinstance(c, dict) else str(c)
+        if not raw:
+            continue
+        check = scheme.check(raw)
+        if check.code is None:
+            metrics.inc("cpc.codes_rejected")
+            log.info("Dropping CPC code %r (%s)", raw, check.status)
+            continue
+        if check.code != raw.strip():
+            metrics.inc("cpc.codes_normalized")
+        if check.code not in codes:
+            codes.append(check.code)
+
+    for code in list(codes):
+        if len(codes) >= limit:
+            break
+        if "/" in code:
+            parent = code.split("/")[0]
+            if parent not in codes:
+                codes.append(parent)
+    return codes[:limit]
@@ -99,3 +99,26 @@ async def grant_purchase_credits(
     session.add(txn)
     await session.flush()
     return new_balance
+
+
+async def refund_credit(
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    reference_id: str | None = None,
+    description: str | None = None,
+    amount: int = 1,
+) -> int:
+    """Return previously deducted credits (e.g. a reserved job that failed). Returns new balance."""
+    current = await get_balance(session, user_id)
+    new_balance = current + amount
+    txn = CreditTransaction(
+        user_id=user_id,
+        amount=amount,
+        balance_after=new_balance,
+        transaction_type="refund",
+        reference_id=reference_id,
+        description=description,
+    )
+    session.add(txn)
+    await session.flush()
+    return new_balance
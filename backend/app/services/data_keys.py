@@ -0,0 +1,223 @@
+"""Per-user data keys for envelope encryption.
+
+Each user's session data, analysis jobs and analysis checkpoints are
+encrypted under their own random Fernet key
+(UserCipher); the key is stored in ``user_data_keys`` wrapped by the master
+ENCRYPTION_KEYS.  Unwrapped keys are kept in a small in-process LRU, so the
+common path costs neither a query nor a master-key decryption.  Deleting the
+key row (``shred``) makes every per-user token of that user unreadable at
+once, whatever is still left in the tables.
+
+Values written before per-user keys existed are still master-key tokens; a
+throttled background pass (``start_migration``) moves them onto their
+owner's data key.  Until it has reached a user, deleting their account falls
+back to removing the rows synchronously (``has_legacy_tokens``).
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy import delete, exists, literal, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.artifact import SessionArtifact
+from app.models.checkpoint import AnalysisCheckpoint
+from app.models.data_key import UserDataKey
+from app.models.database import async_session
+from app.models.draft_section import PatentDraftSection
+from app.models.job import AnalysisJob
+from app.models.session import Session
+from app.models.user import User
+from app.services.encryption import FERNET_PREFIX, UserCipher, key_ids, unwrap_key, wrap_key
+
+log = logging.getLogger("mousetrap.data_keys")
+
+_cache: OrderedDict[uuid.UUID, tuple[float, UserCipher]] = OrderedDict()
+
+# Tables encrypted under their owner's data key: (model, keyset columns, encrypted columns)
+_USER_TABLES = (
+    (Session, (Session.id,), (
+        "product_text", "title", "variants_json", "selected_variant_json", "spec_json",
+        "patent_hits_json", "patent_draft_json", "prototype_json", "export_markdown", "export_plain_text",
+    )),
+    (SessionArtifact, (SessionArtifact.digest,), ("content",)),
+    (PatentDraftSection, (PatentDraftSection.id,), ("content",)),
+    (AnalysisJob, (AnalysisJob.id,), ("request_json", "result_json")),
+    (AnalysisCheckpoint, (AnalysisCheckpoint.fingerprint, AnalysisCheckpoint.step), ("payload",)),
+)
+
+_task: asyncio.Task | None = None
+
+
+def _cached(user_id: uuid.UUID) -> UserCipher | None:
+    entry = _cache.get(user_id)
+    if entry is None:
+        return None
+    loaded_at, cipher = entry
+    if time.monotonic() - loaded_at > settings.user_key_cache_ttl_seconds:
+        del _cache[user_id]
+        return None
+    _cache.move_to_end(user_id)
+    return cipher
+
+
+def _remember(user_id: uuid.UUID, cipher: UserCipher) -> None:
+    _cache[user_id] = (time.monotonic(), cipher)
+    _cache.move_to_end(user_id)
+    while len(_cache) > settings.user_key_cache_size:
+        _cache.popitem(last=False)
+
+
+async def _load_or_create(user_id: uuid.UUID) -> str:
+    """The user's wrapped key, creating one if needed (committed on its own,
+    so no data is ever encrypted under a key that was rolled back)."""
+    async with async_session() as db:
+        wrapped = (await db.execute(
+            select(UserDataKey.wrapped_key).where(UserDataKey.user_id == user_id)
+        )).scalar_one_or_none()
+        if wrapped is not None:
+            return wrapped
+
+        # Only for live accounts: a deleted account must not get a fresh key
+        candidate = select(User.id, literal(wrap_key(Fernet.generate_key()))).where(
+            User.id == user_id, User.deleted_at.is_(None),
+        )
+        await db.execute(
+            insert(UserDataKey)
+            .from_select(["user_id", "wrapped_key"], candidate)
+            .on_conflict_do_nothing(index_elements=["user_id"])
+        )
+        await db.commit()
+        wrapped = (await db.execute(
+            select(UserDataKey.wrapped_key).where(UserDataKey.user_id == user_id)
+        )).scalar_one_or_none()
+    if wrapped is None:
+        raise LookupError(f"User {user_id} does not exist or has been deleted")
+    log.info("Created data key for user %s", user_id)
+    return wrapped
+
+
+async def cipher_for(user_id: uuid.UUID) -> UserCipher:
+    """The cipher for a user's data. Passes through when encryption is disabled.
+
+    Raises LookupError for a deleted account.
+    """
+    if not key_ids():
+        return UserCipher()
+    cipher = _cached(user_id)
+    if cipher is not None:
+        metrics.inc("data_keys.cache_hits")
+        return cipher
+    metrics.inc("data_keys.cache_misses")
+    cipher = UserCipher(Fernet(unwrap_key(await _load_or_create(user_id))))
+    _remember(user_id, cipher)
+    return cipher
+
+
+async def shred(db: AsyncSession, user_id: uuid.UUID) -> None:
+    """Delete the user's data key, making their per-user data unreadable. Caller commits."""
+    await db.execute(delete(UserDataKey).where(UserDataKey.user_id == user_id))
+    _cache.pop(user_id, None)
+
+
+# ── Moving master-key tokens onto data keys ─────────────────────────
+
+def _legacy(model, fields):
+    return or_(*(getattr(model, f).startswith(FERNET_PREFIX) for f in fields))
+
+
+async def has_legacy_tokens(db: AsyncSession, user_id: uuid.UUID) -> bool:
+    """Whether any of the user's data is still encrypted under the master keys."""
+    for model, _, fields in _USER_TABLES:
+        found = await db.scalar(select(exists().where(model.user_id == user_id, _legacy(model, fields))))
+        if found:
+            return True
+    return False
+
+
+async def _migrate_batch(model, keyset, fields, after) -> tuple[list, int]:
+    """Move one batch of master-key tokens onto data keys. Returns (keys scanned, rows moved)."""
+    columns = [getattr(model, f) for f in fields]
+    # Columns with an onupdate default (updated_at) keep their value
+    keep = {c.name: c for c in model.__table__.columns if c.onupdate is not None}
+    stmt = select(*keyset, model.user_id, *columns).where(_legacy(model, fields)).order_by(*keyset)
+    if after is not None:
+        stmt = stmt.where(tuple_(*keyset) > after)
+
+    moved = 0
+    async with async_session() as db:
+        rows = (await db.execute(stmt.limit(settings.user_key_migration_batch_size))).all()
+        for row in rows:
+            try:
+                cipher = await cipher_for(row.user_id)
+            except LookupError:
+                continue  # deleted account, awaiting purge
+            key = tuple(row[:len(keyset)])
+            values = dict(zip(fields, row[len(keyset) + 1:]))
+            changes = {}
+            for field, value in values.items():
+                if isinstance(value, str) and value.startswith(FERNET_PREFIX):
+                    try:
+                        changes[field] = cipher.adopt(value)
+                    except InvalidToken:
+                        continue  # key no longer configured — leave it
+            if not changes:
+                continue
+            # Only applies to values that weren't rewritten in the meantime
+            result = await db.execute(
+                update(model)
+                .where(*(k == v for k, v in zip(keyset, key)), *(getattr(model, f) == values[f] for f in changes))
+                .values(**changes, **keep)
+                .execution_options(synchronize_session=False)
+            )
+            moved += result.rowcount or 0
+        await db.commit()
+    return [tuple(row[:len(keyset)]) for row in rows], moved
+
+
+async def migrate_legacy_tokens() -> int:
+    """Move every master-key token onto its owner's data key, in throttled keyset batches."""
+    total = 0
+    for model, keyset, fields in _USER_TABLES:
+        after = None
+        while True:
+            keys, moved = await _migrate_batch(model, keyset, fields, after)
+            total += moved
+            if len(keys) < settings.user_key_migration_batch_size:
+                break
+            after = keys[-1]
+            await asyncio.sleep(settings.user_key_migration_pause_seconds)
+    return total
+
+
+async def _migrate() -> None:
+    try:
+        moved = await migrate_legacy_tokens()
+        if moved:
+            log.info("Moved %d rows of master-key data onto per-user data keys", moved)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        log.exception("Data key migration failed; will retry on next start")
+
+
+def start_migration() -> None:
+    """Start the legacy token migration in the background (no-op when encryption is off)."""
+    global _task
+    if key_ids() and (_task is None or _task.done()):
+        _task = asyncio.create_task(_migrate())
+
+
+async def stop_migration() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
@@ -0,0 +1,204 @@
+"""Versioned per-session storage of provisional patent drafts.
+
+A draft generated for a session is stored one row per part: the request it
+was generated from, the outline, and each section, all encrypted.  A part
+gets a new version only when its content changed, so regenerating the
+claims adds a single row and every other section keeps its version.  The
+session's ``patent_draft_json`` always holds the draft assembled from the
+latest versions.
+
+Writers lock the session row before reading the latest versions, so
+concurrent saves can't pick the same version number or publish a draft
+missing another writer's section.  Regeneration calls the LLM before taking
+the lock and fails with SectionConflictError if the section changed meanwhile.
+"""
+
+import logging
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.draft_section import PatentDraftSection
+from app.models.session import Session
+from app.schemas.build_this import ProvisionalPatentRequest, ProvisionalPatentResponse
+from app.services.artifacts import encode_field
+from app.services.data_keys import cipher_for
+from app.services.llm import LLMError
+from app.services.patent_draft import SECTIONS, assemble_draft, generate_section, mock_section
+
+log = logging.getLogger("mousetrap.draft_sections")
+
+
+class SectionConflictError(RuntimeError):
+    """The section was rewritten by someone else while it was being regenerated."""
+
+
+@dataclass
+class StoredPart:
+    version: int
+    content: dict
+    is_fallback: bool
+
+
+class DraftRecorder:
+    """Collects a draft's outline and sections from generation events."""
+
+    def __init__(self, req: ProvisionalPatentRequest):
+        self.req = req
+        self.outline: dict | None = None
+        self.sections: dict[str, dict] = {}
+        self.incomplete: set[str] = set()
+
+    def __call__(self, event: str, payload: dict) -> None:
+        if event == "outline":
+            self.outline = payload["outline"]
+        elif event == "section":
+            self.sections[payload["section"]] = payload["content"]
+            if payload["incomplete"]:
+                self.incomplete.add(payload["section"])
+
+    @property
+    def complete(self) -> bool:
+        return self.outline is not None and all(name in self.sections for name in SECTIONS)
+
+
+async def _lock_session(db: AsyncSession, session_id: uuid.UUID) -> None:
+    await db.execute(select(Session.id).where(Session.id == session_id).with_for_update())
+
+
+async def load_latest(db: AsyncSession, session_id: uuid.UUID) -> dict[str, StoredPart]:
+    """Latest version of every stored part of the session's draft."""
+    newest = (
+        select(PatentDraftSection.section, func.max(PatentDraftSection.version).label("version"))
+        .where(PatentDraftSection.session_id == session_id)
+        .group_by(PatentDraftSection.section)
+        .subquery()
+    )
+    result = await db.execute(
+        select(PatentDraftSection).join(
+            newest,
+            (PatentDraftSection.section == newest.c.section)
+            & (PatentDraftSection.version == newest.c.version),
+        ).where(PatentDraftSection.session_id == session_id)
+    )
+    rows = result.scalars().all()
+    if not rows:
+        return {}
+    cipher = await cipher_for(rows[0].user_id)
+    return {row.section: StoredPart(row.version, cipher.decrypt_json(row.content), row.is_fallback) for row in rows}
+
+
+async def _save_parts(
+    db: AsyncSession,
+    session_id: uuid.UUID,
+    user_id: uuid.UUID,
+    parts: dict[str, dict],
+    fallback: set[str],
+    latest: dict[str, StoredPart],
+) -> None:
+    """Add a new version for each part whose content changed; updates ``latest`` in place."""
+    cipher = await cipher_for(user_id)
+    for name, content in parts.items():
+        current = latest.get(name)
+        is_fallback = name in fallback
+        if current is not None and current.content == content and current.is_fallback == is_fallback:
+            continue
+        version = current.version + 1 if current else 1
+        db.add(PatentDraftSection(
+            session_id=session_id,
+            user_id=user_id,
+            section=name,
+            version=version,
+            content=cipher.encrypt_json(content),
+            is_fallback=is_fallback,
+        ))
+        latest[name] = StoredPart(version, content, is_fallback)
+
+
+def assemble_stored(latest: dict[str, StoredPart]) -> ProvisionalPatentResponse:
+    sections = {name: latest[name].content for name in SECTIONS if name in latest}
+    incomplete = [name for name in SECTIONS if name in latest and latest[name].is_fallback]
+    return assemble_draft(latest["outline"].content, sections, incomplete)
+
+
+def section_versions(latest: dict[str, StoredPart]) -> dict[str, int]:
+    return {name: part.version for name, part in latest.items() if name != "request"}
+
+
+async def _publish(
+    db: AsyncSession,
+    session_id: uuid.UUID,
+    user_id: uuid.UUID,
+    draft: ProvisionalPatentResponse,
+) -> None:
+    stored = await encode_field(db, user_id, "patent_draft_json", draft.model_dump())
+    await db.execute(
+        update(Session)
+        .where(Session.id == session_id)
+        .values(patent_draft_json=stored, version=Session.version + 1)
+    )
+
+
+async def save_draft(
+    db: AsyncSession,
+    session_id: uuid.UUID,
+    user_id: uuid.UUID,
+    recorder: DraftRecorder,
+) -> dict[str, int]:
+    """Store a freshly generated draft and return the resulting part versions. Caller commits."""
+    await _lock_session(db, session_id)
+    latest = await load_latest(db, session_id)
+    parts = {
+        "request": recorder.req.model_dump(exclude={"session_id"}),
+        "outline": recorder.outline,
+        **recorder.sections,
+    }
+    await _save_parts(db, session_id, user_id, parts, recorder.incomplete, latest)
+    await _publish(db, session_id, user_id, assemble_stored(latest))
+    return section_versions(latest)
+
+
+async def regenerate_section(
+    db: AsyncSession,
+    session_id: uuid.UUID,
+    user_id: uuid.UUID,
+    name: str,
+    instructions: str | None = None,
+    use_llm: bool = True,
+) -> tuple[ProvisionalPatentResponse, dict[str, int]]:
+    """Rewrite one section with the stored outline and other sections as context.
+
+    Raises LookupError when the session has no stored draft, LLMError when
+    the section could not be generated and SectionConflictError when the
+    section was changed by a concurrent request.  Caller commits.
+    """
+    latest = await load_latest(db, session_id)
+    if "outline" not in latest or "request" not in latest:
+        raise LookupError("No stored draft for this session")
+
+    req = ProvisionalPatentRequest(**latest["request"].content)
+    if use_llm:
+        others = {n: latest[n].content for n in SECTIONS if n in latest and n != name}
+        content = await generate_section(
+            name, req, latest["outline"].content,
+            context_sections=others, instructions=instructions,
+        )
+        if content is None:
+            raise LLMError(f"Could not regenerate the {name} section")
+    else:
+        content = mock_section(name, req)
+
+    # Re-read under the lock: other sections may have moved on meanwhile
+    seen = latest[name].version if name in latest else None
+    await _lock_session(db, session_id)
+    latest = await load_latest(db, session_id)
+    if (latest[name].version if name in latest else None) != seen:
+        raise SectionConflictError(f"The {name} section was changed by another request; reload and retry")
+
+    await _save_parts(db, session_id, user_id, {name: content}, set(), latest)
+    draft = assemble_stored(latest)
+    await _publish(db, session_id, user_id, draft)
+    log.info("Regenerated %s for session %s (v%d)", name, session_id, latest[name].version)
+    return draft, section_versions(latest)
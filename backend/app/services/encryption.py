@@ -4,10 +4,24 @@ Application-level field encryption using Fernet (AES-128-CBC + HMAC-SHA256).
 - When ENCRYPTION_KEYS is set: encrypts/decrypts with MultiFernet (supports key rotation)
 - When ENCRYPTION_KEYS is empty (local dev): data passes through unchanged
 - Backward-compatible: detects unencrypted data by checking for Fernet token prefix
+- Rows on old keys are re-encrypted under the primary key in the background (app.services.key_rotation)
+
+JSON values are encrypted as a small envelope rather than as JSON text: a
+format byte followed by compact JSON, zlib-compressed when the payload is
+large enough to benefit.  Older tokens decrypt to JSON text, which never
+starts with a format byte, so both kinds are read transparently.
+
+Session data is encrypted per user (UserCipher): each user has a random data
+key, stored wrapped by the master keys (app.services.data_keys), and their
+tokens carry a ``u1.`` prefix.  Deleting the data key makes that user's data
+unreadable at once.  A UserCipher still reads master-key tokens written
+before per-user keys existed.
 """
 
+import hashlib
 import json
 import logging
+import zlib
 from typing import Any
 
 from cryptography.fernet import Fernet, InvalidToken, MultiFernet
@@ -17,9 +31,20 @@ from app.core.config import settings
 log = logging.getLogger("mousetrap.encryption")
 
 _fernet: MultiFernet | None = None
+_keys: list[Fernet] = []  # primary first, as in ENCRYPTION_KEYS
+_key_ids: list[str] = []  # short fingerprints of _keys, safe to log and store
 _initialized = False
 
 FERNET_PREFIX = "gAAAAA"
+USER_TOKEN_PREFIX = "u1."  # Fernet token under a per-user data key
+
+# Envelope format bytes for encrypted JSON (legacy tokens hold bare JSON text)
+ENVELOPE_JSON = 0x01  # compact UTF-8 JSON
+ENVELOPE_ZLIB_JSON = 0x02  # zlib-compressed compact UTF-8 JSON
+
+# Payloads smaller than this are stored uncompressed; zlib only adds overhead
+COMPRESS_MIN_BYTES = 256
+_ZLIB_LEVEL = 6  # sessions are read far more than written; decompression cost is level-independent
 
 
 def _get_fernet() -> MultiFernet | None:
@@ -37,6 +62,8 @@ def _get_fernet() -> MultiFernet | None:
     keys = [k.strip().encode() for k in raw.split(",") if k.strip()]
     fernets = [Fernet(k) for k in keys]
     _fernet = MultiFernet(fernets)
+    _keys[:] = fernets
+    _key_ids[:] = [hashlib.sha256(k).hexdigest()[:16] for k in keys]
     _initialized = True
     log.info("Field encryption initialized with %d key(s)", len(fernets))
     return _fernet
@@ -47,6 +74,34 @@ def validate_keys() -> None:
     _get_fernet()
 
 
+def key_ids() -> list[str]:
+    """Fingerprints of the configured keys, primary first (empty when encryption is off)."""
+    _get_fernet()
+    return list(_key_ids)
+
+
+def key_index(token: str) -> int | None:
+    """Index of the key a token was encrypted with, or None if no configured key matches.
+
+    Only the token's HMAC is checked (no decryption), so this is cheap.
+    """
+    if _get_fernet() is None:
+        return None
+    raw = token.encode("ascii")
+    for i, f in enumerate(_keys):
+        try:
+            f.extract_timestamp(raw)
+            return i
+        except InvalidToken:
+            continue
+    return None
+
+
+def rotate_token(token: str) -> str:
+    """Re-encrypt a token under the primary key. Raises InvalidToken if no key matches."""
+    return _get_fernet().rotate(token.encode("ascii")).decode("ascii")
+
+
 def encrypt_text(plaintext: str | None) -> str | None:
     """Encrypt a plaintext string. Returns ciphertext or None if input is None."""
     if plaintext is None:
@@ -73,25 +128,126 @@ def decrypt_text(ciphertext: str | None) -> str | None:
         return ciphertext
 
 
+def _dumps(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def pack_json(data: Any) -> bytes:
+    """Serialize to the envelope format (format byte + payload)."""
+    raw = _dumps(data)
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, _ZLIB_LEVEL)
+        if len(packed) < len(raw):
+            return bytes((ENVELOPE_ZLIB_JSON,)) + packed
+    return bytes((ENVELOPE_JSON,)) + raw
+
+
+def unpack_json(blob: bytes) -> Any:
+    """Inverse of pack_json; also accepts legacy bare JSON bytes."""
+    if blob[:1] == bytes((ENVELOPE_ZLIB_JSON,)):
+        return json.loads(zlib.decompress(blob[1:]))
+    if blob[:1] == bytes((ENVELOPE_JSON,)):
+        return json.loads(blob[1:])
+    return json.loads(blob)
+
+
 def encrypt_json(data: Any) -> str | None:
-    """JSON-serialize then encrypt. Returns ciphertext string or None."""
+    """Serialize to the compact envelope then encrypt. Returns ciphertext string or None.
+
+    Without encryption keys (dev mode) the value is stored as plain JSON text.
+    """
     if data is None:
         return None
-    serialized = json.dumps(data, ensure_ascii=False)
-    return encrypt_text(serialized)
+    f = _get_fernet()
+    if f is None:
+        return _dumps(data).decode("utf-8")
+    return f.encrypt(pack_json(data)).decode("ascii")
 
 
 def decrypt_json(ciphertext: str | None) -> Any:
-    """Decrypt then JSON-parse. Handles raw dicts/lists from old JSON columns."""
+    """Decrypt then parse. Handles envelope tokens, legacy JSON-text tokens,
+    plaintext JSON, and raw dicts/lists from old JSON columns."""
     if ciphertext is None:
         return None
     # If it's already a dict or list (loaded from old JSON column before migration), pass through
     if isinstance(ciphertext, (dict, list)):
         return ciphertext
-    plaintext = decrypt_text(ciphertext)
-    if plaintext is None:
-        return None
+    f = _get_fernet()
+    if f is not None and ciphertext.startswith(FERNET_PREFIX):
+        try:
+            blob = f.decrypt(ciphertext.encode("ascii"))
+        except InvalidToken:
+            log.warning("Failed to decrypt value (wrong key?), returning raw")
+            return ciphertext
+        try:
+            return unpack_json(blob)
+        except (json.JSONDecodeError, UnicodeDecodeError, zlib.error):
+            return blob.decode("utf-8", errors="replace")
     try:
-        return json.loads(plaintext)
+        return json.loads(ciphertext)
     except (json.JSONDecodeError, TypeError):
-        return plaintext
+        return ciphertext
+
+
+def wrap_key(key: bytes) -> str:
+    """Encrypt a data key with the master keys."""
+    return _get_fernet().encrypt(key).decode("ascii")
+
+
+def unwrap_key(wrapped: str) -> bytes:
+    return _get_fernet().decrypt(wrapped.encode("ascii"))
+
+
+class UserCipher:
+    """Encrypts one user's data under their data key; also reads master-key tokens.
+
+    Without a data key (encryption disabled) it behaves like the module functions.
+    """
+
+    def __init__(self, fernet: Fernet | None = None):
+        self._f = fernet
+
+    def _decrypt(self, ciphertext: str) -> bytes | None:
+        if self._f is None:
+            log.warning("No data key to decrypt a per-user value")
+            return None
+        try:
+            return self._f.decrypt(ciphertext[len(USER_TOKEN_PREFIX):].encode("ascii"))
+        except InvalidToken:
+            log.warning("Failed to decrypt per-user value (wrong or deleted data key?), returning raw")
+            return None
+
+    def encrypt_text(self, plaintext: str | None) -> str | None:
+        if plaintext is None or self._f is None:
+            return encrypt_text(plaintext)
+        return USER_TOKEN_PREFIX + self._f.encrypt(plaintext.encode("utf-8")).decode("ascii")
+
+    def decrypt_text(self, ciphertext: str | None) -> str | None:
+        if ciphertext is None or not ciphertext.startswith(USER_TOKEN_PREFIX):
+            return decrypt_text(ciphertext)
+        blob = self._decrypt(ciphertext)
+        return ciphertext if blob is None else blob.decode("utf-8")
+
+    def encrypt_json(self, data: Any) -> str | None:
+        if data is None or self._f is None:
+            return encrypt_json(data)
+        return USER_TOKEN_PREFIX + self._f.encrypt(pack_json(data)).decode("ascii")
+
+    def decrypt_json(self, ciphertext: str | None) -> Any:
+        if not isinstance(ciphertext, str) or not ciphertext.startswith(USER_TOKEN_PREFIX):
+            return decrypt_json(ciphertext)
+        blob = self._decrypt(ciphertext)
+        if blob is None:
+            return ciphertext
+        try:
+            return unpack_json(blob)
+        except (json.JSONDecodeError, UnicodeDecodeError, zlib.error):
+            return blob.decode("utf-8", errors="replace")
+
+    def adopt(self, token: str) -> str:
+        """Move a master-key token onto the data key, payload bytes unchanged.
+
+        Raises InvalidToken if no configured master key matches.
+        """
+        blob = _get_fernet().decrypt(token.encode("ascii"))
+        return USER_TOKEN_PREFIX + self._f.encrypt(blob).decode("ascii")
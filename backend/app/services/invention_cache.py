@@ -0,0 +1,164 @@
+"""Similarity-keyed cache of Step 1 invention analyses.
+
+Slightly reworded specs for the same product produce near-identical search
+strategies and CPC codes, so a fresh Step 1 LLM call buys little.  The
+normalized request fields are MinHashed and indexed with LSH; a lookup
+reuses the closest prior analysis (same user) whose estimated Jaccard
+similarity clears INVENTION_CACHE_THRESHOLD.
+
+A sampled fraction of hits (INVENTION_CACHE_AUDIT_RATE) is re-run fresh in
+the background and compared with the reused result, so drift shows up in
+/admin/metrics as ``invention_cache.drift``.  The cache is per process and
+bounded (LRU).
+"""
+
+import asyncio
+import logging
+import random
+import re
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from app.core import metrics
+from app.core.config import settings
+from app.schemas.patent import PatentAnalysisRequest
+from app.services import minhash
+
+log = logging.getLogger("mousetrap.invention_cache")
+
+
+@dataclass
+class _Entry:
+    scope: str
+    sig: tuple[int, ...]
+    invention: dict
+
+
+_entries: OrderedDict[int, _Entry] = OrderedDict()
+_buckets: dict[tuple, set[int]] = {}
+_next_id = 0
+_audits: set[asyncio.Task] = set()
+
+
+def _normalize(req: PatentAnalysisRequest) -> str:
+    """The fields Step 1 sees, lowercased, whitespace-collapsed, lists sorted."""
+    def norm(s: str) -> str:
+        return " ".join(re.findall(r"\w+", s.lower()))
+
+    def norm_list(items: list[str]) -> str:
+        return " ".join(sorted(norm(i) for i in items if i))
+
+    return " | ".join([
+        norm(req.product_text),
+        norm(req.variant.title),
+        norm(req.variant.summary),
+        norm_list(req.variant.keywords),
+        norm(req.spec.novelty),
+        norm(req.spec.mechanism),
+        norm(req.spec.baseline),
+        norm_list(req.spec.differentiators),
+        norm_list(req.spec.keywords),
+        norm_list(req.spec.search_queries),
+    ])
+
+
+def _scope(user_id: uuid.UUID | None) -> str:
+    return str(user_id) if user_id is not None else "-"
+
+
+def _signature(req: PatentAnalysisRequest) -> tuple[int, ...]:
+    return minhash.signature(minhash.shingles(_normalize(req)))
+
+
+def lookup(req: PatentAnalysisRequest, user_id: uuid.UUID | None = None) -> tuple[dict, float] | None:
+    """Closest cached analysis at or above the threshold, with its similarity."""
+    if settings.invention_cache_threshold <= 0:
+        return None
+    scope = _scope(user_id)
+    sig = _signature(req)
+    candidates: set[int] = set()
+    for key in minhash.lsh_keys(sig):
+        candidates |= _buckets.get((scope, key), set())
+
+    best_id, best_sim = None, 0.0
+    for entry_id in candidates:
+        sim = minhash.estimate_jaccard(sig, _entries[entry_id].sig)
+        if sim > best_sim:
+            best_id, best_sim = entry_id, sim
+
+    if best_id is None or best_sim < settings.invention_cache_threshold:
+        metrics.inc("invention_cache.misses")
+        return None
+    _entries.move_to_end(best_id)
+    metrics.inc("invention_cache.hits")
+    return _entries[best_id].invention, best_sim
+
+
+def add(req: PatentAnalysisRequest, invention: dict, user_id: uuid.UUID | None = None) -> None:
+    global _next_id
+    if settings.invention_cache_threshold <= 0 or invention.get("fallback"):
+        return
+    entry = _Entry(scope=_scope(user_id), sig=_signature(req), invention=invention)
+    entry_id = _next_id
+    _next_id += 1
+    _entries[entry_id] = entry
+    for key in minhash.lsh_keys(entry.sig):
+        _buckets.setdefault((entry.scope, key), set()).add(entry_id)
+    while len(_entries) > settings.invention_cache_max_entries:
+        _evict(next(iter(_entries)))
+
+
+def _evict(entry_id: int) -> None:
+    entry = _entries.pop(entry_id)
+    for key in minhash.lsh_keys(entry.sig):
+        bucket = _buckets.get((entry.scope, key))
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del _buckets[(entry.scope, key)]
+
+
+def _features(invention: dict) -> set[str]:
+    """What Step 1 feeds downstream: strategy queries and CPC codes."""
+    out = set()
+    for s in invention.get("search_strategies", []):
+        if isinstance(s, dict) and s.get("query"):
+            out.add("q:" + " ".join(s["query"].lower().split()))
+    for c in invention.get("cpc_codes", []):
+        code = c.get("code", "") if isinstance(c, dict) else str(c)
+        if code:
+            out.add("cpc:" + code.replace(" ", "").upper())
+    return out
+
+
+def drift(reused: dict, fresh: dict) -> float:
+    """1 - Jaccard overlap of the strategy queries and CPC codes (0 = identical)."""
+    a, b = _features(reused), _features(fresh)
+    if not a and not b:
+        return 0.0
+    return 1.0 - len(a & b) / len(a | b)
+
+
+def maybe_audit(reused: dict, fresh_call: Callable[[], Awaitable[dict]]) -> None:
+    """On a sampled fraction of hits, run Step 1 fresh in the background and record drift."""
+    if random.random() >= settings.invention_cache_audit_rate:
+        return
+
+    async def _audit() -> None:
+        try:
+            fresh = await fresh_call()
+        except Exception:
+            log.exception("Invention cache audit failed")
+            return
+        if fresh.get("fallback"):
+            return
+        d = drift(reused, fresh)
+        metrics.inc("invention_cache.audits")
+        metrics.observe("invention_cache.drift", d)
+        log.info("Invention cache audit: drift %.2f", d)
+
+    task = asyncio.create_task(_audit())
+    _audits.add(task)
+    task.add_done_callback(_audits.discard)
@@ -0,0 +1,265 @@
+"""Background re-encryption of stored data under the primary encryption key.
+
+MultiFernet decrypts with any configured key, so after ENCRYPTION_KEYS is
+rotated old rows stay readable, but every read of them tries the keys in turn
+and the old key can never be dropped.  A rotation walks each encrypted table
+in primary-key order, one batch per transaction, and re-encrypts every value
+not already on the primary key.  The keyset cursor and per-key row counts are
+saved in ``key_rotation_runs`` in the same transaction as the batch, so a
+restart resumes where it stopped, and the job sleeps between batches so it
+spends at most ``key_rotation_duty_cycle`` of its time working.
+
+Session data written under per-user data keys (``u1.`` tokens) needs no
+rotation itself: only the wrapped data keys in ``user_data_keys`` are on the
+master keys, and they are rotated like any other value.
+
+A value is only replaced if it hasn't changed since it was read.  Rotation
+doesn't change content, so session versions and ``updated_at`` are untouched.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import settings
+from app.models.artifact import SessionArtifact
+from app.models.data_key import UserDataKey
+from app.models.database import async_session
+from app.models.draft_section import PatentDraftSection
+from app.models.job import AnalysisJob
+from app.models.key_rotation import KeyRotationRun
+from app.models.session import Session
+from app.services.encryption import FERNET_PREFIX, USER_TOKEN_PREFIX, key_ids, key_index, rotate_token
+
+log = logging.getLogger("mousetrap.key_rotation")
+
+# Tables rotated, in order: (model, keyset column, encrypted columns).
+# Analysis checkpoints expire within a day and are left to age out.
+_TABLES = {
+    "user_data_keys": (UserDataKey, UserDataKey.user_id, ("wrapped_key",)),
+    "sessions": (Session, Session.id, (
+        "product_text", "title", "variants_json", "selected_variant_json", "spec_json",
+        "patent_hits_json", "patent_draft_json", "prototype_json", "export_markdown", "export_plain_text",
+    )),
+    "session_artifacts": (SessionArtifact, SessionArtifact.digest, ("content",)),
+    "patent_draft_sections": (PatentDraftSection, PatentDraftSection.id, ("content",)),
+    "analysis_jobs": (AnalysisJob, AnalysisJob.id, ("request_json", "result_json")),
+}
+
+UNKNOWN_KEY = "unknown"  # encrypted with a key no longer configured
+UNENCRYPTED = "unencrypted"  # no encrypted values (all null, or written in dev mode)
+USER_KEY = "user_key"  # only per-user data key tokens, independent of the master keys
+
+_task: asyncio.Task | None = None
+
+
+def _row_key(values, ids: list[str]) -> str:
+    """The key a row is on: its oldest master key, UNKNOWN_KEY if any value matches none."""
+    oldest, user_key = None, False
+    for value in values:
+        if isinstance(value, str) and value.startswith(USER_TOKEN_PREFIX):
+            user_key = True
+        if not isinstance(value, str) or not value.startswith(FERNET_PREFIX):
+            continue
+        index = key_index(value)
+        if index is None:
+            return UNKNOWN_KEY
+        oldest = index if oldest is None else max(oldest, index)
+    if oldest is not None:
+        return ids[oldest]
+    return USER_KEY if user_key else UNENCRYPTED
+
+
+def _cursor(column, last_key: str):
+    return uuid.UUID(last_key) if column.type.python_type is uuid.UUID else last_key
+
+
+async def _rotate_batch(table: str, key_id: str) -> bool:
+    """Rotate the next batch of ``table``. False once the run is finished or another worker holds it."""
+    model, keyset, fields = _TABLES[table]
+    columns = [getattr(model, f) for f in fields]
+    ids = key_ids()
+    # Columns with an onupdate default (updated_at) keep their value
+    keep = {c.name: c for c in model.__table__.columns if c.onupdate is not None}
+
+    async with async_session() as db:
+        run = (await db.execute(
+            select(KeyRotationRun)
+            .where(KeyRotationRun.table_name == table, KeyRotationRun.key_id == key_id)
+            .with_for_update(skip_locked=True)
+        )).scalar_one_or_none()
+        if run is None or run.status != "running":
+            return False
+
+        stmt = select(keyset, *columns).order_by(keyset).limit(settings.key_rotation_batch_size)
+        if run.last_key is not None:
+            stmt = stmt.where(keyset > _cursor(keyset, run.last_key))
+        rows = (await db.execute(stmt)).all()
+
+        counts = Counter(json.loads(run.key_counts))
+        rotated = 0
+        for row in rows:
+            values = dict(zip(fields, row[1:]))
+            label = _row_key(values.values(), ids)
+            counts[label] += 1
+            if label in (UNKNOWN_KEY, UNENCRYPTED, USER_KEY, key_id):
+                continue
+            changes = {
+                f: rotate_token(v) for f, v in values.items()
+                if isinstance(v, str) and v.startswith(FERNET_PREFIX) and key_index(v) != 0
+            }
+            result = await db.execute(
+                update(model)
+                .where(keyset == row[0], *(getattr(model, f) == values[f] for f in changes))
+                .values(**changes, **keep)
+                .execution_options(synchronize_session=False)
+            )
+            rotated += result.rowcount or 0
+
+        run.rows_scanned += len(rows)
+        run.rows_rotated += rotated
+        run.key_counts = json.dumps(dict(counts))
+        if rows:
+            run.last_key = str(rows[-1][0])
+        done = len(rows) < settings.key_rotation_batch_size
+        if done:
+            run.status = "completed"
+            run.finished_at = datetime.now(timezone.utc)
+        await db.commit()
+
+    metrics.inc("key_rotation.rows_rotated", rotated)
+    return not done
+
+
+async def _ensure_runs(key_id: str) -> None:
+    """Create the runs for this primary key; restart any that failed (from their cursor)."""
+    async with async_session() as db:
+        for table in _TABLES:
+            await db.execute(
+                insert(KeyRotationRun)
+                .values(table_name=table, key_id=key_id)
+                .on_conflict_do_nothing(index_elements=["table_name", "key_id"])
+            )
+        await db.execute(
+            update(KeyRotationRun)
+            .where(KeyRotationRun.key_id == key_id, KeyRotationRun.status == "failed")
+            .values(status="running", error=None)
+        )
+        await db.commit()
+
+
+async def _mark_failed(table: str, key_id: str, error: str) -> None:
+    async with async_session() as db:
+        await db.execute(
+            update(KeyRotationRun)
+            .where(KeyRotationRun.table_name == table, KeyRotationRun.key_id == key_id)
+            .values(status="failed", error=error[:2000])
+        )
+        await db.commit()
+
+
+async def run_rotation() -> None:
+    """Re-encrypt every table under the current primary key, resuming saved progress."""
+    key_id = key_ids()[0]
+    await _ensure_runs(key_id)
+    duty = min(max(settings.key_rotation_duty_cycle, 0.01), 1.0)
+    for table in _TABLES:
+        try:
+            while True:
+                started = time.monotonic()
+                if not await _rotate_batch(table, key_id):
+                    break
+                await asyncio.sleep((time.monotonic() - started) * (1 / duty - 1))
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            log.exception("Key rotation of %s failed", table)
+            await _mark_failed(table, key_id, f"{type(exc).__name__}: {exc}")
+            return
+        log.info("Key rotation pass over %s (key %s) done", table, key_id)
+
+
+def start_rotation() -> bool:
+    """Start (or resume) rotation in the background. False if encryption is off."""
+    global _task
+    if not key_ids():
+        return False
+    if _task is None or _task.done():
+        _task = asyncio.create_task(run_rotation())
+    return True
+
+
+def resume_rotation() -> None:
+    """On startup: rotate when old keys are still configured (finished runs are no-ops)."""
+    if len(key_ids()) > 1:
+        start_rotation()
+
+
+async def stop_rotation() -> None:
+    """Stop this worker's rotation; progress is kept and resumes on the next start."""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+
+
+def _on_key(counts: dict[str, int], ids: list[str], progress: float) -> dict[str, float]:
+    """Estimated share of all rows on each key now.
+
+    Scanned rows are on the primary key (unless their key is unknown); the
+    rest are assumed to be spread like the scanned rows were.
+    """
+    scanned = sum(counts.values())
+    found = {k: n / scanned for k, n in counts.items()}
+    share = {k: (1 - progress) * found.get(k, 0.0) for k in ids[1:]}
+    share[ids[0]] = progress * sum(found.get(k, 0.0) for k in ids) + (1 - progress) * found.get(ids[0], 0.0)
+    for k in (UNKNOWN_KEY, UNENCRYPTED, USER_KEY):
+        share[k] = found.get(k, 0.0)
+    return {k: round(v, 4) for k, v in share.items()}
+
+
+async def rotation_status(db: AsyncSession) -> dict:
+    """Progress of the rotation to the current primary key, per table."""
+    ids = key_ids()
+    if not ids:
+        return {"enabled": False, "keys": [], "running": False, "tables": {}}
+    result = await db.execute(select(KeyRotationRun).where(KeyRotationRun.key_id == ids[0]))
+    runs = {run.table_name: run for run in result.scalars().all()}
+
+    tables = {}
+    for table, (model, keyset, _) in _TABLES.items():
+        total = (await db.execute(select(func.count()).select_from(model))).scalar_one()
+        run = runs.get(table)
+        if run is None:
+            tables[table] = {"status": "not_started", "rows": total}
+            continue
+        counts = json.loads(run.key_counts)
+        progress = 1.0 if run.status == "completed" or not total else min(run.rows_scanned / total, 1.0)
+        tables[table] = {
+            "status": run.status,
+            "rows": total,
+            "rows_scanned": run.rows_scanned,
+            "rows_rotated": run.rows_rotated,
+            "progress": round(progress, 4),
+            "on_key": _on_key(counts, ids, progress) if counts else None,
+            "error": run.error,
+            "started_at": run.started_at.isoformat(),
+            "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+        }
+    return {
+        "enabled": True,
+        "keys": ids,
+        "primary": ids[0],
+        "running": _task is not None and not _task.done(),
+        "tables": tables,
+    }
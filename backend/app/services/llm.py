@@ -1,12 +1,15 @@
 """LLM service abstraction — pluggable between Anthropic and OpenAI."""
 
+import asyncio
 import json
 import logging
 import re
+import threading
 
 import anthropic
 import httpx
 
+from app.core import metrics
 from app.core.config import settings
 
 log = logging.getLogger("mousetrap.llm")
@@ -16,9 +19,18 @@ class LLMError(Exception):
     """Raised when an LLM call fails or returns unparseable output."""
 
 
+class LLMCancelled(LLMError):
+    """Raised inside the worker thread when the awaiting caller was cancelled."""
+
+
 # ── Anthropic ────────────────────────────────────────────────────────
 
-def _call_anthropic(prompt: str, system: str | None = None, max_tokens: int | None = None) -> str:
+def _call_anthropic(
+    prompt: str,
+    system: str | None = None,
+    max_tokens: int | None = None,
+    cancel: threading.Event | None = None,
+) -> str:
     client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
     messages = [{"role": "user", "content": prompt}]
     kwargs: dict = {
@@ -28,17 +40,25 @@ def _call_anthropic(prompt: str, system: str | None = None, max_tokens: int | No
     }
     if system:
         kwargs["system"] = system
-    # Use streaming to avoid timeout errors on large max_tokens requests
+    # Use streaming to avoid timeout errors on large max_tokens requests;
+    # leaving the stream context early closes the connection and stops generation
     result_text = ""
     with client.messages.stream(**kwargs) as stream:
         for text in stream.text_stream:
+            if cancel is not None and cancel.is_set():
+                raise LLMCancelled("LLM stream cancelled by caller")
             result_text += text
     return result_text
 
 
 # ── OpenAI ───────────────────────────────────────────────────────────
 
-def _call_openai(prompt: str, system: str | None = None, max_tokens: int | None = None) -> str:
+def _call_openai(
+    prompt: str,
+    system: str | None = None,
+    max_tokens: int | None = None,
+    cancel: threading.Event | None = None,
+) -> str:
     headers = {
         "Authorization": f"Bearer {settings.openai_api_key}",
         "Content-Type": "application/json",
@@ -52,6 +72,9 @@ def _call_openai(prompt: str, system: str | None = None, max_tokens: int | None
         "max_tokens": max_tokens or settings.llm_max_tokens,
         "messages": messages,
     }
+    # Non-streaming: cancellation can only be honoured before the request is sent
+    if cancel is not None and cancel.is_set():
+        raise LLMCancelled("LLM call cancelled by caller")
     resp = httpx.post(
         "https://api.openai.com/v1/chat/completions",
         headers=headers,
@@ -210,6 +233,7 @@ def call_llm(
     json_schema_hint: str = "",
     system: str | None = None,
     max_tokens: int | None = None,
+    cancel: threading.Event | None = None,
 ) -> dict:
     """Call the configured LLM provider and return parsed JSON.
 
@@ -219,6 +243,8 @@ def call_llm(
             model knows the expected output shape.
         system: Optional system prompt.
         max_tokens: Override the default max_tokens for this call.
+        cancel: When set, the provider call stops reading output and raises
+            LLMCancelled.
 
     Returns:
         Parsed dict from the LLM's JSON output.
@@ -238,7 +264,9 @@ def call_llm(
 
     log.info("Calling %s (model=%s, max_tokens=%s)", provider, settings.llm_model, max_tokens or settings.llm_max_tokens)
     try:
-        raw = call_fn(full_prompt, system=system, max_tokens=max_tokens)
+        raw = call_fn(full_prompt, system=system, max_tokens=max_tokens, cancel=cancel)
+    except LLMCancelled:
+        raise
     except Exception as exc:
         raise LLMError(f"LLM call failed: {exc}") from exc
 
@@ -252,6 +280,15 @@ async def call_llm_async(
     system: str | None = None,
     max_tokens: int | None = None,
 ) -> dict:
-    """Async wrapper around call_llm using asyncio.to_thread."""
-    import asyncio
-    return await asyncio.to_thread(call_llm, prompt, json_schema_hint, system, max_tokens)
+    """Async wrapper around call_llm using asyncio.to_thread.
+
+    Cancelling the awaiting task (client disconnect, deadline) signals the
+    worker thread, which stops the provider stream instead of running on.
+    """
+    cancel = threading.Event()
+    try:
+        return await asyncio.to_thread(call_llm, prompt, json_schema_hint, system, max_tokens, cancel)
+    except asyncio.CancelledError:
+        cancel.set()
+        metrics.inc("llm.calls_cancelled")
+        raise
@@ -0,0 +1,71 @@
+"""MinHash / LSH helpers for cheap near-duplicate detection.
+
+Text is reduced to word shingles, each shingle set to a fixed-size MinHash
+signature, and signatures are bucketed with LSH banding so only likely
+matches are ever compared.  Pure Python — signatures are small (64 ints)
+and the inputs here are patent titles/abstracts and idea specs.
+"""
+
+import hashlib
+import re
+import struct
+
+# Mersenne prime used for the universal hash family (a*x + b) mod p
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+NUM_PERM = 64
+
+
+def _permutations(num_perm: int) -> list[tuple[int, int]]:
+    """Deterministic (a, b) coefficients so signatures are stable across processes."""
+    coeffs = []
+    for i in range(num_perm):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a, b = struct.unpack("<QQ", digest)
+        coeffs.append(((a % (_PRIME - 1)) + 1, b % _PRIME))
+    return coeffs
+
+
+_COEFFS = _permutations(NUM_PERM)
+
+
+def shingles(text: str, k: int = 3) -> set[str]:
+    """Lowercased word k-shingles. Short texts fall back to single words."""
+    words = re.findall(r"\w+", (text or "").lower())
+    if len(words) < k:
+        return set(words)
+    return {" ".join(words[i : i + k]) for i in range(len(words) - k + 1)}
+
+
+def _hash_shingle(s: str) -> int:
+    return struct.unpack("<I", hashlib.blake2b(s.encode(), digest_size=4).digest())[0]
+
+
+def signature(shingle_set: set[str]) -> tuple[int, ...]:
+    """MinHash signature of a shingle set (all-max for an empty set)."""
+    if not shingle_set:
+        return (_MAX_HASH,) * NUM_PERM
+    hashed = [_hash_shingle(s) for s in shingle_set]
+    return tuple(
+        min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashed)
+        for a, b in _COEFFS
+    )
+
+
+def estimate_jaccard(sig_a: tuple[int, ...], sig_b: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity: fraction of matching signature slots."""
+    if not sig_a or not sig_b:
+        return 0.0
+    same = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+    return same / len(sig_a)
+
+
+def lsh_keys(sig: tuple[int, ...], bands: int = 16) -> list[tuple[int, tuple[int, ...]]]:
+    """Split a signature into bands; two signatures sharing any key are candidates.
+
+    16 bands x 4 rows puts the 50% candidate probability near Jaccard ~0.5,
+    so anything above the dedup thresholds used here is almost always caught.
+    """
+    rows = len(sig) // bands
+    return [(b, sig[b * rows : (b + 1) * rows]) for b in range(bands)]
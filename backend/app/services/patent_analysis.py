@@ -8,7 +8,12 @@ Step 4: LLM professional analysis (novelty, obviousness, claim strategy)
 
 import asyncio
 import logging
+import time
+import uuid
+from collections.abc import Callable, Coroutine
 
+from app.core.config import settings
+from app.core.deadline import Deadline
 from app.schemas.patent import (
     ClaimStrategy,
     CpcSuggestion,
@@ -20,9 +25,14 @@ from app.schemas.patent import (
     PatentAnalysisRequest,
     PatentAnalysisResponse,
     PriorArtSummary,
+    QuickScanResponse,
     SearchMetadata,
     SearchStrategy,
+    SpecRef,
+    VariantRef,
 )
+from app.services import cpc_scheme, invention_cache, minhash, search_yield
+from app.services.analysis_checkpoints import Checkpointer
 from app.services.llm import LLMError, call_llm_async
 from app.services.patentsview import (
     deduplicate_hits,
@@ -31,6 +41,8 @@ from app.services.patentsview import (
     search_keyword_broad_async,
     search_keyword_focused_async,
 )
+from app.services.patent_store import search_documents, store_and_attach_digests
+from app.services.prompt_packing import MIN_PATENTS, pack_patents, patent_budget_for_model
 from app.services.prompts import (
     INVENTION_ANALYSIS_SCHEMA,
     INVENTION_ANALYSIS_SYSTEM,
@@ -40,24 +52,226 @@ from app.services.prompts import (
     build_professional_analysis_prompt,
 )
 from app.services.scoring import score_hits_heuristic
+from app.services.search_yield import SearchPlan
 
 log = logging.getLogger("mousetrap.patent_analysis")
 
+# Called as progress(event, detail) as the workflow advances.  Events:
+# invention_analysis, search_phase, search, scoring, professional_analysis.
+ProgressCallback = Callable[[str, dict], None]
+
+
+async def run_patent_analysis(
+    req: PatentAnalysisRequest,
+    progress: ProgressCallback | None = None,
+    checkpoint_key: str | None = None,
+    user_id: uuid.UUID | None = None,
+    deadline: Deadline | None = None,
+) -> PatentAnalysisResponse:
+    """Execute the full 4-step patent analysis workflow.
+
+    Searches that only need the request (product text, spec queries, spec
+    keywords) are launched alongside the Step 1 LLM call; the strategy and
+    CPC searches start as soon as Step 1 returns.  ``progress`` receives an
+    event as each step (and each search phase) completes.
+
+    With a ``checkpoint_key`` (and owning ``user_id``) each completed step is
+    checkpointed and a repeated call resumes after the last step that finished.
+
+    Everything runs against ``deadline`` (ANALYSIS_DEADLINE_SECONDS by
+    default): Step 1 falls back to the spec, searches keep whatever finished
+    in time, and Step 4 shrinks its candidate set or falls back to the
+    heuristic analysis.  Each miss is listed in ``deadline_misses``; degraded
+    steps (deadline misses and LLM fallbacks) are not checkpointed.  Callers
+    clear the checkpoints (clear_checkpoints) once the result is delivered.
+    """
+    deadline = deadline or Deadline(settings.analysis_deadline_seconds)
+    ckpt = Checkpointer(checkpoint_key, user_id)
+    await ckpt.load()
+
+    scored_ckpt = ckpt.get("scored")
+    if scored_ckpt is not None:
+        invention = scored_ckpt["invention"]
+        scored = scored_ckpt["hits"]
+        metadata_dict = scored_ckpt["metadata"]
+    else:
+        raw_ckpt = ckpt.get("raw_hits")
+        if raw_ckpt is not None:
+            invention, all_hits, metadata = raw_ckpt["invention"], raw_ckpt["hits"], raw_ckpt["metadata"]
+        else:
+            # ── Steps 1 + 2: Invention analysis overlapped with search ──
+            invention, all_hits, metadata = await _steps_1_and_2(req, progress, ckpt, deadline)
+            if not metadata["deadline_misses"] and not invention.get("fallback"):
+                await ckpt.save("raw_hits", {"invention": invention, "hits": all_hits, "metadata": metadata})
+        _emit(progress, "search", hits=len(all_hits), queries=metadata["total_queries"])
+
+        # ── Step 3: Heuristic scoring + dedup ────────────────────────
+        scored, metadata_dict = _step3_score_and_dedup(req, invention, all_hits, metadata)
+        if raw_ckpt is None:
+            search_yield.record(metadata.get("source_queries", {}), all_hits, scored[: req.limit])
+        await store_and_attach_digests(scored)
+        if not metadata_dict["deadline_misses"] and not invention.get("fallback"):
+            await ckpt.save("scored", {"invention": invention, "hits": scored, "metadata": metadata_dict})
+    _emit(progress, "scoring", hits=len(scored))
 
-async def run_patent_analysis(req: PatentAnalysisRequest) -> PatentAnalysisResponse:
-    """Execute the full 4-step patent analysis workflow."""
+    # ── Step 4: LLM Professional Analysis ────────────────────────────
+    analysis = ckpt.get("analysis")
+    if analysis is None:
+        log.info("Step 4: Running professional analysis via LLM on %d hits", len(scored))
+        analysis = await _step4_professional_analysis(req, invention, scored, deadline)
+        if not analysis.get("fallback") and not analysis.get("deadline_misses"):
+            await ckpt.save("analysis", analysis)
+    _emit(progress, "professional_analysis")
 
-    # ── Step 1: LLM Invention Analysis ───────────────────────────────
-    log.info("Step 1: Running invention analysis via LLM")
-    invention = await _step1_invention_analysis(req)
+    return _build_response(invention, scored, metadata_dict, analysis)
 
-    # ── Step 2: Multi-phase patent search ────────────────────────────
-    log.info("Step 2: Running multi-phase patent search")
-    all_hits, metadata = await _step2_multi_phase_search(req, invention)
 
-    # ── Step 3: Heuristic scoring + dedup ────────────────────────────
+def _build_response(
+    invention: dict, scored: list[dict], metadata_dict: dict, analysis: dict
+) -> PatentAnalysisResponse:
+    inv_analysis = _parse_invention_analysis(invention)
+    enhanced_hits = _build_enhanced_hits(scored, analysis)
+    search_meta = SearchMetadata(
+        **{**metadata_dict, "deadline_misses": metadata_dict["deadline_misses"] + analysis.get("deadline_misses", [])},
+        prompt_tokens_saved=analysis.get("prompt_packing", {}).get("tokens_saved", 0),
+    )
+
+    return PatentAnalysisResponse(
+        invention_analysis=inv_analysis,
+        hits=enhanced_hits,
+        search_metadata=search_meta,
+        novelty_assessment=_parse_novelty(analysis),
+        obviousness_assessment=_parse_obviousness(analysis),
+        eligibility_note=_parse_eligibility(analysis),
+        prior_art_summary=_parse_prior_art_summary(analysis),
+        claim_strategy=_parse_claim_strategy(analysis),
+        confidence=_compute_confidence(scored),
+        disclaimer=analysis.get(
+            "disclaimer",
+            "This is an automated preliminary analysis and does not constitute legal advice. "
+            "This search is not exhaustive. Consult a registered patent attorney for a "
+            "professional patentability opinion.",
+        ),
+    )
+
+
+async def run_batch_analysis(
+    product_text: str,
+    variants: list[tuple[VariantRef, SpecRef]],
+    limit: int = 15,
+    deadline: Deadline | None = None,
+    user_id: uuid.UUID | None = None,
+) -> tuple[list[PatentAnalysisResponse], dict]:
+    """Analyze several variants of one product with a single shared search pass.
+
+    Step 1 and the searches run for every variant concurrently, with
+    identical PatentsView queries (the product-text searches, shared CPC
+    codes, overlapping strategies) issued once via a SearchMemo.  The union
+    of all variants' hits is then scored once per variant and Step 4 runs
+    per variant concurrently.  Returns one response per variant (in order)
+    and batch stats.  Checkpoints are not used.
+    """
+    deadline = deadline or Deadline(settings.analysis_deadline_seconds)
+    reqs = [
+        PatentAnalysisRequest(product_text=product_text, variant=v, spec=s, limit=limit)
+        for v, s in variants
+    ]
+    memo = SearchMemo()
+    try:
+        searched = await asyncio.gather(*(
+            _steps_1_and_2(r, None, Checkpointer(user_id=user_id), deadline, memo) for r in reqs
+        ))
+    finally:
+        memo.cancel_all()
+    # Yield stats are not recorded here: pooled hits can't be attributed to one variant's queries
+    union = [h for _, hits, _ in searched for h in hits]
+    pooled = len({h["patent_id"] for h in union if h.get("patent_id")})
+    log.info(
+        "Batch search: %d variants, %d queries (%d shared), %d pooled patents",
+        len(reqs), memo.issued, memo.shared, pooled,
+    )
+
+    scored_all = []
+    for r, (invention, _, metadata) in zip(reqs, searched):
+        # Each variant scores its own copy of the pool — scoring annotates hits in place
+        scored, metadata_dict = _step3_score_and_dedup(r, invention, [dict(h) for h in union], metadata)
+        scored_all.append((scored, metadata_dict))
+    await store_and_attach_digests([h for scored, _ in scored_all for h in scored])
+
+    analyses = await asyncio.gather(*(
+        _step4_professional_analysis(r, invention, scored, deadline)
+        for r, (invention, _, _), (scored, _) in zip(reqs, searched, scored_all)
+    ))
+    responses = [
+        _build_response(invention, scored, metadata_dict, analysis)
+        for (invention, _, _), (scored, metadata_dict), analysis in zip(searched, scored_all, analyses)
+    ]
+    stats = {"queries_run": memo.issued, "queries_shared": memo.shared, "pooled_hits": pooled}
+    return responses, stats
+
+
+class SearchMemo:
+    """Issues each distinct PatentsView query once for the analyses of a batch.
+
+    Callers awaiting the same query share one task; it is shielded so one
+    variant hitting its deadline does not cancel the query for the others.
+    """
+
+    def __init__(self):
+        self._tasks: dict[tuple, asyncio.Future] = {}
+        self.issued = 0
+        self.shared = 0
+
+    async def run(self, fn: Callable[..., Coroutine], *args, **kwargs) -> list[dict]:
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn(*args, **kwargs))
+            self.issued += 1
+        else:
+            self.shared += 1
+        hits = await asyncio.shield(task)
+        return [dict(h) for h in hits]
+
+    def cancel_all(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+
+
+def _search(memo: SearchMemo | None, fn: Callable[..., Coroutine], *args, **kwargs) -> Coroutine:
+    return memo.run(fn, *args, **kwargs) if memo is not None else fn(*args, **kwargs)
+
+
+async def _steps_1_and_2(
+    req: PatentAnalysisRequest,
+    progress: ProgressCallback | None,
+    ckpt: Checkpointer,
+    deadline: Deadline,
+    memo: SearchMemo | None = None,
+) -> tuple[dict, list[dict], dict]:
+    # Steps 1–2 must leave the Step 4 reserve untouched
+    budget = deadline.sub(reserve=settings.analysis_step4_reserve_seconds)
+    misses: list[str] = []
+    log.info("Step 1: Running invention analysis via LLM (independent searches started)")
+    step1 = asyncio.create_task(_timed_step1(req, progress, ckpt, budget, misses))
+    log.info("Step 2: Running multi-phase patent search")
+    try:
+        with search_yield.searching():
+            all_hits, metadata = await _step2_multi_phase_search(req, step1, progress, budget, misses, memo)
+    except BaseException:
+        step1.cancel()
+        raise
+    invention, step1_ms = step1.result()
+    metadata["timings"]["invention_analysis"] = step1_ms
+    return invention, all_hits, metadata
+
+
+def _step3_score_and_dedup(
+    req: PatentAnalysisRequest, invention: dict, all_hits: list[dict], metadata: dict
+) -> tuple[list[dict], dict]:
     log.info("Step 3: Scoring and deduplicating %d hits", len(all_hits))
     all_hits, dups_removed = deduplicate_hits(all_hits)
+    near_dups = sum(h.get("related_count", 0) for h in all_hits)
     metadata_dict = {
         "total_queries_run": metadata["total_queries"],
         "keyword_hits": metadata["keyword_hits"],
@@ -65,49 +279,107 @@ async def run_patent_analysis(req: PatentAnalysisRequest) -> PatentAnalysisRespo
         "citation_hits": 0,
         "duplicates_removed": dups_removed,
         "phases_completed": metadata["phases"],
+        "near_duplicates_collapsed": near_dups,
+        "phase_timings_ms": metadata["timings"],
+        "deadline_misses": metadata.get("deadline_misses", []),
+        "queries_pruned": metadata.get("queries_pruned", 0),
     }
 
+    scored = score_hits_heuristic(all_hits, _scoring_keywords(req, invention))
+    # Filter out completely irrelevant results (no keyword overlap at all)
+    scored = [h for h in scored if h.get("score", 0) > 0.0]
+    scored = scored[: max(req.limit, 25)]
+    return scored, metadata_dict
+
+
+def _scoring_keywords(req: PatentAnalysisRequest, invention: dict) -> list[str]:
     # Combine all keywords for scoring — include product text, essential elements,
     # and baseline product terms so existing products score properly
     extra_kw = invention.get("essential_elements", [])
     # Split product_text into individual words for keyword matching
     product_words = [w for w in req.product_text.split() if len(w) > 2]
-    all_keywords = list(dict.fromkeys(
+    return list(dict.fromkeys(
         product_words + req.variant.keywords + req.spec.keywords + extra_kw
     ))
-    scored = score_hits_heuristic(all_hits, all_keywords)
-    # Filter out completely irrelevant results (no keyword overlap at all)
-    scored = [h for h in scored if h.get("score", 0) > 0.0]
-    scored = scored[: max(req.limit, 25)]
 
-    # ── Step 4: LLM Professional Analysis ────────────────────────────
-    log.info("Step 4: Running professional analysis via LLM on %d hits", len(scored))
-    analysis = await _step4_professional_analysis(req, invention, scored)
 
-    # ── Build response ───────────────────────────────────────────────
-    inv_analysis = _parse_invention_analysis(invention)
-    enhanced_hits = _build_enhanced_hits(scored, analysis)
-    search_meta = SearchMetadata(**metadata_dict)
+# ── Quick scan (no LLM) ──────────────────────────────────────────────
 
-    return PatentAnalysisResponse(
-        invention_analysis=inv_analysis,
-        hits=enhanced_hits,
-        search_metadata=search_meta,
-        novelty_assessment=_parse_novelty(analysis),
-        obviousness_assessment=_parse_obviousness(analysis),
-        eligibility_note=_parse_eligibility(analysis),
-        prior_art_summary=_parse_prior_art_summary(analysis),
-        claim_strategy=_parse_claim_strategy(analysis),
-        confidence=_compute_confidence(scored),
-        disclaimer=analysis.get(
-            "disclaimer",
-            "This is an automated preliminary analysis and does not constitute legal advice. "
-            "This search is not exhaustive. Consult a registered patent attorney for a "
-            "professional patentability opinion.",
-        ),
+# Weight of spec/hit text similarity in the quick-scan score (rest is heuristic)
+_QUICK_SIMILARITY_WEIGHT = 0.25
+
+
+async def run_quick_scan(req: PatentAnalysisRequest) -> QuickScanResponse:
+    """Fast "is this crowded?" signal: no LLM calls, bounded by QUICK_SCAN_BUDGET_SECONDS.
+
+    Runs the spec-driven searches (answered from the PatentsView result
+    cache when warm) alongside a title search of the local patent store,
+    keeps whatever returns within the budget, and ranks hits by the
+    keyword heuristic blended with MinHash similarity to the spec text.
+    """
+    started = time.perf_counter()
+    deadline = Deadline(settings.quick_scan_budget_seconds)
+    terms = list(dict.fromkeys(req.variant.keywords + req.spec.keywords + [req.product_text.strip()]))
+
+    local = asyncio.create_task(search_documents(terms))
+    tasks = _start_phases(_independent_search_phases(req), deadline=deadline)
+    try:
+        phase_results = await asyncio.gather(*tasks)
+        local_done, _ = await asyncio.wait({local}, timeout=deadline.remaining())
+    finally:
+        local.cancel()
+
+    all_hits: list[dict] = []
+    partial = False
+    for _, results, _, timed_out in phase_results:
+        partial = partial or bool(timed_out)
+        all_hits.extend(h for r in results if isinstance(r, list) for h in r)
+    if local in local_done and not local.cancelled() and local.exception() is None:
+        all_hits.extend(local.result())
+    elif local not in local_done:
+        partial = True
+    else:
+        log.warning("Quick scan local search failed: %s", local.exception())
+
+    all_hits, _ = deduplicate_hits(all_hits)
+    scored = [h for h in score_hits_heuristic(all_hits, _scoring_keywords(req, {})) if h.get("score", 0) > 0.0]
+
+    # Similarity stage: word-level MinHash of the spec against each hit
+    spec_sig = minhash.signature(minhash.shingles(
+        " ".join([req.spec.novelty, req.spec.mechanism, *req.spec.differentiators]), k=1,
+    ))
+    for h in scored:
+        sim = minhash.estimate_jaccard(
+            spec_sig, minhash.signature(minhash.shingles(f"{h.get('title', '')} {h.get('abstract', '')}", k=1)),
+        )
+        h["score"] = round((1 - _QUICK_SIMILARITY_WEIGHT) * h["score"] + _QUICK_SIMILARITY_WEIGHT * sim, 3)
+    scored.sort(key=lambda h: h["score"], reverse=True)
+    scored = scored[: req.limit]
+
+    confidence = _compute_confidence(scored)
+    recommended, reason = _full_analysis_advice(scored, confidence, partial)
+    return QuickScanResponse(
+        hits=_build_enhanced_hits(scored, {}),
+        confidence=confidence,
+        full_analysis_recommended=recommended,
+        recommendation_reason=reason,
+        partial=partial,
+        elapsed_ms=_elapsed_ms(started),
     )
 
 
+def _full_analysis_advice(scored: list[dict], confidence: str, partial: bool) -> tuple[bool, str]:
+    if partial:
+        return True, "Some searches did not finish within the quick-scan budget."
+    if not scored:
+        return True, "No related patents in the spec-driven searches; the full analysis also searches LLM strategies and CPC classes."
+    if confidence == "high":
+        return True, "Closely related patents found; the full analysis assesses novelty and obviousness against them."
+    if confidence == "med":
+        return True, "Moderately related patents found; the full analysis can tell whether they anticipate the key differentiators."
+    return False, "Only loosely related patents found; the space looks open on a keyword basis."
+
+
 # ── Step 1: Invention Analysis ───────────────────────────────────────
 
 async def _step1_invention_analysis(req: PatentAnalysisRequest) -> dict:
@@ -143,120 +415,303 @@ def _fallback_invention_analysis(req: PatentAnalysisRequest) -> dict:
         {"query": q, "approach": "use_case", "target_field": "abstract"}
         for q in req.spec.search_queries[:6]
     ])
+    # Keyword → CPC title matching against the local scheme stands in for the LLM's codes
+    cpc_codes = cpc_scheme.get_scheme().suggest(
+        req.variant.keywords + req.spec.keywords + [req.product_text], limit=4,
+    )
     return {
         "core_concept": req.spec.novelty,
         "essential_elements": req.spec.differentiators,
         "alternative_implementations": [],
-        "cpc_codes": [],
+        "cpc_codes": cpc_codes,
         "search_strategies": strategies,
+        "fallback": True,
     }
 
 
+def _emit(progress: ProgressCallback | None, event: str, **detail) -> None:
+    if progress is None:
+        return
+    try:
+        progress(event, detail)
+    except Exception:
+        log.exception("Progress callback failed for %s", event)
+
+
+async def _timed_step1(
+    req: PatentAnalysisRequest,
+    progress: ProgressCallback | None,
+    ckpt: Checkpointer,
+    budget: Deadline,
+    misses: list[str],
+) -> tuple[dict, int]:
+    started = time.perf_counter()
+    invention = ckpt.get("invention")
+    cached = invention_cache.lookup(req, ckpt.user_id) if invention is None else None
+    if cached is not None:
+        invention, similarity = dict(cached[0]), cached[1]
+        log.info("Step 1: Reusing invention analysis of a similar spec (similarity %.2f)", similarity)
+        invention_cache.maybe_audit(invention, lambda: _step1_invention_analysis(req))
+        await ckpt.save("invention", invention)
+    elif invention is None:
+        timeout = budget.sub(seconds=settings.analysis_step1_timeout_seconds).remaining()
+        try:
+            invention = await asyncio.wait_for(_step1_invention_analysis(req), timeout=timeout)
+        except asyncio.TimeoutError:
+            log.warning("Invention analysis missed its %.1fs deadline. Using fallback.", timeout)
+            misses.append("invention_analysis")
+            invention = _fallback_invention_analysis(req)
+        invention_cache.add(req, invention, ckpt.user_id)
+        if not invention.get("fallback"):
+            await ckpt.save("invention", invention)
+    _emit(progress, "invention_analysis", strategies=len(invention.get("search_strategies", [])))
+    return invention, _elapsed_ms(started)
+
+
 # ── Step 2: Multi-phase search ───────────────────────────────────────
 
-async def _step2_multi_phase_search(
-    req: PatentAnalysisRequest, invention: dict
-) -> tuple[list[dict], dict]:
-    """Run broad keyword + focused keyword + CPC searches in parallel."""
-    metadata = {
-        "total_queries": 0,
-        "keyword_hits": 0,
-        "cpc_hits": 0,
-        "phases": [],
-    }
-    all_hits: list[dict] = []
+_GENERIC_TERMS = {
+    "system", "method", "device", "apparatus", "process", "tool",
+    "machine", "unit", "module", "assembly", "platform", "product",
+    "application", "interface", "mechanism", "component", "element",
+}
 
-    # Phase A: Baseline product search (MOST IMPORTANT — finds existing products)
-    # Search for the base product category using simple consumer terms
-    strategies = invention.get("search_strategies", [])
-    keyword_tasks = []
+
+def _independent_search_phases(
+    req: PatentAnalysisRequest, memo: SearchMemo | None = None, plan: SearchPlan | None = None
+) -> dict[str, list[Coroutine]]:
+    """Searches that depend only on the request — safe to run during Step 1."""
+    plan = plan or SearchPlan()
+    phases: dict[str, list[Coroutine]] = {}
 
     # A1: Direct product text search — the most obvious thing to search
     product_text = req.product_text.strip()
     if product_text and len(product_text) > 2:
-        keyword_tasks.append(search_keyword_broad_async(product_text, limit=30))
-        # Also search title specifically for the product category
-        keyword_tasks.append(search_keyword_async(product_text, "title", limit=30))
+        queries = [
+            (search_keyword_broad_async, (product_text,)),
+            # Also search title specifically for the product category
+            (search_keyword_async, (product_text, "title")),
+        ]
+        phases["product_text"] = [
+            _query(memo, "product_text", fn, *args, limit=30)
+            for fn, args in plan.take("product_text", queries)
+        ]
+
+    # Phase C: Focused keyword searches (precision, _text_all)
+    # Uses spec search queries — require all words to appear
+    spec_queries = [q for q in req.spec.search_queries[:4] if q]
+    if spec_queries:
+        phases["spec_queries"] = [
+            _query(memo, "spec_queries", search_keyword_focused_async, q, limit=25)
+            for q in plan.take("spec_queries", spec_queries)
+        ]
+
+    # Phase D: Broad keyword sweep using specific terms
+    specific_kw = [
+        kw for kw in dict.fromkeys(req.variant.keywords + req.spec.keywords)
+        if kw.lower() not in _GENERIC_TERMS and len(kw) > 3
+    ][:6]
+    if specific_kw:
+        phases["spec_keywords"] = [
+            _query(memo, "spec_keywords", search_keyword_broad_async, " ".join(kws), limit=25)
+            for kws in plan.take("spec_keywords", [specific_kw])
+        ]
+
+    return {name: coros for name, coros in phases.items() if coros}
 
-    # A2: Baseline product queries from LLM strategies
+
+def _strategy_search_phases(
+    invention: dict, memo: SearchMemo | None = None, plan: SearchPlan | None = None
+) -> dict[str, list[Coroutine]]:
+    """Searches driven by the Step 1 output (LLM strategies + CPC codes)."""
+    plan = plan or SearchPlan()
+    phases: dict[str, list[Coroutine]] = {}
+    strategies = invention.get("search_strategies", [])
+
+    # A2: Baseline product queries from LLM strategies (finds existing products)
     baseline_queries = [
         s.get("query", "") for s in strategies
         if s.get("approach") == "baseline_product" and s.get("query", "")
     ]
-    for q in baseline_queries[:4]:
-        keyword_tasks.append(search_keyword_async(q, "title", limit=25))
+    if baseline_queries:
+        phases["baseline_strategies"] = [
+            _query(memo, "baseline_strategies", search_keyword_async, q, "title", limit=25)
+            for q in plan.take("baseline_strategies", baseline_queries[:4])
+        ]
 
-    # Phase B: Novelty-focused searches (LLM strategies)
+    # Phase B: Novelty-focused searches (LLM strategies), budgeted per approach
     non_baseline = [
         s for s in strategies
-        if s.get("approach") != "baseline_product"
+        if s.get("approach") != "baseline_product" and s.get("query", "")
+    ][:8]
+    by_approach: dict[str, list[dict]] = {}
+    for s in non_baseline:
+        by_approach.setdefault(f"novelty:{s.get('approach') or 'other'}", []).append(s)
+    phases["novelty_strategies"] = [
+        _query(memo, source, search_keyword_async, s["query"], s.get("target_field", "abstract"), limit=25)
+        for source, group in by_approach.items()
+        for s in plan.take(source, group)
     ]
-    for s in non_baseline[:8]:
-        query = s.get("query", "")
-        target = s.get("target_field", "abstract")
-        if query:
-            keyword_tasks.append(search_keyword_async(query, target, limit=25))
 
-    # Phase C: Focused keyword searches (precision, _text_all)
-    # Uses spec search queries — require all words to appear
-    spec_queries = req.spec.search_queries
-    for q in spec_queries[:4]:
-        if q:
-            keyword_tasks.append(search_keyword_focused_async(q, limit=25))
+    # CPC classification searches (up to 5 codes) — validated against the local
+    # scheme so malformed or nonexistent codes don't cost a query
+    codes = cpc_scheme.prepare_search_codes(invention.get("cpc_codes", []), limit=5)
+    phases["cpc"] = [
+        _query(memo, "cpc", search_cpc_async, code, limit=25) for code in plan.take("cpc", codes)
+    ]
 
-    # Phase D: Broad keyword sweep using specific terms
-    _generic = {"system", "method", "device", "apparatus", "process", "tool",
-                "machine", "unit", "module", "assembly", "platform", "product",
-                "application", "interface", "mechanism", "component", "element"}
-    specific_kw = [
-        kw for kw in dict.fromkeys(req.variant.keywords + req.spec.keywords)
-        if kw.lower() not in _generic and len(kw) > 3
-    ][:6]
-    if specific_kw:
-        broad_query = " ".join(specific_kw)
-        keyword_tasks.append(search_keyword_broad_async(broad_query, limit=25))
+    return {name: coros for name, coros in phases.items() if coros}
+
+
+def _query(memo: SearchMemo | None, source: str, fn: Callable[..., Coroutine], *args, **kwargs) -> Coroutine:
+    """One search, with its hits tagged by source for yield stats."""
+    async def run() -> list[dict]:
+        hits = await _search(memo, fn, *args, **kwargs)
+        for h in hits:
+            h["search_source"] = source
+        return hits
+    return run()
+
+
+async def _run_phase(
+    name: str,
+    coros: list[Coroutine],
+    progress: ProgressCallback | None = None,
+    deadline: Deadline | None = None,
+) -> tuple[str, list, int, int]:
+    """Run one phase's queries concurrently until ``deadline``.
+
+    Returns (name, results, elapsed_ms, timed_out): results of the queries
+    that finished in time, and how many were cancelled at the deadline.
+    """
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=deadline.remaining() if deadline else None)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+    for t in pending:
+        t.cancel()
+    results = [t.exception() or t.result() for t in tasks if t in done]
+    elapsed = _elapsed_ms(started)
+    _emit(progress, "search_phase", phase=name, queries=len(done), timed_out=len(pending), elapsed_ms=elapsed)
+    return name, results, elapsed, len(pending)
+
+
+def _start_phases(
+    phases: dict[str, list[Coroutine]],
+    progress: ProgressCallback | None = None,
+    deadline: Deadline | None = None,
+) -> list[asyncio.Task]:
+    return [
+        asyncio.create_task(_run_phase(name, coros, progress, deadline))
+        for name, coros in phases.items()
+    ]
 
-    if keyword_tasks:
-        metadata["total_queries"] += len(keyword_tasks)
-        keyword_results = await asyncio.gather(*keyword_tasks, return_exceptions=True)
-        for result in keyword_results:
-            if isinstance(result, list):
-                all_hits.extend(result)
-                metadata["keyword_hits"] += len(result)
-            elif isinstance(result, Exception):
-                log.warning("Keyword search failed: %s", result)
-        metadata["phases"].append("keyword")
 
-    # Phase C: CPC classification searches (up to 5 codes)
-    cpc_codes = invention.get("cpc_codes", [])
-    cpc_tasks = []
-    for cpc in cpc_codes[:5]:
-        code = cpc.get("code", "") if isinstance(cpc, dict) else str(cpc)
-        if code:
-            cpc_tasks.append(search_cpc_async(code, limit=25))
-
-    if cpc_tasks:
-        metadata["total_queries"] += len(cpc_tasks)
-        cpc_results = await asyncio.gather(*cpc_tasks, return_exceptions=True)
-        for result in cpc_results:
+async def _step2_multi_phase_search(
+    req: PatentAnalysisRequest,
+    step1: asyncio.Task,
+    progress: ProgressCallback | None = None,
+    deadline: Deadline | None = None,
+    misses: list[str] | None = None,
+    memo: SearchMemo | None = None,
+) -> tuple[list[dict], dict]:
+    """Run keyword + CPC searches, overlapping the request-only ones with Step 1.
+
+    ``step1`` is the running invention-analysis task; the strategy and CPC
+    phases are launched the moment it completes.  Queries still running at
+    ``deadline`` are cancelled and their phase is added to ``misses``.
+    """
+    misses = misses if misses is not None else []
+    metadata = {
+        "total_queries": 0,
+        "keyword_hits": 0,
+        "cpc_hits": 0,
+        "phases": [],
+        "timings": {},
+        "deadline_misses": misses,
+    }
+    all_hits: list[dict] = []
+    started = time.perf_counter()
+
+    plan = SearchPlan(prune=search_yield.under_load())
+    independent = _independent_search_phases(req, memo, plan)
+    tasks = _start_phases(independent, progress, deadline)
+    try:
+        invention, _ = await step1
+        dependent = _strategy_search_phases(invention, memo, plan)
+        tasks += _start_phases(dependent, progress, deadline)
+        phase_results = await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+
+    for name, results, elapsed_ms, timed_out in phase_results:
+        metadata["timings"][name] = elapsed_ms
+        metadata["total_queries"] += len(results)
+        if timed_out:
+            log.warning("Search phase %s: %d queries cancelled at deadline", name, timed_out)
+            misses.append(f"search:{name}")
+        is_cpc = name == "cpc"
+        for result in results:
             if isinstance(result, list):
                 all_hits.extend(result)
-                metadata["cpc_hits"] += len(result)
+                metadata["cpc_hits" if is_cpc else "keyword_hits"] += len(result)
             elif isinstance(result, Exception):
-                log.warning("CPC search failed: %s", result)
+                log.warning("%s search failed: %s", "CPC" if is_cpc else "Keyword", result)
+
+    phase_names = set(metadata["timings"])
+    if phase_names - {"cpc"}:
+        metadata["phases"].append("keyword")
+    if "cpc" in phase_names:
         metadata["phases"].append("cpc")
+    metadata["timings"]["search_total"] = _elapsed_ms(started)
+    metadata["source_queries"] = dict(plan.queries)
+    metadata["queries_pruned"] = sum(plan.pruned.values())
 
     log.info("Search complete: %d total hits from %d queries", len(all_hits), metadata["total_queries"])
     return all_hits, metadata
 
 
+def _elapsed_ms(started: float) -> int:
+    return int((time.perf_counter() - started) * 1000)
+
+
 # ── Step 4: Professional Analysis ────────────────────────────────────
 
 async def _step4_professional_analysis(
-    req: PatentAnalysisRequest, invention: dict, scored_hits: list[dict]
+    req: PatentAnalysisRequest,
+    invention: dict,
+    scored_hits: list[dict],
+    deadline: Deadline | None = None,
 ) -> dict:
-    """Ask the LLM to produce a professional analysis of the results."""
+    """Ask the LLM to produce a professional analysis of the results.
+
+    With less than the Step 4 reserve left on ``deadline`` the candidate set
+    is cut proportionally; below the minimum (or on timeout) the heuristic
+    fallback is returned instead.  Misses are listed in ``deadline_misses``.
+    """
+    timeout = deadline.remaining() if deadline else None
+    if timeout is not None and timeout < settings.analysis_step4_min_seconds:
+        log.warning("Only %.1fs left for professional analysis. Using fallback.", timeout)
+        return {**_fallback_professional_analysis(scored_hits), "deadline_misses": ["professional_analysis"]}
+
+    misses: list[str] = []
+    candidates = scored_hits
+    reserve = settings.analysis_step4_reserve_seconds
+    if timeout is not None and timeout < reserve:
+        keep = max(MIN_PATENTS, int(len(scored_hits) * timeout / reserve))
+        if keep < len(scored_hits):
+            log.info("Professional analysis: %.1fs left, analysing top %d of %d", timeout, keep, len(scored_hits))
+            candidates = scored_hits[:keep]
+            misses.append("professional_analysis:reduced")
+
     essential = invention.get("essential_elements", req.spec.differentiators)
+    packed, packing = pack_patents(candidates, patent_budget_for_model())
     prompt = build_professional_analysis_prompt(
         product_text=req.product_text,
         variant_title=req.variant.title,
@@ -266,17 +721,28 @@ async def _step4_professional_analysis(
         spec_baseline=req.spec.baseline,
         spec_differentiators=req.spec.differentiators,
         essential_elements=essential,
-        patents=scored_hits,
+        patents=packed,
     )
     try:
-        return await call_llm_async(
-            prompt,
-            json_schema_hint=PROFESSIONAL_ANALYSIS_SCHEMA,
-            system=PROFESSIONAL_ANALYSIS_SYSTEM,
+        analysis = await asyncio.wait_for(
+            call_llm_async(
+                prompt,
+                json_schema_hint=PROFESSIONAL_ANALYSIS_SCHEMA,
+                system=PROFESSIONAL_ANALYSIS_SYSTEM,
+            ),
+            timeout=timeout,
         )
     except LLMError as exc:
         log.warning("Professional analysis LLM call failed: %s. Using fallback.", exc)
-        return _fallback_professional_analysis(scored_hits)
+        analysis = _fallback_professional_analysis(scored_hits)
+    except asyncio.TimeoutError:
+        log.warning("Professional analysis missed its %.1fs deadline. Using fallback.", timeout)
+        analysis = _fallback_professional_analysis(scored_hits)
+        misses = ["professional_analysis"]
+    analysis["prompt_packing"] = packing.as_dict()
+    if misses:
+        analysis["deadline_misses"] = misses
+    return analysis
 
 
 def _fallback_professional_analysis(scored_hits: list[dict]) -> dict:
@@ -292,6 +758,7 @@ def _fallback_professional_analysis(scored_hits: list[dict]) -> dict:
         risk = "low"
 
     return {
+        "fallback": True,
         "novelty_assessment": {
             "risk_level": risk,
             "summary": "Automated heuristic assessment based on keyword overlap scores.",
@@ -345,9 +812,12 @@ def _parse_invention_analysis(data: dict) -> InventionAnalysis:
     cpc_codes = []
     for c in cpc_raw:
         if isinstance(c, dict):
+            code = cpc_scheme.normalize(c.get("code", ""))
+            if code is None:
+                continue
             cpc_codes.append(CpcSuggestion(
-                code=c.get("code", ""),
-                description=c.get("description", ""),
+                code=code,
+                description=c.get("description") or cpc_scheme.get_scheme().title(code),
                 rationale=c.get("rationale", ""),
             ))
 
@@ -391,6 +861,8 @@ def _build_enhanced_hits(scored: list[dict], analysis: dict) -> list[EnhancedPat
             score=round(float(llm.get("score", h.get("score", 0)) or 0), 3),
             why_similar=llm.get("why_similar") or h.get("why_similar") or "",
             source_phase=h.get("source_phase") or "keyword",
+            related_count=h.get("related_count", 0),
+            related_ids=h.get("related_ids") or [],
         ))
 
     hits.sort(key=lambda x: x.score, reverse=True)
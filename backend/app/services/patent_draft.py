@@ -0,0 +1,487 @@
+"""Provisional patent drafts generated section by section.
+
+One short LLM call produces an outline — formal title, the key elements with
+reference numerals, embodiments and figures.  The background, summary,
+detailed description, claims, abstract and drawings sections are then written
+concurrently from that outline, each with its own small output budget, so
+draft latency is the slowest section rather than the whole document.
+
+A section that fails or comes back incomplete is retried on its own.  If it
+still fails, the template text for that section is used and the section is
+listed in ``incomplete_sections`` — the rest of the draft is kept.
+"""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Callable, Iterator
+
+from app.core import metrics
+from app.core.config import settings
+from app.schemas.build_this import (
+    Background,
+    CoverSheet,
+    ProvisionalPatentRequest,
+    ProvisionalPatentResponse,
+    Specification,
+)
+from app.services.llm import LLMError, call_llm_async
+from app.services.prompts import (
+    PATENT_OUTLINE_SCHEMA,
+    PATENT_SECTION_SCHEMAS,
+    PROVISIONAL_PATENT_SYSTEM,
+    build_patent_outline_prompt,
+    build_patent_section_prompt,
+)
+
+log = logging.getLogger("mousetrap.patent_draft")
+
+SECTIONS = ("background", "summary", "detailed_description", "claims", "abstract", "drawings")
+
+_OUTLINE_MAX_TOKENS = 2000
+_SECTION_MAX_TOKENS = {
+    "background": 3000,
+    "summary": 2500,
+    "detailed_description": 8000,
+    "claims": 4000,
+    "abstract": 1000,
+    "drawings": 2000,
+}
+
+PENDING_TEXT = "*Drafting…*"
+
+FILING_DATE_NOTE = (
+    "Filing establishes a priority date. You have 12 months to file a non-provisional application."
+)
+
+
+def _prompt_context(req: ProvisionalPatentRequest) -> dict:
+    return {
+        "product_text": req.product_text,
+        "variant_title": req.variant.title,
+        "variant_summary": req.variant.summary,
+        "spec_novelty": req.spec.novelty,
+        "spec_mechanism": req.spec.mechanism,
+        "spec_baseline": req.spec.baseline,
+        "spec_differentiators": req.spec.differentiators,
+        "patent_hits": [h.model_dump() for h in req.hits] if req.hits else [],
+    }
+
+
+# ── Markdown assembly ────────────────────────────────────────────────
+
+def _format_patent_markdown(data: dict) -> str:
+    cover = data.get("cover_sheet", {})
+    spec = data.get("specification", {})
+    bg = spec.get("background", {})
+    claims = data.get("claims", {})
+
+    lines = [
+        f"# {cover.get('invention_title', 'Untitled Invention')}",
+        "",
+        f"*{cover.get('filing_date_note', '')}*",
+        "",
+        "---",
+        "",
+        "## SPECIFICATION",
+        "",
+        f"### Title of Invention",
+        "",
+        spec.get("title_of_invention", ""),
+        "",
+    ]
+
+    cross_ref = spec.get("cross_reference")
+    if cross_ref:
+        lines += [
+            "### Cross-Reference to Related Applications",
+            "",
+            cross_ref,
+            "",
+        ]
+
+    lines += [
+        "### Background of the Invention",
+        "",
+        "#### Field of the Invention",
+        "",
+        bg.get("field_of_invention", ""),
+        "",
+        "#### Description of the Prior Art",
+        "",
+        bg.get("description_of_prior_art", ""),
+        "",
+        "### Summary of the Invention",
+        "",
+        spec.get("summary", ""),
+        "",
+    ]
+
+    drawings_desc = spec.get("brief_description_of_drawings")
+    if drawings_desc:
+        lines += [
+            "### Brief Description of the Drawings",
+            "",
+            drawings_desc,
+            "",
+        ]
+
+    lines += [
+        "### Detailed Description of Preferred Embodiments",
+        "",
+        spec.get("detailed_description", ""),
+        "",
+        "---",
+        "",
+        "## ABSTRACT",
+        "",
+        data.get("abstract", ""),
+        "",
+        "---",
+        "",
+        "## CLAIMS",
+        "",
+    ]
+
+    for i, c in enumerate(claims.get("independent", []), 1):
+        lines.append(f"**{i}.** {c}")
+        lines.append("")
+    dep_start = len(claims.get("independent", [])) + 1
+    for i, c in enumerate(claims.get("dependent", []), dep_start):
+        lines.append(f"**{i}.** {c}")
+        lines.append("")
+
+    lines += [
+        "---",
+        "",
+        "## DRAWINGS RECOMMENDATION",
+        "",
+        data.get("drawings_note", ""),
+        "",
+        "---",
+        "",
+        "*Disclaimer: This is an AI-generated draft for informational purposes only. "
+        "It does not constitute legal advice. Have a registered patent attorney or agent "
+        "review this document before filing with the USPTO.*",
+    ]
+    return "\n".join(lines)
+
+
+def assemble_draft(
+    outline: dict,
+    sections: dict[str, dict],
+    incomplete: list[str] | None = None,
+) -> ProvisionalPatentResponse:
+    """Combine the outline and per-section content into the response model."""
+    title = outline.get("invention_title") or "Untitled Invention"
+    bg = sections.get("background", {})
+    drawings = sections.get("drawings", {})
+    data = {
+        "cover_sheet": {"invention_title": title, "filing_date_note": FILING_DATE_NOTE},
+        "specification": {
+            "title_of_invention": title,
+            "cross_reference": None,
+            "background": {
+                "field_of_invention": bg.get("field_of_invention", ""),
+                "description_of_prior_art": bg.get("description_of_prior_art", ""),
+            },
+            "summary": sections.get("summary", {}).get("summary", ""),
+            "brief_description_of_drawings": drawings.get("brief_description_of_drawings") or None,
+            "detailed_description": sections.get("detailed_description", {}).get("detailed_description", ""),
+        },
+        "abstract": sections.get("abstract", {}).get("abstract", ""),
+        "claims": sections.get("claims") or {"independent": [], "dependent": []},
+        "drawings_note": drawings.get("drawings_note", ""),
+    }
+    spec_data = data["specification"]
+
+    return ProvisionalPatentResponse(
+        cover_sheet=CoverSheet(**data["cover_sheet"]),
+        specification=Specification(
+            title_of_invention=spec_data["title_of_invention"],
+            cross_reference=spec_data["cross_reference"],
+            background=Background(**spec_data["background"]),
+            summary=spec_data["summary"],
+            brief_description_of_drawings=spec_data["brief_description_of_drawings"],
+            detailed_description=spec_data["detailed_description"],
+        ),
+        abstract=data["abstract"],
+        claims=data["claims"],
+        drawings_note=data["drawings_note"],
+        markdown=_format_patent_markdown(data),
+        incomplete_sections=list(incomplete or []),
+    )
+
+
+def render_partial_markdown(outline: dict, sections: dict[str, dict]) -> str:
+    """Markdown for a draft still being written; unfinished sections show a placeholder."""
+    placeholder = {
+        "background": {"field_of_invention": PENDING_TEXT, "description_of_prior_art": PENDING_TEXT},
+        "summary": {"summary": PENDING_TEXT},
+        "detailed_description": {"detailed_description": PENDING_TEXT},
+        "claims": {"independent": [], "dependent": []},
+        "abstract": {"abstract": PENDING_TEXT},
+        "drawings": {"drawings_note": PENDING_TEXT},
+    }
+    return assemble_draft(outline, {**placeholder, **sections}).markdown
+
+
+# ── Validation ───────────────────────────────────────────────────────
+
+_REQUIRED_FIELDS = {
+    "background": ("field_of_invention", "description_of_prior_art"),
+    "summary": ("summary",),
+    "detailed_description": ("detailed_description",),
+    "abstract": ("abstract",),
+    "drawings": ("drawings_note",),
+}
+
+
+def _clean_section(name: str, data: dict) -> dict | None:
+    """Return the section's content, or None if a required part is missing."""
+    if name == "claims":
+        claims = data.get("claims", data) if isinstance(data, dict) else data
+        if isinstance(claims, list):
+            claims = {"independent": claims, "dependent": []}
+        if not isinstance(claims, dict):
+            return None
+        independent = [str(c) for c in claims.get("independent") or [] if c]
+        if not independent:
+            return None
+        return {"independent": independent, "dependent": [str(c) for c in claims.get("dependent") or [] if c]}
+
+    if not isinstance(data, dict):
+        return None
+    out = {}
+    for key in _REQUIRED_FIELDS[name]:
+        value = data.get(key)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        out[key] = value.strip()
+    if name == "drawings" and isinstance(data.get("brief_description_of_drawings"), str):
+        out["brief_description_of_drawings"] = data["brief_description_of_drawings"].strip()
+    return out
+
+
+def _clean_outline(data: dict) -> dict | None:
+    title = data.get("invention_title")
+    if not isinstance(title, str) or not title.strip():
+        return None
+    outline = {"invention_title": title.strip()}
+    for key in ("technical_field", "problem", "solution"):
+        outline[key] = str(data.get(key) or "")
+    for key in ("key_elements", "embodiments", "figures"):
+        value = data.get(key) or []
+        outline[key] = [str(v) for v in value] if isinstance(value, list) else [str(value)]
+    return outline
+
+
+# ── Template fallback ────────────────────────────────────────────────
+
+def _mock_outline(req: ProvisionalPatentRequest) -> dict:
+    return {
+        "invention_title": f"Improved {req.variant.title}",
+        "technical_field": req.product_text,
+        "problem": req.spec.baseline,
+        "solution": req.spec.mechanism,
+        "key_elements": [],
+        "embodiments": [],
+        "figures": [],
+    }
+
+
+def _mock_sections(req: ProvisionalPatentRequest) -> dict[str, dict]:
+    return {
+        "background": {
+            "field_of_invention": (
+                f"This invention relates generally to improvements in {req.product_text}, "
+                f"and more particularly to {req.variant.title.lower()}."
+            ),
+            "description_of_prior_art": (
+                f"Existing solutions in the {req.product_text} space suffer from several limitations. "
+                f"{req.spec.baseline} "
+                f"There remains a need for an approach that addresses these shortcomings."
+            ),
+        },
+        "summary": {
+            "summary": (
+                f"{req.variant.summary} "
+                f"The present invention provides {req.spec.novelty}"
+            ),
+        },
+        "detailed_description": {
+            "detailed_description": (
+                f"In accordance with the present invention, {req.spec.mechanism}\n\n"
+                f"The invention differentiates from prior art in the following ways: "
+                f"{', '.join(req.spec.differentiators) if req.spec.differentiators else 'novel mechanism and approach'}.\n\n"
+                f"In one preferred embodiment, the system implements the core mechanism described above "
+                f"to achieve measurable improvements over existing solutions."
+            ),
+        },
+        "abstract": {
+            "abstract": (
+                f"An improved {req.product_text} comprising {req.spec.mechanism} "
+                f"The invention addresses limitations in existing products by providing "
+                f"{req.spec.novelty}"
+            ),
+        },
+        "claims": {
+            "independent": [
+                f"A method for improving {req.product_text} comprising: {req.spec.mechanism}",
+                f"An apparatus for {req.variant.title.lower()} comprising the elements described herein.",
+            ],
+            "dependent": [
+                "The method of claim 1, wherein the improvement further comprises enhanced durability.",
+                "The method of claim 1, wherein the cost is reduced by at least 20%.",
+                "The apparatus of claim 2, further comprising a modular design.",
+            ],
+        },
+        "drawings": {
+            "drawings_note": (
+                "It is recommended to include the following drawings:\n"
+                "- Figure 1: System overview diagram showing key components\n"
+                "- Figure 2: Flowchart of the core method steps\n"
+                "- Figure 3: Detailed view of the primary mechanism"
+            ),
+        },
+    }
+
+
+def mock_patent_draft(req: ProvisionalPatentRequest) -> ProvisionalPatentResponse:
+    return assemble_draft(_mock_outline(req), _mock_sections(req))
+
+
+def mock_section(name: str, req: ProvisionalPatentRequest) -> dict:
+    return _mock_sections(req)[name]
+
+
+# ── Generation ───────────────────────────────────────────────────────
+
+async def generate_outline(req: ProvisionalPatentRequest) -> dict:
+    """Shared outline for all sections. Raises LLMError once attempts are exhausted."""
+    prompt = build_patent_outline_prompt(**_prompt_context(req))
+    attempts = max(settings.patent_draft_section_attempts, 1)
+    last_error: Exception | None = None
+    for attempt in range(1, attempts + 1):
+        try:
+            data = await call_llm_async(
+                prompt,
+                json_schema_hint=PATENT_OUTLINE_SCHEMA,
+                system=PROVISIONAL_PATENT_SYSTEM,
+                max_tokens=_OUTLINE_MAX_TOKENS,
+            )
+        except LLMError as exc:
+            last_error = exc
+        else:
+            outline = _clean_outline(data) if isinstance(data, dict) else None
+            if outline is not None:
+                return outline
+            last_error = LLMError("Outline is missing the invention title")
+        log.warning("Patent outline attempt %d/%d failed: %s", attempt, attempts, last_error)
+    raise LLMError(f"Could not generate patent outline: {last_error}")
+
+
+async def generate_section(
+    name: str,
+    req: ProvisionalPatentRequest,
+    outline: dict,
+    context_sections: dict[str, dict] | None = None,
+    instructions: str | None = None,
+) -> dict | None:
+    """Write one section from the outline, retrying only this section.
+
+    Returns None when every attempt failed or came back incomplete.
+    """
+    prompt = build_patent_section_prompt(
+        name, outline, context_sections, instructions, **_prompt_context(req),
+    )
+    attempts = max(settings.patent_draft_section_attempts, 1)
+    for attempt in range(1, attempts + 1):
+        if attempt > 1:
+            metrics.inc("patent_draft.section_retries")
+        try:
+            data = await call_llm_async(
+                prompt,
+                json_schema_hint=PATENT_SECTION_SCHEMAS[name],
+                system=PROVISIONAL_PATENT_SYSTEM,
+                max_tokens=_SECTION_MAX_TOKENS[name],
+            )
+        except LLMError as exc:
+            log.warning("Patent section %s attempt %d/%d failed: %s", name, attempt, attempts, exc)
+            continue
+        content = _clean_section(name, data)
+        if content is not None:
+            return content
+        log.warning("Patent section %s attempt %d/%d came back incomplete", name, attempt, attempts)
+    return None
+
+
+async def iter_draft(req: ProvisionalPatentRequest) -> AsyncIterator[tuple[str, dict]]:
+    """Generate a draft, yielding ``(event, payload)`` as parts finish.
+
+    Events: ``outline`` once, ``section`` per section in completion order
+    (with the markdown rendered so far), then ``complete`` with the full
+    response.  Closing the iterator early cancels the unfinished sections.
+    """
+    outline = await generate_outline(req)
+    yield "outline", {"outline": outline}
+
+    sections: dict[str, dict] = {}
+    incomplete: list[str] = []
+    fallback = _mock_sections(req)
+    tasks = {asyncio.create_task(generate_section(name, req, outline)): name for name in SECTIONS}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: SECTIONS.index(tasks[t])):
+                name = tasks[task]
+                content = task.result()
+                if content is None:
+                    log.error("Patent section %s failed after retries — using template text", name)
+                    metrics.inc("patent_draft.section_fallbacks")
+                    incomplete.append(name)
+                    content = fallback[name]
+                sections[name] = content
+                yield "section", {
+                    "section": name,
+                    "content": content,
+                    "incomplete": name in incomplete,
+                    "markdown": render_partial_markdown(outline, sections),
+                }
+    finally:
+        for task in pending:
+            task.cancel()
+
+    yield "complete", assemble_draft(outline, sections, incomplete).model_dump()
+
+
+def iter_mock_draft(req: ProvisionalPatentRequest) -> Iterator[tuple[str, dict]]:
+    """The template draft as the same event sequence as ``iter_draft``."""
+    outline = _mock_outline(req)
+    yield "outline", {"outline": outline}
+    sections: dict[str, dict] = {}
+    for name, content in _mock_sections(req).items():
+        sections[name] = content
+        yield "section", {
+            "section": name,
+            "content": content,
+            "incomplete": False,
+            "markdown": render_partial_markdown(outline, sections),
+        }
+    yield "complete", assemble_draft(outline, sections).model_dump()
+
+
+async def draft_patent(
+    req: ProvisionalPatentRequest,
+    on_event: Callable[[str, dict], None] | None = None,
+) -> ProvisionalPatentResponse:
+    """Outline first, then every section concurrently, then assemble.
+
+    ``on_event`` sees the same events as ``iter_draft`` yields.
+    """
+    async for event, payload in iter_draft(req):
+        if on_event is not None:
+            on_event(event, payload)
+        if event == "complete":
+            return ProvisionalPatentResponse.model_validate(payload)
+    raise LLMError("Patent draft ended without a result")
@@ -0,0 +1,144 @@
+"""Persistent per-patent document store with precomputed digests.
+
+Every hit that makes it through dedup is stored in ``patent_documents`` once,
+with a short digest built from its abstract.  Later analyses — for any
+user — read the digest back, and the prompt packer uses it in place of the
+raw abstract for lower-ranked patents.  Patent metadata is public, so rows
+are stored unencrypted and shared.
+"""
+
+import asyncio
+import json
+import logging
+import re
+
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.database import async_session
+from app.models.patent_document import PatentDocument
+from app.services.prompt_packing import condense_abstract
+
+log = logging.getLogger("mousetrap.patent_store")
+
+DIGEST_MAX_CHARS = 240
+
+# Boilerplate openers that carry no information for similarity judgements
+_BOILERPLATE = re.compile(
+    r"^(the present (invention|disclosure)|this (invention|disclosure)|disclosed (herein )?(is|are)|"
+    r"embodiments (of the present disclosure )?(are|provide)|an? (system|method|apparatus|device)s?"
+    r"( and (method|apparatus|system|device)s?)? (is|are) (disclosed|provided|described))"
+    r"( relates? (generally )?to| provides?| includes?| comprises?)?[,:]?\s*",
+    re.IGNORECASE,
+)
+
+# Background upserts of newly seen patents (kept referenced until done)
+_writes: set[asyncio.Task] = set()
+
+
+def make_digest(title: str, abstract: str) -> str:
+    """Extractive digest: leading abstract sentences minus boilerplate, about DIGEST_MAX_CHARS."""
+    text = " ".join((abstract or "").split())
+    if not text:
+        return title or ""
+    text = _BOILERPLATE.sub("", text, count=1)
+    if text:
+        text = text[0].upper() + text[1:]
+    return condense_abstract(text, DIGEST_MAX_CHARS)
+
+
+async def _store(rows: list[dict]) -> None:
+    try:
+        async with async_session() as db:
+            await db.execute(insert(PatentDocument).values(rows).on_conflict_do_nothing(index_elements=["patent_id"]))
+            await db.commit()
+    except Exception:
+        log.exception("Could not store %d patents", len(rows))
+
+
+async def store_and_attach_digests(hits: list[dict]) -> list[dict]:
+    """Set ``hit["digest"]`` on every hit and store unseen patents. Best-effort.
+
+    Stored digests are read back; only patents not yet in the store get one
+    computed, and their rows are written in the background, off the request
+    path.  Existing rows are left untouched.
+    """
+    by_id = {h["patent_id"]: h for h in hits if h.get("patent_id")}
+    if not by_id:
+        return hits
+
+    try:
+        async with async_session() as db:
+            result = await db.execute(
+                select(PatentDocument.patent_id, PatentDocument.digest)
+                .where(PatentDocument.patent_id.in_(list(by_id)))
+            )
+            digests = dict(result.all())
+    except Exception:
+        log.exception("Patent store unavailable — using on-the-fly digests")
+        digests = None
+
+    rows = [
+        {
+            "patent_id": pid,
+            "title": h.get("title") or "",
+            "abstract": h.get("abstract") or "",
+            "assignee": h.get("assignee"),
+            "date": (h.get("date") or "")[:10] or None,
+            "cpc_codes": json.dumps(h.get("cpc_codes") or []),
+            "digest": make_digest(h.get("title") or "", h.get("abstract") or ""),
+        }
+        for pid, h in by_id.items()
+        if digests is None or pid not in digests
+    ]
+    if rows and digests is not None:
+        task = asyncio.create_task(_store(rows))
+        _writes.add(task)
+        task.add_done_callback(_writes.discard)
+    digests = {**(digests or {}), **{r["patent_id"]: r["digest"] for r in rows}}
+
+    for pid, h in by_id.items():
+        if digests.get(pid):
+            h["digest"] = digests[pid]
+    return hits
+
+
+def _as_hit(d: PatentDocument) -> dict:
+    return {
+        "patent_id": d.patent_id,
+        "title": d.title,
+        "abstract": d.abstract,
+        "assignee": d.assignee,
+        "date": d.date,
+        "cpc_codes": json.loads(d.cpc_codes) if d.cpc_codes else [],
+        "digest": d.digest,
+    }
+
+
+async def get_documents(patent_ids: list[str]) -> dict[str, dict]:
+    """Fetch stored patents by id in the normalized hit format."""
+    if not patent_ids:
+        return {}
+    async with async_session() as db:
+        result = await db.execute(select(PatentDocument).where(PatentDocument.patent_id.in_(patent_ids)))
+        docs = result.scalars().all()
+    return {d.patent_id: _as_hit(d) for d in docs}
+
+
+async def search_documents(terms: list[str], limit: int = 50) -> list[dict]:
+    """Stored patents whose title contains any of ``terms``, tagged source_phase "local".
+
+    Served by the trigram index on ``title``, which needs terms of 3+ characters.
+    """
+    terms = [t for t in terms if t and len(t) > 3][:8]
+    if not terms:
+        return []
+    async with async_session() as db:
+        result = await db.execute(
+            select(PatentDocument)
+            .where(or_(*(PatentDocument.title.icontains(t, autoescape=True) for t in terms)))
+            .order_by(PatentDocument.date.desc())
+            .limit(limit)
+        )
+        docs = result.scalars().all()
+    return [{**_as_hit(d), "source_phase": "local"} for d in docs]
@@ -2,10 +2,14 @@
 
 import asyncio
 import logging
+import time
+from collections import OrderedDict
 
 import httpx
 
+from app.core import metrics
 from app.core.config import settings
+from app.services import minhash
 
 log = logging.getLogger("mousetrap.patentsview")
 
@@ -25,6 +29,33 @@ def _get_async_client() -> httpx.AsyncClient:
     return _async_client
 
 
+# ── Result cache ────────────────────────────────────────────────────
+# Identical queries (same product text, shared CPC codes, repeat analyses)
+# are answered from memory for PATENTSVIEW_CACHE_TTL_SECONDS.  Per process.
+_result_cache: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+
+
+def _cache_get(key: str) -> list[dict] | None:
+    entry = _result_cache.get(key)
+    if entry is None:
+        return None
+    expires, patents = entry
+    if expires < time.monotonic():
+        del _result_cache[key]
+        return None
+    _result_cache.move_to_end(key)
+    return patents
+
+
+def _cache_put(key: str, patents: list[dict]) -> None:
+    if settings.patentsview_cache_ttl_seconds <= 0:
+        return
+    _result_cache[key] = (time.monotonic() + settings.patentsview_cache_ttl_seconds, patents)
+    _result_cache.move_to_end(key)
+    while len(_result_cache) > settings.patentsview_cache_max_entries:
+        _result_cache.popitem(last=False)
+
+
 async def close_async_client():
     """Close the shared client — call from FastAPI shutdown hook."""
     global _async_client
@@ -209,7 +240,10 @@ def build_cpc_query(cpc_code: str, limit: int = 25) -> dict:
     Searches both cpc_current.cpc_group (specific) and cpc_subclass (broad).
     """
     code = cpc_code.strip().rstrip("/")
-    # If it looks like a full group code (has /), search group; otherwise search subclass
+    # A whole main group ("A47J36") is a group prefix; the "/" keeps A47J36 from matching A47J360
+    if "/" not in code and len(code) > 4:
+        code += "/"
+    # If it looks like a group code (has /), search group; otherwise search subclass
     if "/" in code:
         return {
             "q": {"_begins": {"cpc_current.cpc_group": code}},
@@ -243,6 +277,13 @@ async def search_patents_async(payload: dict) -> list[dict]:
     if "s" in payload:
         params["s"] = _json_param(payload["s"])
 
+    cache_key = _json_param(params)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        metrics.inc("patentsview.cache_hits")
+        return cached
+    metrics.inc("patentsview.cache_misses")
+
     client = _get_async_client()
     resp = await client.get(
         url,
@@ -258,6 +299,7 @@ async def search_patents_async(payload: dict) -> list[dict]:
     data = resp.json()
     patents = data.get("patents", [])
     log.info("PatentsView returned %d patents (total_hits=%s)", len(patents), data.get("total_hits"))
+    _cache_put(cache_key, patents)
     return patents
 
 
@@ -340,11 +382,31 @@ async def search_cpc_async(cpc_code: str, limit: int = 20) -> list[dict]:
 
 # ── Deduplication ────────────────────────────────────────────────────
 
-def deduplicate_hits(all_hits: list[dict]) -> tuple[list[dict], int]:
+# Estimated Jaccard over title+abstract shingles above which two different
+# patent_ids are treated as the same disclosure (continuations, divisionals,
+# re-filings).  Family members typically share 0.9+ of their abstract text.
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Hits with fewer shingles than this (or no abstract) are never clustered:
+# there is too little text for a match to mean the same disclosure
+_MIN_SHINGLES = 3
+
+
+def _richness(hit: dict) -> tuple[int, int]:
+    return len(hit.get("cpc_codes") or []), len(hit.get("abstract") or "")
+
+
+def deduplicate_hits(
+    all_hits: list[dict],
+    near_threshold: float | None = NEAR_DUPLICATE_THRESHOLD,
+) -> tuple[list[dict], int]:
     """Deduplicate patent hits by patent_id, keeping richest version.
 
-    Prefers hits that have CPC codes and more metadata.
-    Returns (deduplicated_list, num_duplicates_removed).
+    Prefers hits that have CPC codes and more metadata.  Unless
+    ``near_threshold`` is None, near-identical disclosures under different
+    patent_ids are then collapsed to one representative carrying
+    ``related_count`` / ``related_ids`` for its siblings.
+    Returns (deduplicated_list, num_exact_duplicates_removed); collapsed
+    near-duplicates are counted by ``related_count``, not in the second value.
     """
     best: dict[str, dict] = {}
     for hit in all_hits:
@@ -360,4 +422,72 @@ def deduplicate_hits(all_hits: list[dict]) -> tuple[list[dict], int]:
             if new_cpcs > existing_cpcs:
                 best[pid] = hit
     unique = list(best.values())
-    return unique, len(all_hits) - len(unique)
+    exact_removed = len(all_hits) - len(unique)
+    if near_threshold is not None:
+        unique = collapse_near_duplicates(unique, near_threshold)
+    return unique, exact_removed
+
+
+def collapse_near_duplicates(hits: list[dict], threshold: float = NEAR_DUPLICATE_THRESHOLD) -> list[dict]:
+    """Cluster near-duplicate hits with MinHash/LSH and keep one per cluster.
+
+    Input order is preserved for representatives.  The representative is the
+    richest member (most CPC codes, then longest abstract).  Hits without an
+    abstract or with fewer than ``_MIN_SHINGLES`` shingles are left alone.
+    """
+    if len(hits) < 2:
+        return hits
+
+    sigs: list[tuple[int, ...] | None] = []
+    for h in hits:
+        shingle_set = minhash.shingles(f"{h.get('title') or ''} {h.get('abstract') or ''}")
+        if not (h.get("abstract") or "").strip() or len(shingle_set) < _MIN_SHINGLES:
+            sigs.append(None)
+        else:
+            sigs.append(minhash.signature(shingle_set))
+
+    parent = list(range(len(hits)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    buckets: dict[tuple, list[int]] = {}
+    for i, sig in enumerate(sigs):
+        if sig is None:
+            continue
+        for key in minhash.lsh_keys(sig):
+            buckets.setdefault(key, []).append(i)
+
+    checked: set[tuple[int, int]] = set()
+    for members in buckets.values():
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                i, j = members[x], members[y]
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if find(i) != find(j) and minhash.estimate_jaccard(sigs[i], sigs[j]) >= threshold:
+                    parent[find(j)] = find(i)
+
+    clusters: dict[int, list[int]] = {}
+    for i in range(len(hits)):
+        clusters.setdefault(find(i), []).append(i)
+
+    reps: list[tuple[int, dict]] = []
+    for members in clusters.values():
+        rep_idx = max(members, key=lambda i: _richness(hits[i]))
+        rep = hits[rep_idx]
+        if len(members) > 1:
+            siblings = [hits[i].get("patent_id", "") for i in members if i != rep_idx]
+            rep["related_ids"] = siblings
+            rep["related_count"] = len(siblings)
+        reps.append((min(members), rep))
+
+    reps.sort(key=lambda r: r[0])
+    collapsed = len(hits) - len(reps)
+    if collapsed:
+        log.info("Collapsed %d near-duplicate patents into %d clusters", collapsed, len(reps))
+    return [r for _, r in reps]
@@ -0,0 +1,166 @@
+"""Token-budgeted packing of patent blocks for the Step 4 and rerank prompts.
+
+Patents arrive sorted by relevance.  Higher-ranked patents keep more of their
+abstract; lower-ranked ones use the stored digest (see patent_store) when there
+is one, or are condensed to their leading sentences, then to title-only, and
+finally dropped from the bottom until the block fits the model's input budget.
+Token counts are a chars/4 estimate — close enough for budgeting without
+pulling in a tokenizer.
+"""
+
+import logging
+import re
+from dataclasses import asdict, dataclass
+
+from app.core.config import settings
+
+log = logging.getLogger("mousetrap.prompt_packing")
+
+CHARS_PER_TOKEN = 4
+
+# Budget (in estimated tokens) for the patent block, by model-name prefix.
+# Longest matching prefix wins; anything unknown gets the default.
+_MODEL_PATENT_BUDGETS = {
+    "claude": 9000,
+    "gpt-4o": 9000,
+    "gpt-4": 5000,
+    "gpt-3.5": 2500,
+}
+_DEFAULT_PATENT_BUDGET = 6000
+
+# (max rank exclusive, max abstract chars, max CPC codes) — rank tiers
+_TIERS = [
+    (5, 1200, 6),
+    (15, 400, 3),
+    (None, 180, 2),
+]
+
+# Fixed per-patent overhead: header line, field labels, newlines
+_BLOCK_OVERHEAD_TOKENS = 20
+
+# Never drop below this many patents, even if the budget is exceeded
+MIN_PATENTS = 5
+
+_SENTENCE_END = re.compile(r"(?<=[.;])\s+")
+
+
+@dataclass
+class PackingStats:
+    patents_in: int = 0
+    patents_out: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    condensed: int = 0
+    title_only: int = 0
+    dropped: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(self.tokens_before - self.tokens_after, 0)
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "tokens_saved": self.tokens_saved}
+
+
+def estimate_tokens(text: str | None) -> int:
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def patent_budget_for_model(model: str | None = None) -> int:
+    """Token budget for the patent block, honouring PROMPT_PATENT_TOKEN_BUDGET."""
+    if settings.prompt_patent_token_budget > 0:
+        return settings.prompt_patent_token_budget
+    model = (model or settings.llm_model).lower()
+    best = ""
+    for prefix in _MODEL_PATENT_BUDGETS:
+        if model.startswith(prefix) and len(prefix) > len(best):
+            best = prefix
+    return _MODEL_PATENT_BUDGETS.get(best, _DEFAULT_PATENT_BUDGET)
+
+
+def condense_abstract(abstract: str, max_chars: int) -> str:
+    """Keep whole leading sentences up to max_chars; hard-cut a single long sentence."""
+    abstract = " ".join((abstract or "").split())
+    if len(abstract) <= max_chars:
+        return abstract
+    out = ""
+    for sentence in _SENTENCE_END.split(abstract):
+        candidate = f"{out} {sentence}".strip()
+        if len(candidate) > max_chars:
+            break
+        out = candidate
+    if not out:
+        out = abstract[: max_chars - 1].rsplit(" ", 1)[0]
+    return out + " …"
+
+
+def _block_tokens(p: dict) -> int:
+    return _BLOCK_OVERHEAD_TOKENS + sum(
+        estimate_tokens(p.get(k) or "") for k in ("title", "abstract", "assignee", "date")
+    ) + estimate_tokens(", ".join(p.get("cpc_codes") or []))
+
+
+def _tier(rank: int) -> tuple[int, int]:
+    for limit, max_chars, max_cpcs in _TIERS:
+        if limit is None or rank < limit:
+            return max_chars, max_cpcs
+    return _TIERS[-1][1], _TIERS[-1][2]
+
+
+def pack_patents(patents: list[dict], budget_tokens: int) -> tuple[list[dict], PackingStats]:
+    """Return condensed copies of ``patents`` that fit ``budget_tokens``.
+
+    Input dicts are never mutated.  Order (rank) is preserved.  When the
+    patents already fit, they are returned as they are, full abstracts included.
+    """
+    stats = PackingStats(patents_in=len(patents))
+    stats.tokens_before = sum(_block_tokens(p) for p in patents)
+    if stats.tokens_before <= budget_tokens:
+        stats.patents_out = len(patents)
+        stats.tokens_after = stats.tokens_before
+        return list(patents), stats
+
+    packed: list[dict] = []
+    for rank, p in enumerate(patents):
+        max_chars, max_cpcs = _tier(rank)
+        q = dict(p)
+        abstract = q.get("abstract") or ""
+        source = abstract
+        if rank >= _TIERS[0][0] and q.get("digest"):
+            source = q["digest"]
+        short = condense_abstract(source, max_chars)
+        if short != abstract:
+            stats.condensed += 1
+        q["abstract"] = short
+        q.pop("digest", None)
+        q["cpc_codes"] = (q.get("cpc_codes") or [])[:max_cpcs]
+        packed.append(q)
+
+    total = sum(_block_tokens(q) for q in packed)
+
+    # Over budget: strip abstracts from the bottom up (keeping the top tier) ...
+    top_tier = _TIERS[0][0]
+    for q in reversed(packed[top_tier:]):
+        if total <= budget_tokens:
+            break
+        if q.get("abstract"):
+            total -= estimate_tokens(q["abstract"])
+            q["abstract"] = ""
+            stats.title_only += 1
+
+    # ... then drop the lowest-ranked patents entirely
+    while total > budget_tokens and len(packed) > MIN_PATENTS:
+        total -= _block_tokens(packed.pop())
+        stats.dropped += 1
+
+    stats.patents_out = len(packed)
+    stats.tokens_after = total
+    if stats.tokens_saved:
+        log.info(
+            "Packed %d→%d patents: ~%d→%d tokens (saved ~%d, budget %d)",
+            stats.patents_in, stats.patents_out, stats.tokens_before,
+            stats.tokens_after, stats.tokens_saved, budget_tokens,
+        )
+    return packed, stats
@@ -4,6 +4,8 @@ Tone: Inspired by Lori Greiner — warm, direct, consumer-focused,
 encouraging, and decisive. "Hero or a Zero" product evaluation style.
 """
 
+import json
+
 
 # ── Shared helpers ───────────────────────────────────────────────────
 
@@ -352,8 +354,9 @@ def build_rerank_prompt(
         patent_block += (
             f"\n--- Patent {p['patent_id']} ---\n"
             f"Title: {p['title']}\n"
-            f"Abstract: {p['abstract']}\n"
         )
+        if p.get("abstract"):
+            patent_block += f"Abstract: {p['abstract']}\n"
 
     return f"""Invention concept:
   Novelty: {spec_novelty}
@@ -390,32 +393,77 @@ PROVISIONAL_PATENT_SYSTEM = (
     + no_legal_advice_instructions()
 )
 
-PROVISIONAL_PATENT_SCHEMA = """{
-  "cover_sheet": {
-    "invention_title": "<formal descriptive title, not marketing language>",
-    "filing_date_note": "<note about 12-month pendency period>"
-  },
-  "specification": {
-    "title_of_invention": "<same as cover sheet title>",
-    "cross_reference": null,
-    "background": {
-      "field_of_invention": "<1-2 paragraphs describing the technical field>",
-      "description_of_prior_art": "<2-3 paragraphs on existing solutions and their limitations>"
-    },
-    "summary": "<2-3 paragraphs summarizing the invention and its advantages>",
-    "brief_description_of_drawings": "<optional: describe what figures would show>",
-    "detailed_description": "<4-6 paragraphs: preferred embodiment, operation, variations, advantages>"
-  },
-  "abstract": "<exactly 150 words - technical summary of the disclosure>",
-  "claims": {
-    "independent": ["<claim 1>", "<claim 2>"],
-    "dependent": ["<claim 3 referencing claim 1>", "<claim 4>", "..."]
-  },
-  "drawings_note": "<recommendation on whether drawings should be prepared and what they should depict>"
+PATENT_OUTLINE_SCHEMA = """{
+  "invention_title": "<formal descriptive title, not marketing language>",
+  "technical_field": "<one sentence naming the technical field>",
+  "problem": "<1-2 sentences: the limitation of existing solutions this invention solves>",
+  "solution": "<2-3 sentences: the gist of how the invention solves it>",
+  "key_elements": ["<named component or step with its reference numeral, e.g. 'housing 102'>", "..."],
+  "embodiments": ["<one-line description of the preferred embodiment>", "<alternative embodiment>", "..."],
+  "figures": ["FIG. 1 — <what it depicts>", "FIG. 2 — <what it depicts>", "..."]
 }"""
 
-
-def build_provisional_patent_prompt(
+# Per-section output shape. Sections are generated independently from the
+# shared outline, so each schema covers exactly one part of the draft.
+PATENT_SECTION_SCHEMAS = {
+    "background": """{
+  "field_of_invention": "<1-2 paragraphs describing the technical field>",
+  "description_of_prior_art": "<2-3 paragraphs on existing solutions and their limitations>"
+}""",
+    "summary": """{
+  "summary": "<2-3 paragraphs summarizing the invention and its advantages>"
+}""",
+    "detailed_description": """{
+  "detailed_description": "<4-6 paragraphs: preferred embodiment, operation, variations, advantages>"
+}""",
+    "claims": """{
+  "independent": ["<claim 1>", "<claim 2>"],
+  "dependent": ["<claim 3 referencing claim 1>", "<claim 4>", "..."]
+}""",
+    "abstract": """{
+  "abstract": "<exactly 150 words - technical summary of the disclosure>"
+}""",
+    "drawings": """{
+  "brief_description_of_drawings": "<one sentence per figure, e.g. 'FIG. 1 is a perspective view...'>",
+  "drawings_note": "<recommendation on what drawings should be prepared and what they should depict>"
+}""",
+}
+
+_PATENT_SECTION_INSTRUCTIONS = {
+    "background": """Write the BACKGROUND OF THE INVENTION section:
+   - "field_of_invention": 1-2 paragraphs on the technical field
+   - "description_of_prior_art": 2-3 paragraphs describing existing solutions,
+     referencing the prior art listed above, and explaining their limitations.
+     Do not describe the present invention's solution here.""",
+    "summary": """Write the SUMMARY OF THE INVENTION section: 2-3 paragraphs summarizing the
+invention and its key advantages over the limitations in the outline's problem statement.""",
+    "detailed_description": """Write the DETAILED DESCRIPTION OF PREFERRED EMBODIMENTS section: 4-6 substantive
+paragraphs covering:
+   - The preferred embodiment in detail, using the outline's key elements and reference numerals
+   - How the invention operates
+   - Each alternative embodiment listed in the outline
+   - Specific materials, dimensions, or configurations where applicable
+   - Advantages over the prior art
+The description must be detailed enough that someone skilled in the art could make and
+use the invention (enablement requirement). Refer to the outline's figures by number.""",
+    "claims": """Write the CLAIMS:
+   - "independent": 2-3 independent claims in standard patent language
+     (e.g., "A device comprising: a first element configured to...; a second element...")
+   - "dependent": 4-6 dependent claims referencing independent claims by number
+     (e.g., "The device of claim 1, wherein the first element further comprises...")
+Every claim element must be supported by the outline's key elements.""",
+    "abstract": """Write the ABSTRACT: exactly 150 words. Technical summary of the disclosure. Must state
+the technical field, the problem solved, and the gist of the solution.""",
+    "drawings": """Write the drawings sections:
+   - "brief_description_of_drawings": one sentence per figure in the outline
+     (e.g., "FIG. 1 is a perspective view of...")
+   - "drawings_note": recommend what drawings the inventor should prepare before filing
+     (perspective view, exploded view, block diagram, flowchart) and what each should
+     depict. Note that drawings cannot be added after filing.""",
+}
+
+
+def _provisional_patent_context(
     product_text: str,
     variant_title: str,
     variant_summary: str,
@@ -437,11 +485,7 @@ def build_provisional_patent_prompt(
     else:
         prior_art_block = "\n  No significant prior art found."
 
-    return f"""Draft a complete USPTO provisional patent application for this invention.
-Follow the provisional application format per 35 U.S.C. §111(b) and comply with
-the written description requirement of 35 U.S.C. §112(a).
-
-Product: {product_text}
+    return f"""Product: {product_text}
 Invention: {variant_title}
 Summary: {variant_summary}
 
@@ -452,53 +496,64 @@ Technical Details:
   Differentiators:
 {diffs}
 
-Prior Art Search Results:{prior_art_block}
-
-Generate a complete provisional patent application with these sections:
-
-1. "cover_sheet" — Object with:
-   - "invention_title": A formal, descriptive title (not marketing language)
-   - "filing_date_note": A brief note about the 12-month pendency period
-
-2. "specification" — Object with the full written description:
-   - "title_of_invention": Same as cover sheet title
-   - "cross_reference": null (no related applications)
-   - "background": Object with:
-     - "field_of_invention": 1-2 paragraphs on the technical field
-     - "description_of_prior_art": 2-3 paragraphs describing existing solutions,
-       referencing the prior art found above, and explaining their limitations
-   - "summary": 2-3 paragraphs summarizing the invention and its key advantages
-   - "brief_description_of_drawings": Describe what figures would depict (e.g.,
-     "FIG. 1 is a perspective view...", "FIG. 2 is a block diagram...")
-   - "detailed_description": 4-6 substantive paragraphs covering:
-     - The preferred embodiment in detail
-     - How the invention operates
-     - Alternative embodiments or variations
-     - Specific materials, dimensions, or configurations where applicable
-     - Advantages over the prior art
-     The description must be detailed enough that someone skilled in the art could
-     make and use the invention (enablement requirement).
-
-3. "abstract" — Exactly 150 words. Technical summary of the disclosure. Must state
-   the technical field, the problem solved, and the gist of the solution.
-
-4. "claims" — Object with:
-   - "independent": 2-3 independent claims in standard patent language
-     (e.g., "A device comprising: a first element configured to...; a second element...")
-   - "dependent": 4-6 dependent claims referencing independent claims
-     (e.g., "The device of claim 1, wherein the first element further comprises...")
-   Note: Claims are optional in a provisional but strongly recommended for scope.
+Prior Art Search Results:{prior_art_block}"""
+
+
+def build_patent_outline_prompt(**context) -> str:
+    """Prompt for the shared outline every section of the draft is written from.
 
-5. "drawings_note" — Recommend what drawings the inventor should prepare before filing.
-   Suggest specific figures (perspective view, exploded view, block diagram, flowchart)
-   that would best illustrate the invention. Note that drawings cannot be added after filing.
+    Keyword arguments are the invention details accepted by
+    ``_provisional_patent_context``.
+    """
+    return f"""Plan a USPTO provisional patent application for this invention.
+Follow the provisional application format per 35 U.S.C. §111(b).
 
-IMPORTANT REQUIREMENTS:
-- The specification must be as complete as possible. The nonprovisional application
-  filed within 12 months can only claim subject matter disclosed in this provisional.
-- Keep the "detailed_description" to 4-6 focused paragraphs (not excessively long).
-- You MUST include ALL sections: cover_sheet, specification, abstract, claims, AND drawings_note.
-  Do NOT omit the abstract, claims, or drawings_note — they are required fields.
+{_provisional_patent_context(**context)}
+
+Produce a concise OUTLINE that separate writers will use to draft the background,
+summary, detailed description, claims, abstract and drawings independently. The
+outline is the single source of truth for terminology: name every key component
+or method step once, give each a reference numeral, and list the figures the
+drawings should include. Keep each field short — this is a plan, not the draft.
+
+{safe_json_instructions()}"""
+
+
+def build_patent_section_prompt(
+    section: str,
+    outline: dict,
+    context_sections: dict[str, dict] | None = None,
+    instructions: str | None = None,
+    **context,
+) -> str:
+    """Prompt for one section of the draft, written from the shared outline.
+
+    ``context_sections`` carries already-written sections (when regenerating
+    one section of an existing draft); ``instructions`` is the user's note on
+    what to change.
+    """
+    written = ""
+    for name, content in (context_sections or {}).items():
+        written += f"\n--- {name} ---\n{json.dumps(content, ensure_ascii=False)}\n"
+    if written:
+        written = (
+            "\nThe other sections of this application are already written. Stay consistent "
+            f"with them and do not repeat them:{written}"
+        )
+    if instructions:
+        written += f"\nThe inventor asked for this change to the section: {instructions}\n"
+
+    return f"""You are drafting ONE section of a USPTO provisional patent application.
+The specification must comply with the written description requirement of 35 U.S.C. §112(a).
+
+{_provisional_patent_context(**context)}
+
+Application outline (use its title, terminology and reference numerals exactly):
+{json.dumps(outline, ensure_ascii=False, indent=2)}
+{written}
+{_PATENT_SECTION_INSTRUCTIONS[section]}
+
+Write ONLY this section — the other sections are being written separately.
 
 {safe_json_instructions()}"""
 
@@ -773,12 +828,20 @@ def build_professional_analysis_prompt(
         patent_block += (
             f"\n--- Patent {p.get('patent_id', 'Unknown')} (Source: {p.get('source_phase', 'unknown')}) ---\n"
             f"Title: {p.get('title', '')}\n"
-            f"Abstract: {p.get('abstract', '')}\n"
+        )
+        if p.get("abstract"):
+            patent_block += f"Abstract: {p['abstract']}\n"
+        patent_block += (
             f"Assignee: {p.get('assignee', 'Unknown')}\n"
             f"Date: {p.get('date', 'Unknown')}\n"
         )
         if cpc_str:
             patent_block += f"CPC Codes: {cpc_str}\n"
+        if p.get("related_count"):
+            patent_block += (
+                f"Related filings (near-identical disclosure, not listed separately): "
+                f"{p['related_count']} ({', '.join(p.get('related_ids', [])[:5])})\n"
+            )
 
     return f"""Perform a comprehensive patent analysis based on the invention and prior art below.
 
@@ -5,6 +5,7 @@ import re
 from datetime import datetime
 
 from app.services.llm import LLMError, call_llm
+from app.services.prompt_packing import pack_patents, patent_budget_for_model
 from app.services.prompts import RERANK_SCHEMA, RERANK_SYSTEM, build_rerank_prompt
 
 log = logging.getLogger("mousetrap.scoring")
@@ -148,11 +149,12 @@ def rerank_with_llm(
     if not candidates:
         return hits
 
+    packed, _ = pack_patents(candidates, patent_budget_for_model())
     prompt = build_rerank_prompt(
         spec_novelty=spec_novelty,
         spec_mechanism=spec_mechanism,
         spec_differentiators=spec_differentiators,
-        patents=candidates,
+        patents=packed,
     )
 
     try:
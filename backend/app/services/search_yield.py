@@ -0,0 +1,119 @@
+"""Per-source search yield: which queries actually feed the final top hits.
+
+Every query is tagged with its source — the search phase, or for LLM
+novelty strategies ``novelty:<approach>`` — and after scoring each
+analysis records, per source, how many queries ran, how many hits they
+returned and how many of those made the top N.  Stats decay so they track
+recent behaviour.  They are per process, like app.core.metrics.
+
+When enough analyses are searching at once (SEARCH_PRUNING_LOAD_THRESHOLD),
+a SearchPlan trims sources whose top-N hits per query have fallen below
+SEARCH_PRUNING_MIN_YIELD to a single query, or skips sources that
+contributed nothing.  Off-peak everything runs, which keeps the stats fresh.
+"""
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+from app.core import metrics
+from app.core.config import settings
+
+log = logging.getLogger("mousetrap.search_yield")
+
+# Weight kept by old observations on each new record (~100-analysis half-life)
+_DECAY = 0.993
+
+
+@dataclass
+class SourceStats:
+    analyses: float = 0.0
+    queries: float = 0.0
+    hits: float = 0.0
+    top_hits: float = 0.0
+
+    @property
+    def yield_per_query(self) -> float:
+        return self.top_hits / self.queries if self.queries else 0.0
+
+
+_stats: dict[str, SourceStats] = {}
+_inflight = 0
+
+
+@contextmanager
+def searching():
+    """Marks one analysis as searching; the count is the load signal."""
+    global _inflight
+    _inflight += 1
+    try:
+        yield
+    finally:
+        _inflight -= 1
+
+
+def under_load() -> bool:
+    threshold = settings.search_pruning_load_threshold
+    return threshold > 0 and _inflight >= threshold
+
+
+class SearchPlan:
+    """Decides how many queries each source may run for one analysis."""
+
+    def __init__(self, prune: bool = False):
+        self.prune = prune
+        self.queries: Counter[str] = Counter()
+        self.pruned: Counter[str] = Counter()
+
+    def take(self, source: str, items: list) -> list:
+        n = len(items)
+        stats = _stats.get(source)
+        if self.prune and stats is not None and stats.analyses >= settings.search_pruning_min_samples:
+            if stats.top_hits < 0.5:
+                n = 0
+            elif stats.yield_per_query < settings.search_pruning_min_yield:
+                n = min(n, 1)
+        if n < len(items):
+            self.pruned[source] += len(items) - n
+            metrics.inc("search.queries_pruned", len(items) - n)
+        self.queries[source] += n
+        return items[:n]
+
+
+def record(source_queries: dict[str, int], all_hits: list[dict], top: list[dict]) -> None:
+    """Fold one analysis into the stats. ``all_hits`` must be pre-dedup (tagged)."""
+    sources_by_id: dict[str, set[str]] = {}
+    returned: Counter[str] = Counter()
+    for h in all_hits:
+        source = h.get("search_source")
+        if source:
+            returned[source] += 1
+            sources_by_id.setdefault(h.get("patent_id") or "", set()).add(source)
+    in_top: Counter[str] = Counter()
+    for h in top:
+        for source in sources_by_id.get(h.get("patent_id") or "", ()):
+            in_top[source] += 1
+
+    for source in set(_stats) | set(source_queries):
+        s = _stats.setdefault(source, SourceStats())
+        s.analyses *= _DECAY
+        s.queries *= _DECAY
+        s.hits *= _DECAY
+        s.top_hits *= _DECAY
+        if source in source_queries:
+            s.analyses += 1
+            s.queries += source_queries[source]
+            s.hits += returned[source]
+            s.top_hits += in_top[source]
+
+
+def snapshot() -> dict:
+    return {
+        "under_load": under_load(),
+        "searching": _inflight,
+        "sources": {
+            source: {**{k: round(v, 2) for k, v in asdict(s).items()}, "yield_per_query": round(s.yield_per_query, 3)}
+            for source, s in sorted(_stats.items())
+        },
+    }
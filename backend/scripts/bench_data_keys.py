@@ -0,0 +1,84 @@
+"""Benchmark per-user data keys against the global MultiFernet path.
+
+Usage (from backend/):
+    python -m scripts.bench_data_keys [--rounds 200]
+
+For each representative session field it reports encrypt and decrypt time
+per value for:
+
+- ``master``      the global MultiFernet (primary key first)
+- ``master-old``  decrypting a token still on the old key, which MultiFernet
+                  only reaches after the primary key's HMAC check fails
+- ``user``        a UserCipher with its data key in the in-process cache
+- ``user-cold``   a cache miss: unwrap the data key with the master keys first
+                  (the database read that also happens is not included)
+
+Throwaway keys are used; no database or settings are needed.
+"""
+
+import argparse
+import random
+import uuid
+
+from cryptography.fernet import Fernet, MultiFernet
+
+from app.services import data_keys, encryption
+from scripts.bench_encryption import _payloads, _time_us
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    primary, old = Fernet(Fernet.generate_key()), Fernet(Fernet.generate_key())
+    master = MultiFernet([primary, old])
+    wrapped = master.encrypt(Fernet.generate_key())
+    user_id = uuid.uuid4()
+    data_keys._remember(user_id, encryption.UserCipher(Fernet(master.decrypt(wrapped))))
+
+    def cached() -> encryption.UserCipher:
+        return data_keys._cached(user_id)
+
+    def cold() -> encryption.UserCipher:
+        return encryption.UserCipher(Fernet(master.decrypt(wrapped)))
+
+    payloads = _payloads(random.Random(args.seed))
+    header = f"{'field':<20}{'path':<12}{'enc µs':>9}{'dec µs':>9}"
+    print(header)
+    print("-" * len(header))
+    for field, data in payloads.items():
+        token = master.encrypt(encryption.pack_json(data)).decode("ascii")
+        old_token = old.encrypt(encryption.pack_json(data)).decode("ascii")
+        user_token = cached().encrypt_json(data)
+        assert cached().decrypt_json(user_token) == data
+
+        paths = {
+            "master": (
+                lambda: master.encrypt(encryption.pack_json(data)),
+                lambda: encryption.unpack_json(master.decrypt(token.encode("ascii"))),
+            ),
+            "master-old": (
+                None,
+                lambda: encryption.unpack_json(master.decrypt(old_token.encode("ascii"))),
+            ),
+            "user": (
+                lambda: cached().encrypt_json(data),
+                lambda: cached().decrypt_json(user_token),
+            ),
+            "user-cold": (
+                lambda: cold().encrypt_json(data),
+                lambda: cold().decrypt_json(user_token),
+            ),
+        }
+        for name, (enc, dec) in paths.items():
+            enc_us = f"{_time_us(enc, args.rounds):>9.0f}" if enc else f"{'-':>9}"
+            print(f"{field:<20}{name:<12}{enc_us}{_time_us(dec, args.rounds):>9.0f}")
+
+    unwrap_us = _time_us(cold, args.rounds * 5)
+    print(f"\nunwrapping a data key (cache miss): {unwrap_us:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
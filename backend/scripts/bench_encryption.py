@@ -0,0 +1,142 @@
+"""Benchmark the encrypted JSON envelope against the legacy JSON-text format.
+
+Usage (from backend/):
+    python -m scripts.bench_encryption [--rounds 200]
+
+For representative session payloads (variants, patent hits, spec, patent
+draft) it reports the stored size, encrypt and decrypt time per value, and
+the bytes that 1,000 full session reads would pull from the database.  A
+throwaway Fernet key is used; no database or settings are needed.
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+
+from cryptography.fernet import Fernet, MultiFernet
+
+from app.services import encryption
+
+_WORDS = (
+    "apparatus method housing sensor valve drainage tray configured coupled assembly "
+    "controller signal module surface member channel first second plurality wherein "
+    "comprising substantially adjacent rotatable flexible portion user device kitchen "
+    "water flow outlet inlet support frame removable embodiment invention"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _payloads(rng: random.Random) -> dict[str, object]:
+    variants = [
+        {
+            "id": f"v{i}",
+            "title": _text(rng, 6),
+            "summary": _text(rng, 40),
+            "improvement_mode": "mashup",
+            "keywords": [rng.choice(_WORDS) for _ in range(6)],
+            "tier": "upgrade",
+            "one_line_pitch": _text(rng, 15),
+            "why_it_wins": [_text(rng, 12) for _ in range(3)],
+        }
+        for i in range(10)
+    ]
+    hits = [
+        {
+            "patent_id": f"US{10_000_000 + i}",
+            "title": _text(rng, 10),
+            "abstract": _text(rng, 150),
+            "assignee": "".join(rng.choices(string.ascii_uppercase, k=8)) + " Corp",
+            "date": "2021-03-04",
+            "score": round(rng.random(), 2),
+            "why_similar": _text(rng, 45),
+        }
+        for i in range(50)
+    ]
+    spec = {
+        "novelty": _text(rng, 40),
+        "mechanism": _text(rng, 60),
+        "baseline": _text(rng, 30),
+        "differentiators": [_text(rng, 12) for _ in range(5)],
+        "keywords": [rng.choice(_WORDS) for _ in range(8)],
+        "search_queries": [_text(rng, 8) for _ in range(5)],
+        "disclaimer": "This is not legal advice.",
+    }
+    draft = {
+        "abstract": _text(rng, 150),
+        "claims": {
+            "independent": [_text(rng, 80) for _ in range(3)],
+            "dependent": [_text(rng, 30) for _ in range(6)],
+        },
+        "drawings_note": _text(rng, 80),
+        "markdown": "\n\n".join(_text(rng, 120) for _ in range(20)),
+    }
+    return {"variants_json": variants, "patent_hits_json": hits, "spec_json": spec, "patent_draft_json": draft}
+
+
+def _legacy_encrypt(f: MultiFernet, data: object) -> str:
+    return f.encrypt(json.dumps(data, ensure_ascii=False).encode("utf-8")).decode("ascii")
+
+
+def _legacy_decrypt(f: MultiFernet, token: str) -> object:
+    return json.loads(f.decrypt(token.encode("ascii")).decode("utf-8"))
+
+
+def _envelope_encrypt(f: MultiFernet, data: object) -> str:
+    return f.encrypt(encryption.pack_json(data)).decode("ascii")
+
+
+def _envelope_decrypt(f: MultiFernet, token: str) -> object:
+    return encryption.unpack_json(f.decrypt(token.encode("ascii")))
+
+
+def _time_us(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    f = MultiFernet([Fernet(Fernet.generate_key())])
+    payloads = _payloads(random.Random(args.seed))
+    formats = {
+        "legacy": (_legacy_encrypt, _legacy_decrypt),
+        "envelope": (_envelope_encrypt, _envelope_decrypt),
+    }
+
+    header = f"{'field':<20}{'format':<10}{'json B':>9}{'stored B':>10}{'ratio':>8}{'enc µs':>9}{'dec µs':>9}"
+    print(header)
+    print("-" * len(header))
+    totals = {name: 0 for name in formats}
+    for field, data in payloads.items():
+        json_bytes = len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        for name, (enc, dec) in formats.items():
+            token = enc(f, data)
+            assert dec(f, token) == data
+            enc_us = _time_us(lambda: enc(f, data), args.rounds)
+            dec_us = _time_us(lambda: dec(f, token), args.rounds)
+            totals[name] += len(token)
+            print(
+                f"{field:<20}{name:<10}{json_bytes:>9}{len(token):>10}"
+                f"{len(token) / json_bytes:>8.2f}{enc_us:>9.0f}{dec_us:>9.0f}"
+            )
+
+    print()
+    for name, stored in totals.items():
+        print(f"{name:<10} {stored:>9} B per session row  →  {stored * 1000 / 1e6:>7.1f} MB read per 1,000 detail fetches")
+    saved = 1 - totals["envelope"] / totals["legacy"]
+    print(f"\nenvelope stores {saved:.0%} fewer bytes than legacy")
+
+
+if __name__ == "__main__":
+    main()